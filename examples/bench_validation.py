@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark of command validation
+
+Compares the cost per command of Commands.validate_command with trying all regular expressions one after the other,
+for the PL and CPx command sets. Cached results are measured by validating the same commands repeatedly, uncached
+ones by disabling the LRU cache.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__license__ = 'CC0 1.0 Universal'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import re
+import timeit
+
+from pyttilan.commands import TTiPLCommands, TTiCPxCommands, _CommandValidator
+
+COMMANDS = ["V1 3.3", "I1O?", "V1O?", "OP1 1", "*ESR?", "EER?", "*IDN?", "TRIPRST", "RATIO?", "LOCAL"]
+
+
+def linear_scan(patterns):
+    compiled = [re.compile(pattern) for pattern in patterns]
+
+    def validate(command):
+        for regex in compiled:
+            a = regex.match(command)
+            if a:
+                return a
+        return None
+    return validate
+
+
+def per_command_us(validate, number=2000):
+    total = timeit.timeit(lambda: [validate(c) for c in COMMANDS], number=number)
+    return total / (number * len(COMMANDS)) * 1e6
+
+
+if __name__ == "__main__":
+    for cls in (TTiPLCommands, TTiCPxCommands):
+        patterns = cls._valid_commands_re
+        print(f"{cls.__name__} ({len(patterns)} patterns)")
+        print(f"  linear scan:        {per_command_us(linear_scan(patterns)):.3f} us/command")
+        dispatch = _CommandValidator(patterns, cache_size=0).validate
+        print(f"  mnemonic dispatch:  {per_command_us(dispatch):.3f} us/command")
+        print(f"  dispatch + LRU:     {per_command_us(cls().validate_command):.3f} us/command")
@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+asyncio version of the backends. Several power supplies can be driven concurrently from a single event loop:
+
+    backend = AsyncPLBackend()
+    await backend.connect(ip)
+    volts = await backend.read_voltage(1)
+
+Async backends have the same methods as their synchronous counterparts. Commands and parsing of the answers are not
+duplicated: the synchronous methods are called on a recorder that collects the commands they would send and how to
+parse their answers, and the recorded commands are then sent with asyncio streams.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import socket
+import types
+from contextlib import contextmanager
+
+from pyttilan.backend import (TTiBackend, CommonBackend, PLBackend, CPxBackend, CommandBatch, SockCommand,
+                              ErrorPolicy, TTiBackendExc, TTiBackendTimeout, _needs_execution_error, _raise_if_error,
+                              _readback_cache)
+from pyttilan.commands import Commands, TTiPLCommands, TTiCPxCommands
+from pyttilan.cache import SetpointCache
+from pyttilan.instrumentation import Instrumentation
+from pyttilan.framing import parse_number, parse_numbers
+from pyttilan.status import StatusSnapshot
+
+log = logging.getLogger(__name__)
+
+
+class AsyncSockCommand(SockCommand):
+    """
+    SockCommand on top of asyncio streams. Command validation is shared with SockCommand.
+
+    Besides timeout, any call can be bounded with asyncio.timeout(). Answers of reads that timed out or were
+    cancelled are discarded before sending the next message, like SockCommand does
+    """
+
+    def __init__(self, ip, port=9221, valid_commands=Commands(), timeout=None, connect_timeout=5.0,
+                 drain_timeout=1.0):
+        super().__init__(ip, port, valid_commands, timeout, connect_timeout, drain_timeout)
+        self._reader = None
+        self._writer = None
+        self._reconnect = False
+
+    async def connect(self, ip=None, port=None):
+        if ip:
+            self._ip = ip
+        if port:
+            self._port = port
+        try:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self._ip, self._port),
+                                                                self.connect_timeout)
+        except TimeoutError:
+            raise TTiBackendTimeout(f"Timeout connecting to {self._ip}:{self._port}")
+        sock = self._writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._stale = 0
+        self._reconnect = False
+
+    async def disconnect(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._reader = None
+            self._writer = None
+
+    async def _readline(self, timeout):
+        # Returns the line without its terminator, as bytes
+        try:
+            line = await asyncio.wait_for(self._reader.readline(), timeout)
+        except TimeoutError:
+            raise TTiBackendTimeout(f"Timeout waiting for an answer from {self._ip}:{self._port}")
+        if not line:
+            raise TTiBackendExc("Connection closed by the power supply")
+        return line.rstrip(b"\r\n")
+
+    async def resync(self):
+        """
+        Read and discard the answers of reads that timed out or were cancelled. Reconnects if they do not arrive
+        """
+        while self._stale:
+            try:
+                await self._readline(self.drain_timeout)
+            except TTiBackendExc:
+                log.warning("Stale answers did not arrive, reconnecting to %s:%s", self._ip, self._port)
+                await self.disconnect()
+                await self.connect(self._ip, self._port)
+                return
+            self._stale -= 1
+
+    async def _sock_send(self, s):
+        if self._reconnect:
+            await self.disconnect()
+            await self.connect(self._ip, self._port)
+        if self._writer:
+            if self._stale:
+                await self.resync()
+            try:
+                self._writer.write(s)
+                await self._writer.drain()
+            except asyncio.CancelledError:
+                # It is unknown how much of the message has been sent
+                self._reconnect = True
+                raise
+            except:
+                await self.disconnect()
+                await self.connect(self._ip, self._port)
+                raise
+        else:
+            raise TTiBackendExc("Client not connected")
+
+    async def execute_command(self, command):
+        await self.execute_commands([command])
+
+    async def execute_commands(self, commands):
+        for command in commands:
+            self._validate(command)
+        await self._sock_send(str.encode(";".join(commands) + "\n"))
+
+    async def read_response(self):
+        if self._reader is None:
+            raise TTiBackendExc("Client not connected")
+        try:
+            return (await self._readline(self.timeout)).decode(errors='replace')
+        except (TTiBackendTimeout, asyncio.CancelledError):
+            self._stale += 1
+            raise
+
+    async def read_responses(self, count):
+        responses = []
+        while len(responses) < count:
+            responses.extend((await self.read_response()).split(";"))
+        return responses
+
+    async def read_numbers(self, count):
+        if self._reader is None:
+            raise TTiBackendExc("Client not connected")
+        values = []
+        while len(values) < count:
+            try:
+                line = await self._readline(self.timeout)
+            except (TTiBackendTimeout, asyncio.CancelledError):
+                self._stale += 1
+                raise
+            values.extend(parse_number(answer) for answer in line.split(b";"))
+        return values
+
+
+class AsyncCommandBatch(CommandBatch):
+    """
+    CommandBatch for async backends:
+
+        async with backend.batch() as b:
+            b.set_voltage(1, 3.3)
+            b.read_current(1)
+        voltage_set, current = b.results
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.execute()
+
+    async def execute(self):
+        commands, queries, pending = self._take_pending()
+        if not commands:
+            return self.results
+        data = await self._backend._exchange(commands, queries, self._error_policy)
+        return self._parse_results(pending, data)
+
+
+def _async_method(name, func):
+    @functools.wraps(func)
+    async def method(self, *args, **kwargs):
+        batch = AsyncCommandBatch(self, surface=self._surface)
+        getattr(batch, name)(*args, **kwargs)
+        has_query = any(num_queries for _, num_queries, _ in batch._pending)
+        results = await batch.execute()
+        if has_query:
+            return results[0]
+        return None
+    return method
+
+
+class AsyncTTiBackend:
+    """
+    Base class of the async backends. Subclasses declare the synchronous backend whose methods they expose:
+
+        class AsyncPLBackend(AsyncTTiBackend, surface=PLBackend):
+            ...
+    """
+    _surface = TTiBackend
+
+    def __init_subclass__(cls, surface=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if surface is None:
+            return
+        cls._surface = surface
+        for name in dir(surface):
+            if name.startswith('_') or hasattr(TTiBackend, name) or name in vars(cls):
+                continue
+            attr = inspect.getattr_static(surface, name)
+            if isinstance(attr, types.FunctionType):
+                setattr(cls, name, _async_method(name, attr))
+
+    def __init__(self, valid_commands=Commands(), num_outputs=1, error_policy=ErrorPolicy.always,
+                 error_check_interval=10, setpoint_cache=False, timeout=None, connect_timeout=5.0,
+                 readback_cache=None, coalesce_queries=False):
+        self.sock = None
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._valid_commands = valid_commands
+        self.n_outputs = num_outputs
+        self._lock = asyncio.Lock()
+        self.last_rx = None
+        self.last_tx = None
+        self.last_eer = None
+        self.last_esr = None
+        self.last_status = None
+        self._check_error_policy(error_policy)
+        self.error_policy = error_policy
+        self.error_check_interval = int(error_check_interval)
+        self._unchecked_commands = 0
+        self._error_policy_override = contextvars.ContextVar('error_policy', default=None)
+        self.setpoint_cache = SetpointCache(self._surface._setpoint_answers) if setpoint_cache else None
+        self.readback_cache = _readback_cache(readback_cache)
+        self.coalesce_queries = coalesce_queries
+        self._in_flight = {}  # (commands, error policy): Future of the exchange of concurrent identical queries
+        self.instrumentation = None
+
+    # Error policy handling and instrumentation are shared with the synchronous backends
+    add_hook = TTiBackend.add_hook
+    remove_hook = TTiBackend.remove_hook
+    enable_stats = TTiBackend.enable_stats
+    _check_error_policy = staticmethod(TTiBackend._check_error_policy)
+    _must_check_error = TTiBackend._must_check_error
+    _clear_lasts = TTiBackend._clear_lasts
+    _clear_caches = TTiBackend._clear_caches
+    _prepare_caches = TTiBackend._prepare_caches
+    _merge_caches = staticmethod(TTiBackend._merge_caches)
+    _begin_transfer = TTiBackend._begin_transfer
+    _received = TTiBackend._received
+    _checked = TTiBackend._checked
+    _check_output = TTiBackend._check_output
+
+    def _current_error_policy(self, policy=None):
+        return policy or self._error_policy_override.get() or self.error_policy
+
+    @contextmanager
+    def using_error_policy(self, policy):
+        """
+        Override the error policy of the backend for the calls made by the current task inside the with block
+        """
+        self._check_error_policy(policy)
+        token = self._error_policy_override.set(policy)
+        try:
+            yield self
+        finally:
+            self._error_policy_override.reset(token)
+
+    async def check_if_error(self):
+        await self.sock.execute_command("*ESR?")
+        err = int(await self.sock.read_response())
+        self.last_esr = err
+        exe_err = None
+        if _needs_execution_error(err):
+            await self.sock.execute_command("EER?")
+            exe_err = int(await self.sock.read_response())
+            self.last_eer = exe_err
+        self.last_status = StatusSnapshot(esr=err, eer=exe_err)
+        _raise_if_error(self.last_status)
+
+    async def flush_errors(self):
+        async with self._lock:
+            self._unchecked_commands = 0
+            await self.check_if_error()
+
+    async def _exchange(self, commands, queries, error_policy=None):
+        if self.coalesce_queries and all(queries):
+            return await self._coalesced_exchange(commands, queries, self._current_error_policy(error_policy))
+        return await self._serialized_exchange(commands, queries, error_policy)
+
+    async def _coalesced_exchange(self, commands, queries, error_policy):
+        key = (tuple(commands), error_policy)
+        future = self._in_flight.get(key)
+        if future is not None:
+            # shield, a waiter being cancelled must not cancel the exchange of the others
+            return list(await asyncio.shield(future))
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            data = await self._serialized_exchange(commands, queries, error_policy)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it, so it is not logged as never retrieved when nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            del self._in_flight[key]
+
+    async def _serialized_exchange(self, commands, queries, error_policy):
+        async with self._lock:
+            return await self._cached_transfer(commands, queries, error_policy)
+
+    async def _cached_transfer(self, commands, queries, error_policy):
+        # Like TTiBackend._cached_transfer
+        to_send, to_send_queries, steps = self._prepare_caches(commands, queries)
+        data, checked = [], False
+        if to_send:
+            try:
+                data, checked = await self._transfer(to_send, sum(to_send_queries), error_policy)
+            except BaseException:
+                self._clear_caches()
+                raise
+        return self._merge_caches(steps, data, checked)
+
+    async def _transfer(self, commands, num_queries, error_policy, numeric=False):
+        # Like TTiBackend._transfer
+        message, exchange = self._begin_transfer(commands)
+        try:
+            await self.sock.execute_commands(commands)
+            self.last_tx = message
+            if numeric:
+                data = await self.sock.read_numbers(num_queries)
+            else:
+                data = await self.sock.read_responses(num_queries)
+        except Exception as e:
+            self._received(exchange, error=e)
+            raise
+        self._received(exchange, data, numeric=numeric)
+        checked = self._must_check_error(error_policy, commands, num_queries)
+        try:
+            if checked:
+                await self.check_if_error()
+        except Exception as e:
+            self._checked(exchange, checked, e)
+            raise
+        self._checked(exchange, checked)
+        return data, checked
+
+    async def _query_many(self, commands, parser):
+        # Like TTiBackend._query_many
+        if parser is parse_numbers and self._reads_directly():
+            async with self._lock:
+                return (await self._transfer(commands, len(commands), None, numeric=True))[0]
+        return parser(await self._exchange(commands, [True] * len(commands)))
+
+    def _reads_directly(self):
+        return not self.coalesce_queries and self.setpoint_cache is None and self.readback_cache is None
+
+    def batch(self, error_policy=None):
+        if error_policy is not None:
+            self._check_error_policy(error_policy)
+        return AsyncCommandBatch(self, error_policy, surface=self._surface)
+
+    async def connect(self, ip, port=9221):
+        if self.sock is None:
+            self.sock = AsyncSockCommand(ip=ip, port=port, valid_commands=self._valid_commands, timeout=self.timeout,
+                                         connect_timeout=self.connect_timeout)
+        await self.sock.connect(ip, port)
+        if self.setpoint_cache is not None:
+            self.setpoint_cache.clear()
+        if self.readback_cache is not None:
+            self.readback_cache.clear()
+
+    async def disconnect(self):
+        await self.sock.disconnect()
+
+
+class AsyncCommonBackend(AsyncTTiBackend, surface=CommonBackend):
+    """
+    Async version of CommonBackend
+    """
+
+
+class AsyncCPxBackend(AsyncTTiBackend, surface=CPxBackend):
+    """
+    Async version of CPxBackend
+    """
+    def __init__(self, num_outputs=1, **kwargs):
+        super().__init__(valid_commands=TTiCPxCommands(), num_outputs=num_outputs, **kwargs)
+
+
+class AsyncPLBackend(AsyncTTiBackend, surface=PLBackend):
+    """
+    Async version of PLBackend
+    """
+    def __init__(self, num_outputs=1, **kwargs):
+        super().__init__(valid_commands=TTiPLCommands(), num_outputs=num_outputs, **kwargs)
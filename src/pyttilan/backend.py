@@ -12,46 +12,162 @@ __email__ = 'ifae-control@ifae.es'
 
 import socket
 import logging
-from threading import Lock
+import time
+import types
+import inspect
+from functools import partial
+from threading import Lock, local
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from pyttilan.commands import Commands, TTiPLCommands, TTiCPxCommands
+from pyttilan.telemetry import make_snapshot, SNAPSHOT_QUERIES
+from pyttilan.cache import SetpointCache, ReadbackCache
+from pyttilan.instrumentation import Instrumentation
+from pyttilan.framing import LineReader, parse_numbers
+from pyttilan.worker import IOWorker
+from pyttilan.status import StatusSnapshot
 import re
 from warnings import deprecated
 
 log = logging.getLogger(__name__)
 
+# Compiled once instead of on every parsed answer
+_VALUE_RE = re.compile(r"([0-9,\.,\-,e]*)")
+_UNIT_VALUE_RE = {unit: re.compile(fr"([0-9,\.,e,\-]*){unit}") for unit in ("V", "A")}
+
 
 class TTiBackendExc(Exception):
     pass
 
 
+class TTiBackendTimeout(TTiBackendExc, TimeoutError):
+    pass
+
+
+def _needs_execution_error(err):
+    # EER is only read when an execution error is flagged and there is not a command error, which is reported first
+    return bool(err & (1 << 4)) and not err & (1 << 5)
+
+
+def _raise_if_error(status):
+    """
+    Raise TTiBackendExc with the first error reported by a StatusSnapshot, if any
+    """
+    error = status.error
+    if error is not None:
+        log.error(error)
+        raise TTiBackendExc(error)
+
+
 class SockCommand:
-    def __init__(self, ip, port=9221, valid_commands=Commands()):
+    """
+    Connection to a power supply.
+
+    timeout: seconds to wait for each answer (None waits forever)
+    connect_timeout: seconds to wait for the connection to be established
+    drain_timeout: seconds to wait for each stale answer when resynchronizing
+
+    deadline can be set to a time.monotonic() value, no operation will wait beyond it. sent_at is the
+    time.perf_counter() when the last message was completely sent.
+
+    If waiting for an answer times out, the answer may still arrive later. Before sending the next message, answers
+    of timed out reads are read and discarded, so the stream stays synchronized. If they do not arrive in
+    drain_timeout the connection is reopened.
+    """
+
+    def __init__(self, ip, port=9221, valid_commands=Commands(), timeout=None, connect_timeout=5.0,
+                 drain_timeout=1.0):
         self._ip = ip
         self._port = port
         self._sock = None
-        self._sock_file = None
+        self._lines = None
         self.valid_commands = valid_commands
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.drain_timeout = drain_timeout
+        self.deadline = None
+        self._stale = 0
+        self._current_timeout = None
+        self.sent_at = None
 
     def connect(self, ip=None, port=None):
         if ip:
             self._ip = ip
         if port:
             self._port = port
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._sock.connect((self._ip, self._port))
-        self._sock_file = self._sock.makefile()
+        sock = self._open_socket()
+        sock.settimeout(self.timeout)
+        self._current_timeout = self.timeout
+        self._sock = sock
+        self._lines = LineReader(sock)
+        self._stale = 0
+
+    def _open_socket(self):
+        try:
+            sock = socket.create_connection((self._ip, self._port), timeout=self.connect_timeout)
+        except socket.timeout:
+            raise TTiBackendTimeout(f"Timeout connecting to {self._ip}:{self._port}")
+        # Commands are small and answers are awaited before sending more, Nagle would only delay them
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return sock
 
     def disconnect(self):
         if self._sock:
-            self._sock.shutdown(socket.SHUT_RDWR)
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self._sock.close()
             self._sock = None
-            self._sock_file = None
+            self._lines = None
+
+    def _set_timeout(self, timeout):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise TTiBackendTimeout("Deadline exceeded")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if timeout != self._current_timeout:
+            self._sock.settimeout(timeout)
+            self._current_timeout = timeout
+
+    def _read(self, read, timeout):
+        # Calls a read method of the LineReader. Bytes received before a timeout stay on its buffer
+        self._set_timeout(timeout)
+        try:
+            result = read()
+        except socket.timeout:
+            raise TTiBackendTimeout(f"Timeout waiting for an answer from {self._ip}:{self._port}")
+        if result is None:
+            raise TTiBackendExc("Connection closed by the power supply")
+        return result
+
+    def _readline(self, timeout):
+        return self._read(self._lines.readline, timeout)
+
+    def resync(self):
+        """
+        Read and discard the answers of reads that timed out. Reconnects if they do not arrive
+        """
+        while self._stale:
+            try:
+                self._readline(self.drain_timeout)
+            except TTiBackendExc:
+                log.warning("Stale answers did not arrive, reconnecting to %s:%s", self._ip, self._port)
+                self.disconnect()
+                self.connect(self._ip, self._port)
+                return
+            self._stale -= 1
 
     def _sock_send(self, s):
         if self._sock:
+            if self._stale:
+                self.resync()
             try:
+                self._set_timeout(self.timeout)
                 self._sock.sendall(s)
+                self.sent_at = time.perf_counter()
             except:
                 self.disconnect()
                 self.connect(self._ip, self._port)
@@ -59,15 +175,130 @@ class SockCommand:
         else:
             raise TTiBackendExc("Client not connected")
 
-    def execute_command(self, command):
+    def _validate(self, command):
         if self.valid_commands.validate_command(command) is None:
             msg = "INVALID COMMAND: {}".format(command)
             log.error(msg)
             raise TTiBackendExc(msg)
-        self._sock_send(str.encode(command))
+
+    def execute_command(self, command):
+        self.execute_commands([command])
+
+    def execute_commands(self, commands):
+        """
+        Validate all commands and send them as a single message, separated by ';' as described on TTi manuals.
+        If any of the commands is not valid, nothing is sent
+        """
+        for command in commands:
+            self._validate(command)
+        self._sock_send(str.encode(";".join(commands) + "\n"))
 
     def read_response(self):
-        return self._sock_file.readline()[:-1]
+        if not self._sock:
+            raise TTiBackendExc("Client not connected")
+        try:
+            return str(self._readline(self.timeout), 'utf-8', 'replace')
+        except TTiBackendTimeout:
+            self._stale += 1
+            raise
+
+    def read_responses(self, count):
+        """
+        Read the responses of count queries. Responses to queries sent on the same message are separated by ';'
+        """
+        responses = []
+        while len(responses) < count:
+            responses.extend(self.read_response().split(";"))
+        return responses
+
+    def read_numbers(self, count):
+        """
+        Read the responses of count numeric queries and return them as floats, parsed without decoding them. Like
+        read_responses, a line that times out is counted as stale
+        """
+        if not self._sock:
+            raise TTiBackendExc("Client not connected")
+        values = []
+        while len(values) < count:
+            try:
+                values.extend(self._read(self._lines.read_numbers, self.timeout))
+            except TTiBackendTimeout:
+                self._stale += 1
+                raise
+        return values
+
+
+class CommandBatch:
+    """
+    Records the commands generated by the backend methods called on it and sends all of them on a single message
+    when the with block exits (or execute is called). The error registers are checked only once, at the end.
+
+    Methods called on a batch return None, results of the queries are stored on results, in calling order, and
+    parsed the same way the backend method would have done.
+    """
+
+    def __init__(self, backend, error_policy=None, surface=None):
+        self._backend = backend
+        # Class whose methods generate the commands, it is the backend class unless the backend is not synchronous
+        self._surface = surface or type(backend)
+        self._error_policy = error_policy
+        self._pending = []  # (commands, number of queries, parser of the list of answers)
+        self.results = []
+
+    def __getattr__(self, name):
+        # Backend methods are bound to the batch so the commands they generate are recorded instead of sent
+        attr = inspect.getattr_static(self._surface, name, None)
+        if isinstance(attr, types.FunctionType):
+            return types.MethodType(attr, self)
+        if isinstance(attr, (staticmethod, classmethod)):
+            return getattr(self._surface, name)
+        return getattr(self._backend, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+
+    def _process_command(self, cmd):
+        self._pending.append(([cmd], 1, None))
+
+    def _execute_command(self, cmd):
+        self._pending.append(([cmd], 0, None))
+
+    def _query(self, cmd, parser=None):
+        self._pending.append(([cmd], 1, parser))
+
+    def _query_many(self, commands, parser):
+        self._pending.append((list(commands), len(commands), parser))
+
+    def _take_pending(self):
+        pending, self._pending = self._pending, []
+        commands = [cmd for cmds, _, _ in pending for cmd in cmds]
+        queries = [n > 0 for cmds, n, _ in pending for _ in cmds]
+        return commands, queries, pending
+
+    def _parse_results(self, pending, data):
+        self.results = []
+        for _, n, parser in pending:
+            if n == 0:
+                continue
+            answers, data = data[:n], data[n:]
+            if n == 1:
+                answers = answers[0]
+            self.results.append(parser(answers) if parser else answers)
+        return self.results
+
+    def execute(self):
+        """
+        Send all recorded commands and return the parsed results of the queries
+        """
+        commands, queries, pending = self._take_pending()
+        if not commands:
+            return self.results
+        data = self._backend._exchange(commands, queries, self._error_policy)
+        return self._parse_results(pending, data)
 
 
 class SlaveModes:
@@ -75,9 +306,46 @@ class SlaveModes:
     independent = 0
 
 
+class ErrorPolicy:
+    """
+    When the error registers (*ESR? and EER?) are checked after sending commands:
+
+    always: after every command or batch
+    writes_only: only after messages that contain at least one command that is not a query
+    every_n: once every error_check_interval commands
+    deferred: only when flush_errors is called
+    never: errors are not checked
+
+    The standard event status register accumulates errors until it is read, so errors of commands that were not
+    checked are reported by the next check that runs.
+    """
+    always = 'always'
+    writes_only = 'writes_only'
+    every_n = 'every_n'
+    deferred = 'deferred'
+    never = 'never'
+
+    all = (always, writes_only, every_n, deferred, never)
+
+
+def _readback_cache(ttls):
+    # readback_cache argument of the backends: None or False, True for the default time to live of each query or a
+    # dictionary of them
+    if not ttls:
+        return None
+    return ReadbackCache(None if ttls is True else ttls)
+
+
 class TTiBackend:
-    def __init__(self, valid_commands=Commands(), num_outputs=1):
+    # Answer format and resolution of the queries of each setpoint, see SetpointCache
+    _setpoint_answers = {}
+
+    def __init__(self, valid_commands=Commands(), num_outputs=1, error_policy=ErrorPolicy.always,
+                 error_check_interval=10, setpoint_cache=False, timeout=None, connect_timeout=5.0,
+                 readback_cache=None, coalesce_queries=False):
         self.sock = None
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
         self._valid_commands = valid_commands
         self.n_outputs = num_outputs
         self._lock = Lock()
@@ -85,90 +353,366 @@ class TTiBackend:
         self.last_tx = None
         self.last_eer = None
         self.last_esr = None
+        self.last_status = None
+        self._check_error_policy(error_policy)
+        self.error_policy = error_policy
+        self.error_check_interval = int(error_check_interval)
+        self._unchecked_commands = 0
+        self._local = local()
+        self.setpoint_cache = SetpointCache(self._setpoint_answers) if setpoint_cache else None
+        self.readback_cache = _readback_cache(readback_cache)
+        self.coalesce_queries = coalesce_queries
+        self._in_flight = {}  # (commands, error policy): Future of the exchange of concurrent identical queries
+        self._in_flight_lock = Lock()
+        self.instrumentation = None
+        self._worker = None
         # Helper function that executes a command and reads the response
 
+    @staticmethod
+    def _check_error_policy(policy):
+        if policy not in ErrorPolicy.all:
+            raise TTiBackendExc(f"Only valid error policies are {', '.join(ErrorPolicy.all)}")
+
+    @contextmanager
+    def using_error_policy(self, policy):
+        """
+        Override the error policy of the backend for the calls made by this thread inside the with block
+        """
+        self._check_error_policy(policy)
+        previous = getattr(self._local, 'error_policy', None)
+        self._local.error_policy = policy
+        try:
+            yield self
+        finally:
+            self._local.error_policy = previous
+
+    @contextmanager
+    def using_deadline(self, seconds):
+        """
+        Calls made by this thread inside the with block raise TTiBackendTimeout if they can not be completed in
+        seconds, including the time waiting for other threads using the backend
+        """
+        previous = getattr(self._local, 'deadline', None)
+        deadline = time.monotonic() + seconds
+        self._local.deadline = deadline if previous is None else min(previous, deadline)
+        try:
+            yield self
+        finally:
+            self._local.deadline = previous
+
+    @contextmanager
+    def _locked(self):
+        # Takes the lock without waiting beyond the deadline of the thread, which is applied to the socket meanwhile
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is None:
+            acquired = self._lock.acquire()
+        else:
+            acquired = self._lock.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        if not acquired:
+            raise TTiBackendTimeout("Deadline exceeded waiting for the power supply to be free")
+        try:
+            if self.sock is not None:
+                self.sock.deadline = deadline
+            yield
+        finally:
+            if self.sock is not None:
+                self.sock.deadline = None
+            self._lock.release()
+
+    def _current_error_policy(self, policy=None):
+        return policy or getattr(self._local, 'error_policy', None) or self.error_policy
+
+    def _must_check_error(self, policy, commands, num_queries):
+        # Must be called with the lock taken. When errors must be checked, unchecked commands are counted again from 0
+        policy = self._current_error_policy(policy)
+        self._unchecked_commands += len(commands)
+        if policy == ErrorPolicy.always:
+            check = True
+        elif policy == ErrorPolicy.writes_only:
+            check = num_queries < len(commands)
+        elif policy == ErrorPolicy.every_n:
+            check = self._unchecked_commands >= self.error_check_interval
+        else:
+            check = False
+        if check:
+            self._unchecked_commands = 0
+        return check
+
+    def flush_errors(self):
+        """
+        Check the error registers now. Raises TTiBackendExc if any command sent since the last check failed
+        """
+        with self._locked():
+            self._unchecked_commands = 0
+            self.check_if_error()
+
     def check_if_error(self):
         self.sock.execute_command("*ESR?")
         err = int(self.sock.read_response())
         self.last_esr = err
-        if err != 0:
-            if err & (1 << 5):
-                msg = "Command error detected"
-                log.error(msg)
-                raise TTiBackendExc(msg)
-
-            if err & (1 << 4):
-                self.sock.execute_command("EER?")
-                exe_err = int(self.sock.read_response())
-                self.last_eer = exe_err
-                if 1 <= exe_err <= 9:
-                    msg = "[Execution error] Internal hardware error"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 100:
-                    msg = "[Execution error] Range error"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 101:
-                    msg = "[Execution error] Corrupted data"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 102:
-                    msg = "[Execution error] There are no data"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 103:
-                    msg = "[Execution error] Second output not available"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 104:
-                    msg = "[Execution error] Command not valid with output on"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-                elif exe_err == 200:
-                    msg = "[Execution error] Cannot write (read only)"
-                    log.error(msg)
-                    raise TTiBackendExc(msg)
-
-            if err & (1 << 3):
-                msg = "Verify timeout detected"
-                log.error(msg)
-                raise TTiBackendExc(msg)
-            if err & (1 << 2):
-                msg = "Query error detected"
-                log.error(msg)
-                raise TTiBackendExc(msg)
+        exe_err = None
+        if _needs_execution_error(err):
+            self.sock.execute_command("EER?")
+            exe_err = int(self.sock.read_response())
+            self.last_eer = exe_err
+        self.last_status = StatusSnapshot(esr=err, eer=exe_err)
+        _raise_if_error(self.last_status)
 
     def _clear_lasts(self):
         self.last_rx = ''
         self.last_tx = ''
         self.last_eer = ''
         self.last_esr = ''
+        self.last_status = None
+
+    def _exchange(self, commands, queries, error_policy=None):
+        """
+        Send commands in a single message and return the responses of the ones that are queries (queries has a
+        boolean for each command). Errors are checked once, after all responses have been read, if the error policy
+        requires it
+        """
+        if self.coalesce_queries and all(queries):
+            return self._coalesced_exchange(commands, queries, self._current_error_policy(error_policy))
+        return self._serialized_exchange(commands, queries, error_policy)
+
+    def _coalesced_exchange(self, commands, queries, error_policy):
+        # Threads that make the same queries while they are in flight wait for their answers instead of sending them
+        key = (tuple(commands), error_policy)
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                # Waiters giving up can not cancel it
+                future.set_running_or_notify_cancel()
+        if not owner:
+            return list(self._wait(future))
+        try:
+            data = self._serialized_exchange(commands, queries, error_policy)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _serialized_exchange(self, commands, queries, error_policy):
+        worker = self._worker
+        if worker is not None and worker.running and not worker.is_current():
+            future = worker.submit(commands, queries, self._current_error_policy(error_policy))
+            return self._wait(future)
+        with self._locked():
+            return self._cached_transfer(commands, queries, error_policy)
+
+    def _cached_transfer(self, commands, queries, error_policy):
+        # Must be called with the lock taken
+        to_send, to_send_queries, steps = self._prepare_caches(commands, queries)
+        data, checked = [], False
+        if to_send:
+            try:
+                data, checked = self._transfer(to_send, sum(to_send_queries), error_policy)
+            except BaseException:
+                self._clear_caches()
+                raise
+        return self._merge_caches(steps, data, checked)
+
+    # The bookkeeping of the exchanges that does no I/O (caches, instrumentation and error checks) is done by the
+    # following methods, also used by the async backends
+
+    def _prepare_caches(self, commands, queries):
+        # Each cache removes the commands it can answer before the next one. Returns the commands and query flags left
+        # to send, and the steps to merge their answers with the known ones
+        steps = []
+        for cache in (self.setpoint_cache, self.readback_cache):
+            if cache is None or not commands:
+                continue
+            to_send, to_send_queries, known = cache.prepare(commands, queries)
+            steps.append((cache, queries, known, to_send, to_send_queries))
+            commands, queries = to_send, to_send_queries
+        return commands, queries, steps
+
+    @staticmethod
+    def _merge_caches(steps, data, checked):
+        # Update the caches with the answers received and return the answers to all the queries
+        for cache, queries, known, to_send, to_send_queries in reversed(steps):
+            if to_send:
+                cache.update(to_send, to_send_queries, data, checked)
+            data = cache.merge(queries, known, data)
+        return data
+
+    def _begin_transfer(self, commands):
+        # Returns the message and the instrumentation exchange, if any
+        self._clear_lasts()
+        message = ";".join(commands)
+        log.info("Exchanging %s", message)
+        instrumentation = self.instrumentation
+        return message, instrumentation.begin(commands) if instrumentation else None
+
+    def _received(self, exchange, data=None, error=None, numeric=False):
+        if error is None and not numeric:
+            # Answers parsed from bytes are not decoded to text
+            self.last_rx = ";".join(data)
+        if exchange:
+            self.instrumentation.received(exchange, data, error)
+
+    def _checked(self, exchange, checked, error=None):
+        if exchange:
+            self.instrumentation.checked(exchange, checked, error)
+
+    def _transfer(self, commands, num_queries, error_policy, numeric=False, encoded=None):
+        # Must be called with the lock taken. Returns the responses (floats if numeric) and if errors have been checked.
+        # encoded is the message of commands, already validated and encoded
+        message, exchange = self._begin_transfer(commands)
+        try:
+            if encoded is None:
+                self.sock.execute_commands(commands)
+            else:
+                self.sock._sock_send(encoded)
+            self.last_tx = message
+            if numeric:
+                data = self.sock.read_numbers(num_queries)
+            else:
+                data = self.sock.read_responses(num_queries)
+        except Exception as e:
+            self._received(exchange, error=e)
+            raise
+        self._received(exchange, data, numeric=numeric)
+        checked = self._must_check_error(error_policy, commands, num_queries)
+        try:
+            if checked:
+                self.check_if_error()  # if there is an error it raises TTiBackendExc
+        except Exception as e:
+            self._checked(exchange, checked, e)
+            raise
+        self._checked(exchange, checked)
+        return data, checked
+
+    def _clear_caches(self):
+        # Setpoints and readbacks changed by messages that did not go through the caches
+        for cache in (self.setpoint_cache, self.readback_cache):
+            if cache is not None:
+                cache.clear()
+
+    def _wait(self, future):
+        # Wait for the result of a request to the I/O worker within the deadline of the thread
+        deadline = getattr(self._local, 'deadline', None)
+        try:
+            return future.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            raise TTiBackendTimeout("Deadline exceeded waiting for the I/O worker")
+
+    def start_worker(self, max_commands=32):
+        """
+        Serve the calls of every thread from a single I/O worker thread, see worker.IOWorker. Calls waiting for the
+        power supply are sent together, up to max_commands commands on each message
+        """
+        if self._worker is None:
+            self._worker = IOWorker(self, max_commands).start()
+        return self._worker
+
+    def stop_worker(self):
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.stop()
+
+    def submit(self, name, *args, **kwargs):
+        """
+        Call the backend method name and return a concurrent.futures.Future with its result instead of waiting for
+        it. Without I/O worker the call is made now and the future returned is already done
+        """
+        batch = CommandBatch(self)
+        getattr(batch, name)(*args, **kwargs)
+        commands, queries, pending = batch._take_pending()
+        has_query = any(queries)
+        result = Future()
+
+        def parse(done):
+            try:
+                results = batch._parse_results(pending, done.result())
+            except BaseException as e:
+                result.set_exception(e)
+            else:
+                result.set_result(results[0] if has_query else None)
+
+        if not commands:
+            result.set_result(None)
+        elif self._worker is not None and self._worker.running:
+            self._worker.submit(commands, queries, self._current_error_policy()).add_done_callback(parse)
+        else:
+            done = Future()
+            try:
+                done.set_result(self._exchange(commands, queries))
+            except Exception as e:
+                done.set_exception(e)
+            parse(done)
+        return result
+
+    def add_hook(self, event, hook):
+        """
+        Call hook(event, exchange) on every exchange of commands. See instrumentation.Instrumentation for the events
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+        self.instrumentation.add_hook(event, hook)
+
+    def remove_hook(self, event, hook):
+        self.instrumentation.remove_hook(event, hook)
+
+    def enable_stats(self, precision=5):
+        """
+        Keep counters and latency histograms of the commands sent, returns the instrumentation.CommandStats
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+        return self.instrumentation.enable_stats(precision)
 
     # this function only should be used with commands that returns a response
     def _process_command(self, cmd):
-        with self._lock:
-            self._clear_lasts()
-            log.info("Processing " + cmd)
-
-            # If an error happens with socket it will raise an exception or if
-            # it is not conn
-            self.sock.execute_command(cmd)
-            self.last_tx = cmd
-            data = self.sock.read_response()
-            self.last_rx = data
-            self.check_if_error()  # if there is an error it raises TTiCPXExc
-            return data
+        return self._exchange([cmd], [True])[0]
 
     def _execute_command(self, cmd):
-        with self._lock:
-            self._clear_lasts()
-            log.info("Executing " + cmd)
-            # If an error happens with socket it will raise an exception or if
-            # it is not conn
-            self.sock.execute_command(cmd)
-            self.last_tx = cmd
-            self.check_if_error()  # if there is an error it raises TTiCPXExc
+        self._exchange([cmd], [False])
+
+    def _query(self, cmd, parser=None):
+        data = self._process_command(cmd)
+        if parser:
+            return parser(data)
+        return data
+
+    def _query_many(self, commands, parser):
+        """
+        Send several queries on a single message, parser receives the list of answers. With framing.parse_numbers the
+        answers are parsed straight from the received bytes, unless they go through caches, coalescing or the I/O
+        worker
+        """
+        if parser is parse_numbers and self._reads_directly():
+            with self._locked():
+                return self._transfer(commands, len(commands), None, numeric=True)[0]
+        return parser(self._exchange(commands, [True] * len(commands)))
+
+    def _reads_directly(self):
+        worker = self._worker
+        return (not self.coalesce_queries and self.setpoint_cache is None and self.readback_cache is None
+                and (worker is None or not worker.running or worker.is_current()))
+
+    def batch(self, error_policy=None):
+        """
+        Return a CommandBatch to pipeline several commands on a single message:
+
+            with backend.batch() as b:
+                b.set_voltage(1, 3.3)
+                b.read_current(1)
+            voltage_set, current = b.results
+
+        error_policy overrides the backend error policy for this batch
+        """
+        if error_policy is not None:
+            self._check_error_policy(error_policy)
+        return CommandBatch(self, error_policy)
 
     def _check_output(self, output):
         output = int(output)  # can raise ValueError
@@ -180,10 +724,16 @@ class TTiBackend:
     
     def connect(self, ip, port=9221):
         if self.sock is None:
-            self.sock = SockCommand(ip=ip, port=port, valid_commands=self._valid_commands)
+            self.sock = SockCommand(ip=ip, port=port, valid_commands=self._valid_commands, timeout=self.timeout,
+                                    connect_timeout=self.connect_timeout)
         self.sock.connect(ip, port)
+        if self.setpoint_cache is not None:
+            self.setpoint_cache.clear()
+        if self.readback_cache is not None:
+            self.readback_cache.clear()
 
     def disconnect(self):
+        self.stop_worker()
         self.sock.disconnect()
 
 
@@ -202,10 +752,32 @@ class CommonBackend(TTiBackend):
     For commands that returns information instead of values, no parsing is done
 
     """
+    _setpoint_answers = {
+        'V': ('V{output} {value:.3f}', 0.001),
+        'I': ('I{output} {value:.3f}', 0.001),
+        'OVP': ('VP{output} {value:.3f}', 0.001),
+        'OCP': ('CP{output} {value:.3f}', 0.001),
+        'DELTAV': ('DELTAV{output} {value:.3f}', 0.001),
+        'DELTAI': ('DELTAI{output} {value:.3f}', 0.001),
+    }
+
+    @staticmethod
+    def _parse_prefixed_value(prefix, data):
+        # Parses answers like V1 3.300
+        if data and data.startswith(prefix + " "):
+            match = _VALUE_RE.match(data, len(prefix) + 1)
+            return float(match.groups()[0])
+        raise TTiBackendExc("Command did not return a valid string. Received: {}".format(data))
+
+    @staticmethod
+    def _parse_second_word(data):
+        if data:
+            return data.split()[1]
+        raise TTiBackendExc("Command returned {}".format(data))
 
-    def _get_status(self, output):
+    def _get_status(self, output, parser=None):
         cmd = "OP{}?".format(self._check_output(output))
-        return self._process_command(cmd)
+        return self._query(cmd, parser)
 
     def _set_mode(self, mode):
         m = int(mode)
@@ -215,11 +787,33 @@ class CommonBackend(TTiBackend):
         cmd = "CONFIG {}".format(mode)
         return self._execute_command(cmd)
 
-    def _get_mode(self):
-        return self._process_command("CONFIG?")
+    def _get_mode(self, parser=None):
+        return self._query("CONFIG?", parser)
 
     # COMMANDS
 
+    def snapshot(self, outputs=None):
+        """
+        Read measured voltage and current, configured voltage and current limit, OVP, OCP and status of outputs
+        (all of them by default) on a single message.
+        Returns a NumPy structured array if NumPy is available or a telemetry.Snapshot otherwise, with one row per
+        output and fields telemetry.SNAPSHOT_FIELDS
+        """
+        if outputs is None:
+            outputs = range(1, self.n_outputs + 1)
+        outputs = [self._check_output(output) for output in outputs]
+        commands = [query.format(output) for output in outputs for query in SNAPSHOT_QUERIES]
+        return self._query_many(commands, partial(make_snapshot, outputs))
+
+    def status_snapshot(self):
+        """
+        Read the status registers (*ESR?, EER?, QER?, *STB? and LSR of every output) on a single message and return
+        them as a status.StatusSnapshot. Reading them clears the event registers, so errors reported on the snapshot
+        are not raised by later error checks
+        """
+        commands = StatusSnapshot.queries(range(1, self.n_outputs + 1))
+        return self._query_many(commands, StatusSnapshot.from_answers)
+
     def set_mode_independent(self):
         self._set_mode(SlaveModes.independent)
 
@@ -227,10 +821,10 @@ class CommonBackend(TTiBackend):
         self._set_mode(SlaveModes.tracking)
 
     def is_independent_mode(self):
-        return int(self._get_mode()) == SlaveModes.independent
+        return self._get_mode(lambda data: int(data) == SlaveModes.independent)
 
     def is_tracking_mode(self):
-        return int(self._get_mode()) == SlaveModes.tracking
+        return self._get_mode(lambda data: int(data) == SlaveModes.tracking)
 
     # Not exposed as it should only be read from check_error
     # def read_register_standard_event_status(self):
@@ -271,7 +865,7 @@ class CommonBackend(TTiBackend):
         return self._process_command("IFUNLOCK")
 
     def is_IST(self):
-        return self._process_command("*IST?") == "1"
+        return self._query("*IST?", lambda data: data == "1")
 
     def get_register_query_error(self):
         return self._process_command("QER?")
@@ -301,11 +895,11 @@ class CommonBackend(TTiBackend):
         return self._process_command("*ESE?")
 
     def set_register_limit_event_status(self, output, value):
-        cmd = "*LSE{} {}".format(self._check_output(output), value)
+        cmd = "LSE{} {}".format(self._check_output(output), value)
         self._execute_command(cmd)
 
     def get_register_limit_event_status(self, output):
-        cmd = "*LSE{}?".format(self._check_output(output))
+        cmd = "LSE{}?".format(self._check_output(output))
         return self._process_command(cmd)
 
     def save(self, output, store):
@@ -370,10 +964,10 @@ class CommonBackend(TTiBackend):
         self._execute_command(cmd)
 
     def is_enabled(self, output):
-        return int(self._get_status(self._check_output(output))) == 1
+        return self._get_status(output, lambda data: int(data) == 1)
 
     def is_disabled(self, output):
-        return int(self._get_status(self._check_output(output))) == 0
+        return self._get_status(output, lambda data: int(data) == 0)
 
     def set_voltage(self, output, volts):
         cmd = "V{} {}".format(self._check_output(output), float(volts))
@@ -388,13 +982,9 @@ class CommonBackend(TTiBackend):
         """
         Return the output configured voltage value
         """
-        cmd = "V{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            match = re.match(f"V{output} ([0-9,\.,\-,e]*)", data)
-            if match:
-                return float(match.groups()[0])
-        raise TTiBackendExc("Command did not return a valid string. Received: {}".format(data))
+        output = self._check_output(output)
+        cmd = "V{}?".format(output)
+        return self._query(cmd, partial(self._parse_prefixed_value, f"V{output}"))
 
     # Reads the voltage of an output
     def read_voltage(self, output):
@@ -406,10 +996,7 @@ class CommonBackend(TTiBackend):
         Over Voltage Protection
         """
         cmd = "OVP{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            return data.split()[1]
-        raise TTiBackendExc("Command returned {}".format(data))
+        return self._query(cmd, self._parse_second_word)
 
     def set_OVP(self, output, volts):
         cmd = "OVP{} {}".format(self._check_output(output), float(volts))
@@ -421,10 +1008,7 @@ class CommonBackend(TTiBackend):
 
     def get_delta_voltage(self, output):
         cmd = "DELTAV{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            return data.split()[1]
-        raise TTiBackendExc("Command returned {}".format(data))
+        return self._query(cmd, self._parse_second_word)
 
     def inc_voltage(self, output):
         """
@@ -456,13 +1040,9 @@ class CommonBackend(TTiBackend):
         """
         Return the output configured voltage value
         """
-        cmd = "I{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            match = re.match(fr"I{output} ([0-9,\.,\-,e]*)", data)
-            if match:
-                return float(match.groups()[0])
-        raise TTiBackendExc("Command did not return a valid string. Received: {}".format(data))
+        output = self._check_output(output)
+        cmd = "I{}?".format(output)
+        return self._query(cmd, partial(self._parse_prefixed_value, f"I{output}"))
 
     # Reads the current of an output
     def read_current(self, output):
@@ -475,10 +1055,7 @@ class CommonBackend(TTiBackend):
 
     def get_OCP(self, output):
         cmd = "OCP{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            return data.split()[1]
-        raise TTiBackendExc("Command returned {}".format(data))
+        return self._query(cmd, self._parse_second_word)
 
     def set_delta_current_limit(self, output, amps):
         cmd = "DELTAI{} {}".format(self._check_output(output), float(amps))
@@ -486,10 +1063,7 @@ class CommonBackend(TTiBackend):
 
     def get_delta_current(self, output):
         cmd = "DELTAI{}?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            return data.split()[1]
-        raise TTiBackendExc("Command returned {}".format(data))
+        return self._query(cmd, self._parse_second_word)
 
     def inc_current_limit(self, output):
         cmd = "INCI{}".format(self._check_output(output))
@@ -504,8 +1078,8 @@ class CPxBackend(CommonBackend):
     """
     There are no differences between common and CPx
     """
-    def __init__(self, num_outputs=1):
-        super().__init__(valid_commands=TTiCPxCommands(), num_outputs=num_outputs)
+    def __init__(self, num_outputs=1, **kwargs):
+        super().__init__(valid_commands=TTiCPxCommands(), num_outputs=num_outputs, **kwargs)
 
 
 class IRangeValues:
@@ -514,9 +1088,22 @@ class IRangeValues:
 
 
 class PLBackend(CommonBackend):
+    # PL068 answers OVP and OCP queries with the value only
+    _setpoint_answers = dict(CommonBackend._setpoint_answers,
+                             OVP=('{value:.3f}', 0.001),
+                             OCP=('{value:.4f}', 0.0001))
 
-    def __init__(self, num_outputs=1):
-        super().__init__(valid_commands=TTiPLCommands(), num_outputs=num_outputs)
+    def __init__(self, num_outputs=1, **kwargs):
+        super().__init__(valid_commands=TTiPLCommands(), num_outputs=num_outputs, **kwargs)
+
+    @staticmethod
+    def _parse_unit_value(unit, data):
+        # Parses answers like 3.300V
+        if data:
+            match = _UNIT_VALUE_RE[unit].match(data)
+            if match:
+                return float(match.groups()[0])
+        raise TTiBackendExc(f"Data received not valid. Received: {data}")
 
     def set_irange(self, output, value):
         if int(value) not in (1, 2):
@@ -526,7 +1113,7 @@ class PLBackend(CommonBackend):
 
     def get_irange(self, output):
         cmd = f"IRANGE{self._check_output(output)}?"
-        return int(self._process_command(cmd))
+        return self._query(cmd, int)
 
     def get_ipaddr(self):
         cmd = "IPADDR?"
@@ -547,7 +1134,7 @@ class PLBackend(CommonBackend):
         it simply returns the value in Volts
         """
         cmd = "OVP{}?".format(self._check_output(output))
-        return float(self._process_command(cmd))
+        return self._query(cmd, float)
 
     def get_OCP(self, output):
         """
@@ -556,7 +1143,7 @@ class PLBackend(CommonBackend):
         it simply returns the value in Amperes
         """
         cmd = "OCP{}?".format(self._check_output(output))
-        return float(self._process_command(cmd))
+        return self._query(cmd, float)
 
     def read_voltage(self, output):
         """
@@ -566,12 +1153,7 @@ class PLBackend(CommonBackend):
         :return: voltage value, float
         """
         cmd = "V{}O?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            match = re.match(r"([0-9,\.,e,\-]*)V", data)
-            if match:
-                return float(match.groups()[0])
-        raise TTiBackendExc(f"Data received not valid. Received: {data}")
+        return self._query(cmd, partial(self._parse_unit_value, "V"))
 
     def read_current(self, output):
         """
@@ -581,9 +1163,4 @@ class PLBackend(CommonBackend):
         :return: voltage value, float
         """
         cmd = "I{}O?".format(self._check_output(output))
-        data = self._process_command(cmd)
-        if data:
-            match = re.match(r"([0-9,\.,e,\-]*)A", data)
-            if match:
-                return float(match.groups()[0])
-        raise TTiBackendExc(f"Data received not valid. Received: {data}")
+        return self._query(cmd, partial(self._parse_unit_value, "A"))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Latency and throughput benchmarks of the backends.
+
+    pyttilan-bench --simulate --model PL068 --output results.json
+    pyttilan-bench --ip 172.16.7.253 --model PL068
+
+Measures, against a real power supply or a simulated one:
+ * round trip latency percentiles of queries and set commands
+ * commands per second of query and set workloads, one by one and in batches
+ * overhead of the error check (*ESR?) after each command
+ * cost of Commands.validate_command
+ * cost of parsing answers
+
+Results are written as JSON so they can be compared between releases.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import argparse
+import json
+import platform
+import sys
+import time
+from importlib import metadata
+
+from pyttilan.backend import PLBackend, CPxBackend, ErrorPolicy
+from pyttilan.telemetry import make_snapshot
+from pyttilan.framing import parse_number
+
+BACKENDS = {'PL068': PLBackend, 'PL303QMD': PLBackend, 'CPX400DP': CPxBackend}
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    """
+    Return a dictionary with min, mean, max and the requested percentiles of samples
+    """
+    ordered = sorted(samples)
+    n = len(ordered)
+    result = {'n': n}
+    if not n:
+        return result
+    result['min'] = ordered[0]
+    result['mean'] = sum(ordered) / n
+    result['max'] = ordered[-1]
+    for p in points:
+        result[f"p{p:g}"] = ordered[min(n - 1, int(round(p / 100 * (n - 1))))]
+    return result
+
+
+def time_calls(func, count):
+    """
+    Call func count times and return the duration of each call in seconds
+    """
+    durations = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def time_per_call(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def bench_latency(backend, count):
+    results = {}
+    with backend.using_error_policy(ErrorPolicy.never):
+        results['query'] = percentiles(time_calls(lambda: backend.read_voltage(1), count))
+        results['set'] = percentiles(time_calls(lambda: backend.set_voltage(1, 1.0), count))
+    with backend.using_error_policy(ErrorPolicy.always):
+        results['query_checked'] = percentiles(time_calls(lambda: backend.read_voltage(1), count))
+        results['set_checked'] = percentiles(time_calls(lambda: backend.set_voltage(1, 1.0), count))
+    return results
+
+
+def bench_throughput(backend, count, batch_size):
+    def batch_of_queries():
+        with backend.batch() as b:
+            for _ in range(batch_size):
+                b.read_voltage(1)
+
+    results = {
+        'query': 1 / time_per_call(lambda: backend.read_voltage(1), count),
+        'set': 1 / time_per_call(lambda: backend.set_voltage(1, 1.0), count),
+        'query_batched': batch_size / time_per_call(batch_of_queries, max(1, count // batch_size)),
+    }
+    return {name: round(value, 1) for name, value in results.items()}
+
+
+def bench_error_check(backend, count):
+    with backend.using_error_policy(ErrorPolicy.never):
+        unchecked = time_per_call(lambda: backend.read_voltage(1), count)
+    with backend.using_error_policy(ErrorPolicy.always):
+        checked = time_per_call(lambda: backend.read_voltage(1), count)
+    return {'unchecked_s': unchecked, 'checked_s': checked, 'overhead_s': checked - unchecked,
+            'overhead_ratio': checked / unchecked if unchecked else None}
+
+
+def bench_validation(backend, count):
+    commands = ["V1 3.3", "I1O?", "V1O?", "OP1 1", "*ESR?", "EER?", "*IDN?", "OVP1 4.0"]
+    validator = backend._valid_commands
+    per_command = time_per_call(lambda: [validator.validate_command(c) for c in commands], count) / len(commands)
+    return {'per_command_s': per_command}
+
+
+def bench_parsing(backend, count):
+    # Only the PL series parses readbacks with their units, CPx answers are parsed as plain numbers
+    parse_unit_value = getattr(backend, '_parse_unit_value', None)
+    if parse_unit_value is not None:
+        parse_voltage = lambda: parse_unit_value("V", "3.300V")
+    else:
+        parse_voltage = lambda: parse_number("3.300V")
+    parse_setpoint = backend._parse_prefixed_value
+    answers = ["3.300V", "0.100A", "V1 3.300", "I1 0.500", "4.000", "2.2000", "1"]
+    return {
+        'read_voltage_s': time_per_call(parse_voltage, count),
+        'read_voltage_bytes_s': time_per_call(lambda: parse_number(b"3.300V"), count),
+        'configured_voltage_s': time_per_call(lambda: parse_setpoint("V1", "V1 3.300"), count),
+        'snapshot_per_output_s': time_per_call(lambda: make_snapshot([1], answers), count),
+    }
+
+
+def run(backend, count=1000, batch_size=10):
+    return {
+        'latency_s': bench_latency(backend, count),
+        'throughput_per_s': bench_throughput(backend, count, batch_size),
+        'error_check': bench_error_check(backend, count),
+        'validation': bench_validation(backend, count * 10),
+        'parsing': bench_parsing(backend, count * 10),
+    }
+
+
+def _version():
+    try:
+        return metadata.version('pyttilan')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmarks of pyttilan backends")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--ip', help="IP of the power supply to benchmark")
+    target.add_argument('--simulate', action='store_true', help="benchmark against a local simulated power supply")
+    parser.add_argument('--port', type=int, default=9221)
+    parser.add_argument('--model', choices=sorted(BACKENDS), default='PL068')
+    parser.add_argument('--count', type=int, default=1000, help="calls per measurement")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help="latency of the simulated power supply")
+    parser.add_argument('--output', help="write results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    simulator = None
+    host, port = args.ip, args.port
+    if args.simulate:
+        from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+        simulator = SimulatorThread(SimulatorServer(Instrument(args.model), latency=args.latency)).start()
+        host, port = simulator.host, simulator.ports[0]
+
+    backend = BACKENDS[args.model]()
+    backend.connect(host, port)
+    try:
+        results = {
+            'pyttilan': _version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'target': 'simulator' if simulator else f"{host}:{port}",
+            'model': args.model,
+            'count': args.count,
+            'results': run(backend, args.count, args.batch_size),
+        }
+    finally:
+        backend.disconnect()
+        if simulator:
+            simulator.stop()
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Caches of values of the power supplies, to avoid sending commands whose result is already known
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import re
+import time
+
+from pyttilan.telemetry import parse_number
+from pyttilan.instrumentation import command_key
+
+# Commands that set a setpoint: V1 3.3, V1V 3.3, OVP1 4.0, DELTAI2 0.01...
+_SETPOINT_RE = re.compile(r"(V|I|OVP|OCP|DELTAV|DELTAI)([1-3])V? (\S+)$")
+# Queries of setpoints: V1?, OVP1?...
+_SETPOINT_QUERY_RE = re.compile(r"(V|I|OVP|OCP|DELTAV|DELTAI)([1-3])\?$")
+# Commands that change setpoints without saying the new value
+_INVALIDATE_ALL_RE = re.compile(r"\*RST|RCL|CONFIG")
+_INVALIDATE_OUTPUT_RE = re.compile(r"(INCV|DECV|INCI|DECI|IRANGE)([1-3])")
+_INVALIDATED_SETPOINT = {'INCV': 'V', 'DECV': 'V', 'INCI': 'I', 'DECI': 'I', 'IRANGE': 'I'}
+
+
+class SetpointCache:
+    """
+    Write-through cache of the setpoints of a power supply (V, I, OVP, OCP, DELTAV and DELTAI of each output).
+
+    The cache stores the answer the power supply gives to the query of each setpoint. Answers are remembered when a
+    query is sent and built from the value when a set command succeeds, using answers: a dictionary from setpoint
+    mnemonic to (answer format, resolution). Format receives output and value, like 'V{output} {value:.3f}'.
+
+    Queries of known setpoints are answered from the cache and set commands whose value does not differ from the
+    known one by half the resolution or more are not sent. Commands that change setpoints in other ways (*RST,
+    RCL, CONFIG, INCV, DECV, INCI, DECI, IRANGE) invalidate the affected values.
+    """
+
+    def __init__(self, answers):
+        self._formats = answers
+        self._answers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._answers.clear()
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._answers)}
+
+    def _unchanged(self, key, mnemonic, value):
+        answer = self._answers.get(key)
+        if answer is None:
+            return False
+        try:
+            value = float(value)
+            known = parse_number(answer)
+        except ValueError:
+            return False
+        return abs(value - known) < self._formats[mnemonic][1] / 2
+
+    def prepare(self, commands, queries):
+        """
+        Remove from commands the ones that do not need to be sent.
+        Returns the commands to send, their query flags and a dictionary of the answers known for the removed
+        queries, indexed by their position in commands
+        """
+        to_send = []
+        to_send_queries = []
+        known = {}
+        for i, (cmd, is_query) in enumerate(zip(commands, queries)):
+            if is_query and _SETPOINT_QUERY_RE.match(cmd):
+                if cmd in self._answers:
+                    self.hits += 1
+                    known[i] = self._answers[cmd]
+                    continue
+                self.misses += 1
+            elif not is_query:
+                match = _SETPOINT_RE.match(cmd)
+                if match:
+                    mnemonic, output, value = match.groups()
+                    if self._unchanged(f"{mnemonic}{output}?", mnemonic, value):
+                        self.hits += 1
+                        continue
+                    self.misses += 1
+            to_send.append(cmd)
+            to_send_queries.append(is_query)
+        return to_send, to_send_queries, known
+
+    @staticmethod
+    def merge(queries, known, data):
+        """
+        Return the answers to all queries of an exchange, merging the answers received (data) and the known ones
+        """
+        received = iter(data)
+        return [known[i] if i in known else next(received) for i, is_query in enumerate(queries) if is_query]
+
+    def update(self, commands, queries, data, checked):
+        """
+        Update the cache after an exchange of commands whose answers are data. checked tells if the error registers
+        were checked after the exchange, values of set commands are only trusted when they were
+        """
+        answers = iter(data)
+        for cmd, is_query in zip(commands, queries):
+            if is_query:
+                answer = next(answers)
+                if _SETPOINT_QUERY_RE.match(cmd):
+                    self._answers[cmd] = answer
+                continue
+            match = _SETPOINT_RE.match(cmd)
+            if match:
+                mnemonic, output, value = match.groups()
+                key = f"{mnemonic}{output}?"
+                try:
+                    answer_format = self._formats[mnemonic][0]
+                    if not checked:
+                        raise ValueError()
+                    self._answers[key] = answer_format.format(output=output, value=float(value))
+                except (KeyError, ValueError):
+                    self._answers.pop(key, None)
+            elif _INVALIDATE_ALL_RE.match(cmd):
+                self.clear()
+            else:
+                match = _INVALIDATE_OUTPUT_RE.match(cmd)
+                if match:
+                    mnemonic, output = match.groups()
+                    self._answers.pop(f"{_INVALIDATED_SETPOINT[mnemonic]}{output}?", None)
+
+
+# Readback queries that can be cached by ReadbackCache and their default time to live in seconds, by command_key
+READBACK_TTLS = {'VnO?': 0.1, 'InO?': 0.1, 'POWERn?': 0.1, 'OPn?': 0.5, 'LSRn?': 0.05}
+# Output number of the commands addressed to an output: V1 3.3, OP2 1, LSE1 4...
+_OUTPUT_RE = re.compile(r"[A-Z*]+([1-3])")
+
+
+def _output(command):
+    match = _OUTPUT_RE.match(command)
+    return match.group(1) if match else None
+
+
+class ReadbackCache:
+    """
+    Cache of the answers to readback queries (V1O?, I1O?, OP1?, LSR1?...) that are valid for a short time.
+
+    ttls is a dictionary from command_key of the query ('VnO?', 'LSRn?'...) to the seconds an answer is reused,
+    only queries on it are cached. Any command sent to an output that is not a query invalidates the answers of that
+    output, commands that are not sent to an output (OPALL, *RST, RCL...) invalidate all of them.
+    """
+
+    def __init__(self, ttls=None):
+        self.ttls = dict(READBACK_TTLS if ttls is None else ttls)
+        self._answers = {}  # query: (answer, expiration time)
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._answers.clear()
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._answers)}
+
+    def prepare(self, commands, queries):
+        """
+        Like SetpointCache.prepare, removes the queries whose answers are known and have not expired
+        """
+        now = time.monotonic()
+        to_send = []
+        to_send_queries = []
+        known = {}
+        for i, (cmd, is_query) in enumerate(zip(commands, queries)):
+            if is_query and command_key(cmd) in self.ttls:
+                cached = self._answers.get(cmd)
+                if cached is not None and cached[1] > now:
+                    self.hits += 1
+                    known[i] = cached[0]
+                    continue
+                self.misses += 1
+            to_send.append(cmd)
+            to_send_queries.append(is_query)
+        return to_send, to_send_queries, known
+
+    merge = staticmethod(SetpointCache.merge)
+
+    def update(self, commands, queries, data, checked):
+        now = time.monotonic()
+        answers = iter(data)
+        for cmd, is_query in zip(commands, queries):
+            if is_query:
+                answer = next(answers)
+                ttl = self.ttls.get(command_key(cmd))
+                if ttl is not None:
+                    self._answers[cmd] = (answer, now + ttl)
+                continue
+            output = _output(cmd)
+            if output is None:
+                self.clear()
+            else:
+                # Queries that are not addressed to an output are invalidated too
+                for query in [q for q in self._answers if _output(q) in (output, None)]:
+                    del self._answers[query]
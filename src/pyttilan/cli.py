@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Command line tool to use TTi power supplies from scripts.
+
+    pyttilan idn 172.16.7.253 172.16.7.254:9221
+    pyttilan get 172.16.7.253:1 voltage
+    pyttilan set 172.16.7.253:1 voltage 3.3
+    pyttilan monitor 172.16.7.253:1 172.16.7.254:1 172.16.7.254:2 --rate 10 --format csv
+    pyttilan discover 172.16.7.0/24 --inventory supplies.json
+    pyttilan proxy 172.16.7.253 --unix /tmp/pl068.sock
+    pyttilan bench --ip 172.16.7.253
+
+Targets are host:output, or host:port:output when the power supply does not listen on the default port.
+
+monitor opens a single connection per power supply and reads all the channels of all its outputs on a single
+message per tick, all the power supplies concurrently, so it keeps up with dozens of them.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+import time
+
+from pyttilan.backend import PLBackend, CPxBackend, TTiBackendExc, ErrorPolicy
+from pyttilan.aio import AsyncPLBackend, AsyncCPxBackend
+from pyttilan.framing import parse_numbers
+from pyttilan.telemetry import CHANNEL_QUERIES
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9221
+SERIES = {'pl': (PLBackend, AsyncPLBackend), 'cpx': (CPxBackend, AsyncCPxBackend)}
+SETTERS = {'voltage': 'set_voltage', 'current_limit': 'set_current_limit', 'ovp': 'set_OVP', 'ocp': 'set_OCP'}
+
+
+def parse_target(target, port=DEFAULT_PORT, output=None):
+    """
+    Split a target like host, host:output or host:port:output in (host, port, output). output is the default when
+    it is not given
+    """
+    parts = target.split(':')
+    if len(parts) == 1:
+        return parts[0], port, output
+    if len(parts) == 2:
+        return parts[0], port, int(parts[1])
+    if len(parts) == 3:
+        return parts[0], int(parts[1]), int(parts[2])
+    raise ValueError(f"Invalid target {target}, expected host:output or host:port:output")
+
+
+def parse_address(address, port=DEFAULT_PORT):
+    """
+    Split an address like host or host:port in (host, port)
+    """
+    host, _, address_port = address.partition(':')
+    return host, int(address_port) if address_port else port
+
+
+def _connect(args, host, port, num_outputs=1):
+    backend = SERIES[args.series][0](num_outputs=num_outputs, timeout=args.timeout)
+    backend.connect(host, port)
+    return backend
+
+
+def cmd_idn(args):
+    for target in args.targets:
+        host, port = parse_address(target, args.port)
+        backend = _connect(args, host, port)
+        try:
+            print(f"{host}:{port} {backend.get_identifier()}")
+        finally:
+            backend.disconnect()
+    return 0
+
+
+def cmd_get(args):
+    host, port, output = parse_target(args.target, args.port, 1)
+    backend = _connect(args, host, port, num_outputs=output)
+    try:
+        values = backend._query_many([CHANNEL_QUERIES[q].format(output) for q in args.quantities], parse_numbers)
+    finally:
+        backend.disconnect()
+    print(" ".join(f"{value:g}" for value in values))
+    return 0
+
+
+def cmd_set(args):
+    host, port, output = parse_target(args.target, args.port, 1)
+    backend = _connect(args, host, port, num_outputs=output)
+    try:
+        if args.quantity == 'enabled':
+            on = args.value.lower() in ('1', 'on', 'true')
+            (backend.enable_output_channel if on else backend.disable_output_channel)(output)
+        else:
+            getattr(backend, SETTERS[args.quantity])(output, float(args.value))
+    finally:
+        backend.disconnect()
+    return 0
+
+
+class _Supply:
+    # Connection to a power supply and the outputs of it that are monitored
+    def __init__(self, backend, host, port, outputs, channels):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}" if port != DEFAULT_PORT else host
+        self.outputs = outputs
+        self.commands = [CHANNEL_QUERIES[channel].format(output) for output in outputs for channel in channels]
+
+
+def _group_targets(targets, port):
+    supplies = {}
+    for target in targets:
+        host, target_port, output = parse_target(target, port, 1)
+        outputs = supplies.setdefault((host, target_port), [])
+        if output not in outputs:
+            outputs.append(output)
+    return supplies
+
+
+class _Writer:
+    # Formats rows as NDJSON or CSV on a memory buffer, written to the output once per tick
+    def __init__(self, fp, fmt, channels):
+        self._fp = fp
+        self._channels = channels
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer, lineterminator="\n") if fmt == 'csv' else None
+        if self._csv:
+            self._csv.writerow(['timestamp', 'target'] + list(channels))
+
+    def row(self, timestamp, target, values):
+        if self._csv:
+            self._csv.writerow([f"{timestamp:.6f}", target] + [f"{v:g}" for v in values])
+        else:
+            record = {'timestamp': round(timestamp, 6), 'target': target}
+            record.update(zip(self._channels, values))
+            self._buffer.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        data = self._buffer.getvalue()
+        if data:
+            self._fp.write(data)
+            self._fp.flush()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+
+async def monitor(targets, channels, rate, fp, fmt='ndjson', series='pl', port=DEFAULT_PORT, count=None,
+                  duration=None, timeout=1.0):
+    """
+    Read channels of every target rate times per second and write them to fp. Stops after count ticks or duration
+    seconds, if given
+    """
+    async_class = SERIES[series][1]
+    supplies = []
+    for (host, supply_port), outputs in _group_targets(targets, port).items():
+        # Ticks only have queries, errors of other clients are not checked on them
+        backend = async_class(num_outputs=max(outputs), timeout=timeout, error_policy=ErrorPolicy.writes_only)
+        supplies.append(_Supply(backend, host, supply_port, outputs, channels))
+    await asyncio.gather(*(s.backend.connect(s.host, s.port) for s in supplies))
+    writer = _Writer(fp, fmt, channels)
+    period = 1.0 / rate
+    n_channels = len(channels)
+    deadline = time.monotonic()
+    end = deadline + duration if duration else None
+    ticks = 0
+    try:
+        while (count is None or ticks < count) and (end is None or time.monotonic() < end):
+            timestamp = time.time()
+            results = await asyncio.gather(
+                *(s.backend._query_many(s.commands, parse_numbers) for s in supplies), return_exceptions=True)
+            for supply, values in zip(supplies, results):
+                if isinstance(values, Exception):
+                    log.warning("Error reading %s: %s", supply.name, values)
+                    continue
+                for i, output in enumerate(supply.outputs):
+                    writer.row(timestamp, f"{supply.name}:{output}", values[i * n_channels:(i + 1) * n_channels])
+            writer.flush()
+            ticks += 1
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Do not try to catch up with the ticks lost
+                deadline = time.monotonic()
+    finally:
+        writer.flush()
+        await asyncio.gather(*(s.backend.disconnect() for s in supplies), return_exceptions=True)
+    return ticks
+
+
+def cmd_monitor(args):
+    channels = args.channels.split(',')
+    for channel in channels:
+        if channel not in CHANNEL_QUERIES:
+            raise SystemExit(f"Unknown channel {channel}, valid channels are {', '.join(CHANNEL_QUERIES)}")
+    fp = open(args.output, 'w', buffering=1 << 16) if args.output else sys.stdout
+    try:
+        asyncio.run(monitor(args.targets, channels, args.rate, fp, args.format, args.series, args.port, args.count,
+                            args.duration, args.timeout))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.output:
+            fp.close()
+    return 0
+
+
+def cmd_discover(args):
+    from pyttilan.discovery import discover
+    ports = [int(port) for port in args.ports.split(',')]
+    inventory = discover(args.addresses, ports, cache=args.inventory, max_age=args.max_age, timeout=args.timeout)
+    for device in sorted(inventory, key=lambda d: (d.host, d.port)):
+        print(f"{device.host}:{device.port} {device.model} serial={device.serial} outputs={device.num_outputs} "
+              f"backend={device.backend_class.__name__}")
+    return 0
+
+
+def cmd_proxy(args):
+    from pyttilan.proxy import ProxyServer
+    from pyttilan.commands import TTiPLCommands, TTiCPxCommands
+    host, port = parse_address(args.target, args.port)
+    listen_host, listen_port = parse_address(args.listen, 9221)
+    valid_commands = TTiPLCommands() if args.series == 'pl' else TTiCPxCommands()
+    proxy = ProxyServer(host, port, valid_commands, listen_host, listen_port, path=args.unix,
+                        max_commands=args.max_commands, timeout=args.timeout)
+
+    async def serve():
+        await proxy.start()
+        log.info("Serving %s:%s on %s", host, port, args.unix or f"{proxy.listen_host}:{proxy.listen_port}")
+        try:
+            await proxy.serve_forever()
+        finally:
+            await proxy.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == 'bench':
+        from pyttilan.bench import main as bench_main
+        return bench_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog='pyttilan', description="Control TTi power supplies over the network")
+    parser.add_argument('--series', choices=sorted(SERIES), default='pl', help="series of the power supplies")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port of targets that do not give it")
+    parser.add_argument('--timeout', type=float, default=2.0, help="seconds to wait for each answer")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    idn = commands.add_parser('idn', help="print the identification of power supplies")
+    idn.add_argument('targets', nargs='+', metavar='host[:port]')
+    idn.set_defaults(func=cmd_idn)
+
+    get = commands.add_parser('get', help="print values of an output")
+    get.add_argument('target', metavar='host:output')
+    get.add_argument('quantities', nargs='+', choices=sorted(CHANNEL_QUERIES))
+    get.set_defaults(func=cmd_get)
+
+    set_ = commands.add_parser('set', help="set a value of an output")
+    set_.add_argument('target', metavar='host:output')
+    set_.add_argument('quantity', choices=sorted(SETTERS) + ['enabled'])
+    set_.add_argument('value')
+    set_.set_defaults(func=cmd_set)
+
+    mon = commands.add_parser('monitor', help="stream values of many outputs")
+    mon.add_argument('targets', nargs='+', metavar='host:output')
+    mon.add_argument('--channels', default='voltage,current,enabled',
+                     help=f"comma separated list of {', '.join(CHANNEL_QUERIES)}")
+    mon.add_argument('--rate', type=float, default=1.0, help="readings per second")
+    mon.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    mon.add_argument('--output', help="write to this file instead of stdout")
+    mon.add_argument('--count', type=int, help="stop after this number of readings")
+    mon.add_argument('--duration', type=float, help="stop after this number of seconds")
+    mon.set_defaults(func=cmd_monitor)
+
+    disc = commands.add_parser('discover', help="find power supplies on the network")
+    disc.add_argument('addresses', nargs='+', help="hosts, networks (172.16.7.0/24) or ranges (10.0.0.1-10.0.0.20)")
+    disc.add_argument('--ports', default=str(DEFAULT_PORT), help="comma separated list of ports to probe")
+    disc.add_argument('--inventory', help="inventory file, loaded instead of scanning if it is recent enough")
+    disc.add_argument('--max-age', type=float, default=3600, help="seconds an inventory file is valid")
+    disc.set_defaults(func=cmd_discover)
+
+    prx = commands.add_parser('proxy', help="share the connection to a power supply between many clients")
+    prx.add_argument('target', metavar='host[:port]')
+    prx.add_argument('--listen', default='127.0.0.1:9221', metavar='HOST:PORT', help="address clients connect to")
+    prx.add_argument('--unix', metavar='PATH', help="listen on this Unix socket instead of --listen")
+    prx.add_argument('--max-commands', type=int, default=32, help="maximum queries merged on a message")
+    prx.set_defaults(func=cmd_proxy)
+
+    commands.add_parser('bench', help="latency and throughput benchmarks, see pyttilan bench --help")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    try:
+        return args.func(args)
+    except (TTiBackendExc, OSError, ValueError) as e:
+        print(f"pyttilan: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,10 +14,90 @@ __maintainer__ = 'Otger Ballester'
 __email__ = 'otger@ifae.es'
 
 import re
+from functools import lru_cache
+
+
+def _literal_prefix(pattern):
+    """
+    Return the mnemonic every string matched by pattern starts with: the leading run of upper case letters and
+    escaped '*'. Empty if it can not be determined
+    """
+    depth = 0
+    escaped = False
+    for c in pattern:
+        # A top level alternation means the pattern can start with different mnemonics
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return ''
+
+    prefix = ''
+    i = 0
+    while i < len(pattern):
+        if pattern[i].isupper():
+            char, size = pattern[i], 1
+        elif pattern[i:i + 2] == '\\*':
+            char, size = '*', 2
+        else:
+            break
+        if pattern[i + size:i + size + 1] in ('?', '*', '+', '{'):
+            # Quantified char, it may not be there
+            break
+        prefix += char
+        i += size
+    return prefix
+
+
+def _mnemonic(command):
+    i = 0
+    while i < len(command) and (command[i].isupper() or command[i] == '*'):
+        i += 1
+    return command[:i]
+
+
+class _CommandValidator:
+    """
+    Validates commands against a list of regular expressions, giving the same result as trying them all in order.
+
+    Patterns are grouped by the mnemonic they start with, so only the few patterns whose mnemonic is a prefix of the
+    command are tried. Results of already validated commands are kept on a bounded LRU cache
+    """
+
+    def __init__(self, patterns, cache_size=1024):
+        self._by_prefix = {}
+        for index, pattern in enumerate(patterns):
+            self._by_prefix.setdefault(_literal_prefix(pattern), []).append((index, re.compile(pattern)))
+        self._candidates = {}
+        self.validate = lru_cache(maxsize=cache_size)(self._validate)
+
+    def _candidates_for(self, mnemonic):
+        candidates = self._candidates.get(mnemonic)
+        if candidates is None:
+            candidates = []
+            for i in range(len(mnemonic) + 1):
+                candidates.extend(self._by_prefix.get(mnemonic[:i], []))
+            candidates = [regex for _, regex in sorted(candidates, key=lambda c: c[0])]
+            self._candidates[mnemonic] = candidates
+        return candidates
+
+    def _validate(self, command):
+        for regex in self._candidates_for(_mnemonic(command)):
+            a = regex.match(command)
+            if a:
+                return a
+        return None
 
 
 class Commands:
     _valid_commands_re = []
+    # Number of validated commands remembered by the validator of each class
+    validation_cache_size = 1024
 
     @classmethod
     def validate_re_commands(cls):
@@ -27,16 +107,17 @@ class Commands:
         for cmd in cls._valid_commands_re:
             re.compile(cmd)
 
-    def __init__(self):
-        self._compiled = [re.compile(pattern) for pattern in self._valid_commands_re]
+    @classmethod
+    def _get_validator(cls):
+        # Validator is built on first use and shared by all instances of the class
+        validator = cls.__dict__.get('_validator')
+        if validator is None:
+            validator = _CommandValidator(cls._valid_commands_re, cls.validation_cache_size)
+            cls._validator = validator
+        return validator
 
     def validate_command(self, command):
-        a = None
-        for regex in self._compiled:
-            a = regex.match(command)
-            if a:
-                break
-        return a
+        return self._get_validator().validate(command)
 
 
 class TTiCPxCommands(Commands):
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Discovery of TTi power supplies on the LAN and inventory of the ones found.
+
+    devices = asyncio.run(scan("172.16.7.0/24"))
+    inventory = Inventory(devices)
+    inventory.save("supplies.json")
+    backend = inventory.connect("512345")
+
+Every address is probed concurrently: a connection is attempted to the port of the power supplies and, if it is
+accepted, *IDN? identifies the device. The number of outputs is found asking for the voltage setpoint of each output
+(a power supply without that output flags an execution error instead of answering) and the mode of multi-output
+power supplies with CONFIG?.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+
+from pyttilan.backend import PLBackend, CPxBackend
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9221
+MAX_OUTPUTS = 3
+# Backend class of each series, by prefix of the model name
+BACKENDS = {'PL': PLBackend, 'CPX': CPxBackend}
+
+
+@dataclass
+class DeviceInfo:
+    """
+    A power supply found on the network
+    """
+    host: str
+    port: int
+    manufacturer: str
+    model: str
+    serial: str
+    firmware: str
+    num_outputs: int = 1
+    mode: int = None  # backend.SlaveModes value of power supplies with several outputs
+
+    @property
+    def backend_class(self):
+        return backend_class(self.model)
+
+
+def backend_class(model):
+    """
+    Return the backend class for a model name as given by *IDN?, None if the series is not supported
+    """
+    model = model.upper()
+    for prefix, cls in BACKENDS.items():
+        if model.startswith(prefix):
+            return cls
+    return None
+
+
+def parse_identifier(answer):
+    """
+    Split an answer to *IDN? like 'THURLBY THANDAR, PL068-P, 512345, 3.02 - 4.06' in manufacturer, model, serial and
+    firmware. Model is returned without the -P suffix of the PL-P series
+    """
+    fields = [field.strip() for field in answer.split(',')]
+    if len(fields) < 4:
+        raise ValueError(f"Not an answer to *IDN?: {answer}")
+    manufacturer, model, serial, firmware = fields[:4]
+    return manufacturer, model.removesuffix('-P'), serial, firmware
+
+
+async def _ask(reader, writer, message, timeout):
+    writer.write((message + "\n").encode())
+    await writer.drain()
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    if not line:
+        raise ConnectionError("Connection closed")
+    return line.rstrip(b"\r\n").decode(errors='replace')
+
+
+async def probe(host, port=DEFAULT_PORT, timeout=1.0):
+    """
+    Identify the power supply at host:port. Returns a DeviceInfo or None if there is not a TTi power supply
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        manufacturer, model, serial, firmware = parse_identifier(await _ask(reader, writer, "*IDN?", timeout))
+        if backend_class(model) is None:
+            log.info("%s:%s is a %s %s, not a supported power supply", host, port, manufacturer, model)
+            return None
+        # The error flagged when an output is missing is read, so it is not reported to other clients
+        num_outputs = 1
+        answered = True
+        for output in range(2, MAX_OUTPUTS + 1):
+            try:
+                answer = await _ask(reader, writer, f"V{output}?;*ESR?;EER?", timeout)
+            except asyncio.TimeoutError:
+                # Slow units may not answer in time, the device is kept with the outputs found. Its late answer would
+                # be read as the answer of the next query, so nothing more is asked
+                log.info("%s:%s did not answer the probe of output %d", host, port, output)
+                answered = False
+                break
+            if not answer.startswith(f"V{output} "):
+                break
+            num_outputs = output
+        mode = None
+        if num_outputs > 1 and answered:
+            mode = int(await _ask(reader, writer, "CONFIG?", timeout))
+        return DeviceInfo(host, port, manufacturer, model, serial, firmware, num_outputs, mode)
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        log.info("Error probing %s:%s: %s", host, port, e)
+        return None
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def _hosts(addresses):
+    # Expand networks ('172.16.7.0/24') and ranges ('172.16.7.10-172.16.7.20') to host addresses
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    for address in addresses:
+        if '/' in address:
+            yield from (str(host) for host in ipaddress.ip_network(address, strict=False).hosts())
+        elif '-' in address:
+            first, last = (ipaddress.ip_address(a.strip()) for a in address.split('-'))
+            yield from (str(ipaddress.ip_address(n)) for n in range(int(first), int(last) + 1))
+        else:
+            yield address
+
+
+async def scan(addresses, ports=(DEFAULT_PORT,), timeout=0.5, concurrency=512):
+    """
+    Probe every address (host names, IPs, networks like '172.16.7.0/24' or ranges like '10.0.0.1-10.0.0.20') on
+    every port. At most concurrency probes are in progress at the same time. Returns the DeviceInfo of the power
+    supplies found
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited_probe(host, port):
+        async with semaphore:
+            return await probe(host, port, timeout)
+
+    found = await asyncio.gather(*(limited_probe(host, port) for host in _hosts(addresses) for port in ports))
+    return [device for device in found if device is not None]
+
+
+class Inventory:
+    """
+    Power supplies found by scan, indexed by serial number. Can be saved to and loaded from a JSON file.
+    scanned has the addresses and ports that were scanned, if known
+    """
+
+    def __init__(self, devices=(), timestamp=None, scanned=None):
+        self.devices = {device.serial: device for device in devices}
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.scanned = scanned
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices.values())
+
+    def __getitem__(self, serial):
+        return self.devices[serial]
+
+    def save(self, path):
+        data = {'timestamp': self.timestamp, 'scanned': self.scanned,
+                'devices': {serial: asdict(d) for serial, d in self.devices.items()}}
+        with open(path, 'w') as fp:
+            json.dump(data, fp, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            data = json.load(fp)
+        return cls((DeviceInfo(**device) for device in data['devices'].values()), data['timestamp'],
+                   data.get('scanned'))
+
+    def backend(self, serial, **kwargs):
+        """
+        Create a backend, not connected, for the power supply with serial number. kwargs are passed to the backend
+        """
+        device = self.devices[serial]
+        return device.backend_class(num_outputs=device.num_outputs, **kwargs)
+
+    def connect(self, serial, **kwargs):
+        """
+        Create a backend for the power supply with serial number and connect it
+        """
+        device = self.devices[serial]
+        backend = self.backend(serial, **kwargs)
+        backend.connect(device.host, device.port)
+        return backend
+
+
+def discover(addresses, ports=(DEFAULT_PORT,), cache=None, max_age=3600, timeout=0.5):
+    """
+    Return the Inventory of the power supplies on addresses. If cache is a file with a scan of the same addresses and
+    ports saved less than max_age seconds ago it is loaded instead of scanning, otherwise the result of the scan is
+    saved on it
+    """
+    scanned = {'addresses': [addresses] if isinstance(addresses, str) else list(addresses),
+               'ports': [int(port) for port in ports]}
+    if cache and os.path.exists(cache):
+        inventory = Inventory.load(cache)
+        if inventory.scanned == scanned and time.time() - inventory.timestamp < max_age:
+            return inventory
+    inventory = Inventory(asyncio.run(scan(addresses, ports, timeout)), scanned=scanned)
+    if cache:
+        inventory.save(cache)
+    return inventory
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Control of many power supplies at once.
+
+    fleet = SupplyFleet()
+    fleet.add('bias', PLBackend(), '172.16.7.253')
+    fleet.add('heaters', CPxBackend(num_outputs=2), '172.16.7.254')
+    fleet.set_voltage({'bias': 3.3, 'heaters': {1: 12.0, 2: 5.0}}).raise_errors()
+    snapshots = fleet.snapshot()
+
+Operations are sent to all the power supplies concurrently from a bounded thread pool, so they take as long as the
+slowest power supply instead of the sum of all of them. Every power supply gets its own result: an error on one of
+them does not stop the others and is returned on FleetResult.errors.
+
+Backends are connected the first time they are used.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pyttilan.backend import TTiBackendExc
+from pyttilan.telemetry import stack_snapshots
+
+log = logging.getLogger(__name__)
+
+
+class FleetResult(dict):
+    """
+    Results of an operation on a fleet, by name of the power supply. Power supplies where the operation failed are
+    not on the dictionary, their exception is on errors
+    """
+
+    def __init__(self, results=(), errors=None):
+        super().__init__(results)
+        self.errors = errors or {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_errors(self):
+        """
+        Raise a TTiBackendExc listing the power supplies that failed, if any. Returns the result otherwise
+        """
+        if self.errors:
+            detail = "; ".join(f"{name}: {error}" for name, error in self.errors.items())
+            raise TTiBackendExc(f"Operation failed on {len(self.errors)} power supplies: {detail}")
+        return self
+
+
+class _Member:
+    __slots__ = ('backend', 'ip', 'port', 'lock', 'connected')
+
+    def __init__(self, backend, ip, port):
+        self.backend = backend
+        self.ip = ip
+        self.port = port
+        self.lock = threading.Lock()
+        self.connected = False
+
+    def connect(self):
+        if self.ip is not None and not self.connected:
+            with self.lock:
+                if not self.connected:
+                    self.backend.connect(self.ip, self.port)
+                    self.connected = True
+        return self.backend
+
+    def disconnect(self):
+        # Only backends connected by the fleet are disconnected
+        with self.lock:
+            if self.connected:
+                self.connected = False
+                self.backend.disconnect()
+
+
+class SupplyFleet:
+    """
+    Pool of backends by name. Operations are run on max_workers threads at most.
+
+    Values of set_voltage and set_current_limit are given by name of the power supply, as a number for output 1 or
+    as a dictionary {output: value}. All the outputs of a power supply are set on a single message.
+    """
+
+    def __init__(self, max_workers=16):
+        self._members = {}
+        self.max_workers = max_workers
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __getitem__(self, name):
+        return self.backend(name)
+
+    @classmethod
+    def from_inventory(cls, inventory, max_workers=16, **kwargs):
+        """
+        Fleet with the power supplies of a discovery.Inventory, named by serial number. kwargs are passed to the
+        backends
+        """
+        fleet = cls(max_workers)
+        for device in inventory:
+            fleet.add(device.serial, inventory.backend(device.serial, **kwargs), device.host, device.port)
+        return fleet
+
+    def add(self, name, backend, ip=None, port=9221):
+        """
+        Add a backend. If ip is given it is connected the first time it is used, otherwise it must be connected
+        already
+        """
+        if name in self._members:
+            raise TTiBackendExc(f"There is already a power supply called {name}")
+        self._members[name] = _Member(backend, ip, port)
+
+    def remove(self, name):
+        self._members.pop(name).disconnect()
+
+    def backend(self, name):
+        """
+        Return the backend called name, connecting it if needed
+        """
+        return self._members[name].connect()
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="SupplyFleet")
+        return self._pool
+
+    def run(self, func, names=None):
+        """
+        Call func(backend) for the backends called names (all by default) concurrently. Returns a FleetResult
+        """
+        return self._run(lambda name, backend: func(backend), names)
+
+    def _run(self, func, names):
+        # Call func(name, backend) for each name on the thread pool
+        names = list(self._members) if names is None else list(names)
+        for name in names:
+            if name not in self._members:
+                raise KeyError(name)
+        futures = {name: self._executor().submit(lambda n=name: func(n, self.backend(n))) for name in names}
+        result = FleetResult()
+        for name, future in futures.items():
+            try:
+                result[name] = future.result()
+            except Exception as e:
+                log.warning("Error on power supply %s: %s", name, e)
+                result.errors[name] = e
+        return result
+
+    def call(self, method, *args, names=None, **kwargs):
+        """
+        Call a backend method with the same arguments on the backends called names (all by default)
+        """
+        return self.run(lambda backend: getattr(backend, method)(*args, **kwargs), names)
+
+    def _set(self, method, values):
+        def set_outputs(backend, outputs):
+            with backend.batch() as b:
+                for output, value in outputs.items():
+                    getattr(b, method)(output, value)
+
+        plan = {name: value if isinstance(value, dict) else {1: value} for name, value in values.items()}
+        return self._run(lambda name, backend: set_outputs(backend, plan[name]), plan)
+
+    def set_voltage(self, values):
+        return self._set('set_voltage', values)
+
+    def set_current_limit(self, values):
+        return self._set('set_current_limit', values)
+
+    def enable_output_all(self, names=None):
+        return self.call('enable_output_all', names=names)
+
+    def disable_output_all(self, names=None):
+        return self.call('disable_output_all', names=names)
+
+    def snapshot(self, names=None):
+        """
+        Snapshot of every power supply (see CommonBackend.snapshot), by name
+        """
+        return self.call('snapshot', names=names)
+
+    def stacked_snapshot(self, names=None):
+        """
+        Snapshots stacked with telemetry.stack_snapshots, in the order of names. Raises if any power supply failed
+        """
+        names = list(self._members) if names is None else list(names)
+        result = self.snapshot(names).raise_errors()
+        return stack_snapshots(result[name] for name in names)
+
+    def status_snapshot(self, names=None):
+        return self.call('status_snapshot', names=names)
+
+    def group(self, timeout=5.0):
+        """
+        Return a sync.SyncGroup of the power supplies of the fleet, to apply changes on all of them at the same time
+        """
+        from pyttilan.sync import SyncGroup
+        return SyncGroup(self, timeout)
+
+    def close(self):
+        """
+        Disconnect the backends connected by the fleet and stop the thread pool
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for name, member in self._members.items():
+            try:
+                member.disconnect()
+            except Exception as e:
+                log.warning("Error disconnecting %s: %s", name, e)
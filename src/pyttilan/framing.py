@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Byte level framing of the answers of the power supplies.
+
+Answers are received on a reusable buffer and split in lines (terminated by \\n or \\r\\n) without copying or
+decoding them. Several answers received on a single recv are split without further system calls, and numeric
+answers ('V1 3.300', '3.300V', '0.100A', '1') are parsed straight from the received bytes. parse_number also parses
+answers already decoded to text.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+# Units that can follow a value: V, A and W, as bytes and as text
+_UNITS = frozenset(b"VAW") | frozenset("VAW")
+
+
+def parse_number(data, start=0, end=None):
+    """
+    Return the value of a numeric answer as a float. Answers can be like '3.300', '3.300V' or 'V1 3.300', as text or
+    bytes-like (parsed without decoding them). The value is the last word of data[start:end] without the units
+    """
+    if end is None:
+        end = len(data)
+    if isinstance(data, memoryview):
+        # memoryview has not rfind, answers are short enough to look for the space from the end
+        space = end - 1
+        while space >= start and data[space] != 32:
+            space -= 1
+    else:
+        space = data.rfind(" " if isinstance(data, str) else b" ", start, end)
+    if space >= 0:
+        start = space + 1
+    if end > start and data[end - 1] in _UNITS:
+        end -= 1
+    value = data[start:end]
+    if isinstance(value, memoryview):
+        # float does not take memoryviews, only the bytes of the value are copied
+        value = bytes(value)
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Not a numeric answer: {value!r}") from None
+
+
+def parse_numbers(answers):
+    """
+    Return the values of a list of numeric answers. Backends given this parser read the answers as bytes and parse
+    them without decoding them, when the answers do not go through caches or the I/O worker
+    """
+    return [parse_number(answer) for answer in answers]
+
+
+class LineReader:
+    """
+    Reads lines from a socket into a reusable buffer. readline returns a memoryview of the buffer, which is only
+    valid until the next read.
+
+    If reading times out, the bytes already received are kept, so reading can be retried
+    """
+
+    def __init__(self, sock, size=4096):
+        self._sock = sock
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # First byte not returned yet
+        self._end = 0  # End of the received bytes
+
+    @property
+    def buffered(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def _fill(self):
+        # Receive more bytes, returns False if the connection has been closed
+        if self._end == len(self._buffer):
+            if self._start:
+                pending = self._end - self._start
+                self._buffer[:pending] = self._buffer[self._start:self._end]
+                self._start, self._end = 0, pending
+            else:
+                # A line longer than the buffer
+                self._buffer = bytearray(self._buffer) + bytearray(len(self._buffer))
+                self._view = memoryview(self._buffer)
+        received = self._sock.recv_into(self._view[self._end:])
+        self._end += received
+        return received > 0
+
+    def _next_line(self):
+        # Return the start and end (without terminator) of the next line on the buffer, None if connection closed
+        while True:
+            newline = self._buffer.find(b"\n", self._start, self._end)
+            if newline >= 0:
+                break
+            if not self._fill():
+                return None
+        start = self._start
+        end = newline - 1 if newline > start and self._buffer[newline - 1] == 13 else newline
+        if newline + 1 == self._end:
+            # Nothing left, next data can be received at the beginning of the buffer
+            self._start = self._end = 0
+        else:
+            self._start = newline + 1
+        return start, end
+
+    def readline(self):
+        """
+        Return the next line without its terminator, None if the connection has been closed
+        """
+        span = self._next_line()
+        if span is None:
+            return None
+        return self._view[span[0]:span[1]]
+
+    def read_numbers(self):
+        """
+        Read the next line of numeric answers, separated by ';', and return them as floats. None if the connection has
+        been closed
+        """
+        span = self._next_line()
+        if span is None:
+            return None
+        pos, end = span
+        values = []
+        while True:
+            separator = self._buffer.find(b";", pos, end)
+            stop = end if separator < 0 else separator
+            values.append(parse_number(self._buffer, pos, stop))
+            if separator < 0:
+                return values
+            pos = separator + 1
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentation of the communication with power supplies: hooks called on every exchange of commands and
+statistics of commands and latencies.
+
+    backend.enable_stats()
+    backend.add_hook('after_check', lambda event, exchange: print(exchange.commands, exchange.duration))
+    ...
+    print(backend.instrumentation.stats.summary())
+
+Backends without hooks or statistics do not pay any cost.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import re
+import time
+import threading
+
+BEFORE_SEND = 'before_send'
+AFTER_RECEIVE = 'after_receive'
+AFTER_CHECK = 'after_check'
+EVENTS = (BEFORE_SEND, AFTER_RECEIVE, AFTER_CHECK)
+
+_OUTPUT_NUMBER_RE = re.compile(r"[0-9]")
+
+
+def command_key(command):
+    """
+    Key used to group statistics of a command: the command without arguments and with output numbers replaced by n,
+    so V1 3.3 and V2 1.0 are both counted as Vn and V1O? as VnO?
+    """
+    return _OUTPUT_NUMBER_RE.sub('n', command.split(' ', 1)[0])
+
+
+class LatencyHistogram:
+    """
+    Histogram with HDR-style log-linear buckets: every power of two of microseconds is divided in 2**precision
+    linear sub-buckets, so any value is recorded with a relative error below 2**-precision using constant memory
+    """
+
+    def __init__(self, precision=5):
+        self._precision = precision
+        self._sub_buckets = 1 << precision
+        self._counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, us):
+        if us < self._sub_buckets:
+            return us
+        shift = us.bit_length() - self._precision - 1
+        return ((shift + 1) << self._precision) + (us >> shift) - self._sub_buckets
+
+    def _bucket_value(self, bucket):
+        # Highest value (in us) of a bucket
+        if bucket < self._sub_buckets:
+            return bucket
+        shift = (bucket >> self._precision) - 1
+        sub = bucket - (shift + 1 << self._precision) + self._sub_buckets
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1e6))
+        bucket = self._bucket(us)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """
+        Return the value in seconds below which are p percent of the recorded values
+        """
+        if not self.count:
+            return None
+        target = max(1, int(round(p / 100 * self.count)))
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= target:
+                return min(self._bucket_value(bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self, points=(50, 90, 99)):
+        result = {'count': self.count, 'min': self.min, 'mean': self.mean, 'max': self.max}
+        for p in points:
+            result[f"p{p:g}"] = self.percentile(p)
+        return result
+
+
+class CommandStats:
+    """
+    Counters and latency histograms per command (grouped with command_key). Exchanges with a single command are
+    accounted to its key, exchanges with several commands (batches) to 'batch'. Duration of the error checks is
+    accounted to 'error_check'
+    """
+
+    def __init__(self, precision=5):
+        self._precision = precision
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.errors = 0
+        self.histograms = {}
+
+    def _histogram(self, key):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self._precision)
+        return histogram
+
+    def record(self, exchange):
+        with self._lock:
+            for command in exchange.commands:
+                key = command_key(command)
+                self.counts[key] = self.counts.get(key, 0) + 1
+            key = command_key(exchange.commands[0]) if len(exchange.commands) == 1 else 'batch'
+            if exchange.received_at is not None:
+                self._histogram(key).record(exchange.received_at - exchange.sent_at)
+            if exchange.checked_at is not None and exchange.received_at is not None:
+                self._histogram('error_check').record(exchange.checked_at - exchange.received_at)
+            if exchange.error is not None:
+                self.errors += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                'counts': dict(self.counts),
+                'errors': self.errors,
+                'latency_s': {key: histogram.summary() for key, histogram in self.histograms.items()},
+            }
+
+
+class Exchange:
+    """
+    Record of an exchange of commands with a power supply, passed to hooks. Times are time.perf_counter() values,
+    timestamp is the wall clock time when it was sent
+    """
+    __slots__ = ('commands', 'timestamp', 'sent_at', 'received_at', 'checked_at', 'responses', 'checked', 'error')
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.timestamp = time.time()
+        self.sent_at = time.perf_counter()
+        self.received_at = None
+        self.checked_at = None
+        self.responses = None
+        self.checked = False
+        self.error = None
+
+    @property
+    def duration(self):
+        end = self.checked_at or self.received_at
+        return end - self.sent_at if end is not None else None
+
+
+class Instrumentation:
+    """
+    Hooks and statistics of a backend. Hooks are called as hook(event, exchange) for the events:
+
+    before_send: before the commands are sent
+    after_receive: after the responses have been received (or the sending failed, then exchange.error is set)
+    after_check: after the error registers have been checked, or would have been if the error policy did not
+                 skip it (exchange.checked tells if they were). exchange.error is set if an error was detected
+    """
+
+    def __init__(self):
+        self.hooks = {event: [] for event in EVENTS}
+        self.stats = None
+
+    def add_hook(self, event, hook):
+        if event not in self.hooks:
+            raise ValueError(f"Unknown event {event}, valid events are {', '.join(EVENTS)}")
+        self.hooks[event].append(hook)
+
+    def remove_hook(self, event, hook):
+        self.hooks[event].remove(hook)
+
+    def enable_stats(self, precision=5):
+        if self.stats is None:
+            self.stats = CommandStats(precision)
+        return self.stats
+
+    def _call(self, event, exchange):
+        for hook in self.hooks[event]:
+            hook(event, exchange)
+
+    def begin(self, commands):
+        exchange = Exchange(commands)
+        self._call(BEFORE_SEND, exchange)
+        return exchange
+
+    def received(self, exchange, responses=None, error=None):
+        exchange.received_at = time.perf_counter()
+        exchange.responses = responses
+        exchange.error = error
+        self._call(AFTER_RECEIVE, exchange)
+        if error is not None and self.stats is not None:
+            self.stats.record(exchange)
+
+    def checked(self, exchange, checked, error=None):
+        exchange.checked_at = time.perf_counter() if checked else None
+        exchange.checked = checked
+        exchange.error = error
+        self._call(AFTER_CHECK, exchange)
+        if self.stats is not None:
+            self.stats.record(exchange)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Monitoring of trips, limit events and errors of a power supply with adaptive polling.
+
+    with EventMonitor(backend, callback=lambda event: print(event.status.tripped_outputs)):
+        ...
+
+or, for async backends:
+
+    async for event in EventMonitor(backend).events():
+        ...
+
+The monitor enables the limit and error bits on the LSE and *ESE masks, so the status byte summarizes them, and polls
+*STB? alone. Only when the status byte reports something, all the status registers are read (see
+status.StatusSnapshot). Polling is fast after an event or a change of the status byte and slows down exponentially
+while the power supply is idle.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import asyncio
+import logging
+import threading
+import time
+
+from pyttilan.backend import ErrorPolicy
+
+log = logging.getLogger(__name__)
+
+# Limit event status bits enabled by default: voltage limit, current limit, OVP trip and OCP trip
+DEFAULT_LIMIT_MASK = 0x0F
+# Standard event status bits enabled by default: query, verify timeout, execution and command errors
+DEFAULT_EVENT_MASK = 0x3C
+# Status byte bits that summarize the limit event status of outputs 1 and 2 and the standard event status
+_SUMMARY_BITS = (1 << 0) | (1 << 1) | (1 << 5)
+
+
+class MonitorEvent:
+    """
+    Something reported by the status registers. timestamp is the wall clock time when they were read, status the
+    status.StatusSnapshot read
+    """
+    __slots__ = ('timestamp', 'status')
+
+    def __init__(self, timestamp, status):
+        self.timestamp = timestamp
+        self.status = status
+
+    def __repr__(self):
+        return f"MonitorEvent(timestamp={self.timestamp}, status={self.status})"
+
+
+class EventMonitor:
+    """
+    Watches the status registers of a backend, synchronous (start/stop, in a thread) or async (run_async or events).
+
+    callback is called with a MonitorEvent whenever a limit event, trip or error is reported, more can be added with
+    add_callback. The status byte is polled every min_interval seconds after an event or a change and the interval
+    is multiplied by backoff after each idle poll, up to max_interval.
+
+    Monitor exchanges are not followed by error checks, they would clear the registers watched. Only the outputs 1
+    and 2 are summarized by the status byte. Other code reading the LSR or *ESR? registers clears them too, so the
+    monitor may miss those events.
+    """
+
+    def __init__(self, backend, callback=None, min_interval=0.02, max_interval=1.0, backoff=1.5,
+                 limit_mask=DEFAULT_LIMIT_MASK, event_mask=DEFAULT_EVENT_MASK):
+        self._backend = backend
+        self._callbacks = [callback] if callback else []
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.limit_mask = limit_mask
+        self.event_mask = event_mask
+        self.interval = min_interval
+        self._last_stb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.polls = 0
+        self.events_count = 0
+        self.errors = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def _batch(self):
+        return self._backend.batch(error_policy=ErrorPolicy.never)
+
+    def _record_arm(self, batch):
+        for output in range(1, min(self._backend.n_outputs, 2) + 1):
+            batch.set_register_limit_event_status(output, self.limit_mask)
+        batch.set_register_event_status(self.event_mask)
+
+    def _needs_status(self, stb):
+        return bool(stb & _SUMMARY_BITS)
+
+    def _event(self, status):
+        if not (any(status.lsr) or status.errors):
+            return None
+        event = MonitorEvent(time.time(), status)
+        self.events_count += 1
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception:
+                log.exception("Error on monitor callback")
+        return event
+
+    def _update_interval(self, stb, event):
+        if event is not None or stb != self._last_stb:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        self._last_stb = stb
+
+    # Synchronous backends
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="EventMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def arm(self):
+        """
+        Enable the LSE and *ESE bits of limit_mask and event_mask
+        """
+        with self._batch() as b:
+            self._record_arm(b)
+
+    def poll(self):
+        """
+        Read the status byte and, if it reports something, the status registers. Returns the MonitorEvent or None
+        """
+        self.polls += 1
+        with self._batch() as b:
+            b.get_register_status_byte()
+        stb = int(b.results[0])
+        event = None
+        if self._needs_status(stb):
+            with self._batch() as b:
+                b.status_snapshot()
+            event = self._event(b.results[0])
+        self._update_interval(stb, event)
+        return event
+
+    def _run(self):
+        try:
+            self.arm()
+        except Exception:
+            self.errors += 1
+            log.exception("Error enabling the status registers")
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                self.errors += 1
+                self.interval = self.max_interval
+                log.exception("Error polling the status registers")
+
+    # Async backends
+
+    async def arm_async(self):
+        async with self._batch() as b:
+            self._record_arm(b)
+
+    async def poll_async(self):
+        self.polls += 1
+        async with self._batch() as b:
+            b.get_register_status_byte()
+        stb = int(b.results[0])
+        event = None
+        if self._needs_status(stb):
+            async with self._batch() as b:
+                b.status_snapshot()
+            event = self._event(b.results[0])
+        self._update_interval(stb, event)
+        return event
+
+    async def events(self):
+        """
+        Async iterator of the events, for async backends. Polls until stop is called
+        """
+        self._stop.clear()
+        await self.arm_async()
+        while not self._stop.is_set():
+            await asyncio.sleep(self.interval)
+            if self._stop.is_set():
+                break
+            try:
+                event = await self.poll_async()
+            except Exception:
+                self.errors += 1
+                self.interval = self.max_interval
+                log.exception("Error polling the status registers")
+                continue
+            if event is not None:
+                yield event
+
+    async def run_async(self):
+        """
+        Poll calling the callbacks until stop is called, for async backends. Run it as a task:
+            task = asyncio.create_task(monitor.run_async())
+        """
+        async for _ in self.events():
+            pass
+
+    def statistics(self):
+        return {'polls': self.polls, 'events': self.events_count, 'errors': self.errors, 'interval': self.interval}
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Proxy that shares a single connection to a power supply between many local clients.
+
+    pyttilan proxy 172.16.7.253 --unix /tmp/pl068.sock
+
+    backend = ProxyPLBackend()
+    backend.connect('/tmp/pl068.sock')
+
+Clients speak the same protocol as with the power supply, so any backend can connect to the proxy. Commands are
+validated by the proxy. Messages with queries only, from different clients, are merged in a single message and
+identical queries are sent once. Messages that change something are sent alone.
+
+The proxy clears the error registers of the power supply when it starts, reads *ESR?, EER? and QER? after each message
+it sends and keeps the error registers of each client connection apart: a client reading *ESR?, EER? or QER? gets the
+errors caused by its own commands only, and *CLS clears its registers.
+
+The answers of each message sent to the power supply are counted before giving them to the clients. Queries that fail
+are not answered, so if some answers are missing the proxy can not tell which query they belong to: the client gets
+no answers for those queries and the error is flagged on its registers.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import asyncio
+import logging
+import os
+import socket
+
+from pyttilan.aio import AsyncSockCommand
+from pyttilan.backend import SockCommand, CommonBackend, PLBackend, CPxBackend, TTiBackendExc, TTiBackendTimeout
+from pyttilan.commands import Commands, TTiPLCommands
+
+log = logging.getLogger(__name__)
+
+ESR_COMMAND_ERROR = 1 << 5
+# Commands answered by the proxy from the registers of each client
+_LOCAL_COMMANDS = ('*ESR?', 'EER?', 'QER?', '*CLS')
+
+
+class _Client:
+    # Error registers of a client of the proxy
+    __slots__ = ('esr', 'eer', 'qer')
+
+    def __init__(self):
+        self.esr = 0
+        self.eer = 0
+        self.qer = 0
+
+    def record(self, esr, eer, qer):
+        self.esr |= esr
+        if eer:
+            self.eer = eer
+        if qer:
+            self.qer = qer
+
+    def local(self, command):
+        # Execute a local command, returns its answer
+        if command == '*CLS':
+            self.esr = self.eer = self.qer = 0
+            return None
+        attribute = {'*ESR?': 'esr', 'EER?': 'eer', 'QER?': 'qer'}[command]
+        value = getattr(self, attribute)
+        setattr(self, attribute, 0)
+        return str(value)
+
+
+class _MissingAnswers(TTiBackendExc):
+    # Some queries of a message were not answered
+    pass
+
+
+class _Request:
+    __slots__ = ('client', 'commands', 'queries', 'read_only', 'future')
+
+    def __init__(self, client, commands):
+        self.client = client
+        self.commands = commands
+        self.queries = sum(command.endswith('?') for command in commands)
+        self.read_only = self.queries == len(commands)
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class ProxyServer:
+    """
+    Serves the power supply at ip:port to the clients connected to a TCP socket (listen_host, listen_port) or, if
+    path is given, to a Unix socket. Use start and stop from a running event loop, or serve_forever.
+
+    Up to max_commands queries of different clients are merged on a single message
+    """
+
+    def __init__(self, ip, port=9221, valid_commands=TTiPLCommands(), listen_host='127.0.0.1', listen_port=0,
+                 path=None, max_commands=32, timeout=2.0):
+        self._upstream = AsyncSockCommand(ip, port, valid_commands, timeout=timeout)
+        self._valid_commands = valid_commands
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.path = path
+        self.max_commands = max_commands
+        self._server = None
+        self._queue = None
+        self._dispatcher = None
+        self._writers = set()
+
+        self.client_messages = 0
+        self.upstream_messages = 0
+        self.coalesced = 0
+
+    async def start(self):
+        await self._upstream.connect()
+        # Errors flagged before starting were not caused by any client
+        await self._upstream.execute_command("*CLS")
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        if self.path:
+            self._server = await asyncio.start_unix_server(self._handle, self.path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.listen_host, self.listen_port)
+            self.listen_port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            if self.path and os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        await self._upstream.disconnect()
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        client = _Client()
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                self.client_messages += 1
+                commands = line.rstrip(b"\r\n").decode(errors='replace').split(';')
+                answers = await self._process(client, commands)
+                if answers:
+                    writer.write((";".join(answers) + "\n").encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _process(self, client, commands):
+        for command in commands:
+            if command not in _LOCAL_COMMANDS and self._valid_commands.validate_command(command) is None:
+                # Like the power supply, the message is ignored and a command error is flagged
+                log.warning("Invalid command from a client: %s", command)
+                client.esr |= ESR_COMMAND_ERROR
+                return []
+        answers = []
+        remote = []
+        for command in commands + [None]:
+            if command is not None and command not in _LOCAL_COMMANDS:
+                remote.append(command)
+                continue
+            if remote:
+                # Local commands must see the errors of the commands sent before them
+                request = _Request(client, remote)
+                await self._queue.put(request)
+                try:
+                    answers.extend(await request.future)
+                except _MissingAnswers as e:
+                    # The following commands of the message are still executed, like on the power supply
+                    log.warning("%s", e)
+                except TTiBackendExc as e:
+                    log.error("Error sending %s to the power supply: %s", ";".join(remote), e)
+                    return []
+                remote = []
+            if command is not None:
+                answer = client.local(command)
+                if answer is not None:
+                    answers.append(answer)
+        return answers
+
+    async def _exchange(self, commands):
+        # Send commands followed by the error registers queries. Returns the answers and the registers (esr, eer, qer)
+        await self._upstream.execute_commands(commands + ["*ESR?", "EER?", "QER?"])
+        self.upstream_messages += 1
+        fields = (await self._upstream.read_response()).split(';')
+        return fields[:-3], tuple(int(field) for field in fields[-3:])
+
+    async def _send_alone(self, request):
+        try:
+            answers, registers = await self._exchange(request.commands)
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+        request.client.record(*registers)
+        if len(answers) != request.queries:
+            request.future.set_exception(_MissingAnswers(f"The power supply answered {len(answers)} of the "
+                                                         f"{request.queries} queries of {';'.join(request.commands)}"))
+            return
+        request.future.set_result(answers)
+
+    async def _send_reads(self, requests):
+        if len(requests) == 1:
+            # The errors of the message belong to its client
+            await self._send_alone(requests[0])
+            return
+        # Identical queries are sent once, in the order they are first asked
+        unique = list(dict.fromkeys(command for r in requests for command in r.commands))
+        self.coalesced += sum(len(r.commands) for r in requests) - len(unique)
+        try:
+            answers, (esr, eer, qer) = await self._exchange(unique)
+        except Exception as e:
+            for r in requests:
+                r.future.set_exception(e)
+            return
+        if esr or qer or len(answers) != len(unique):
+            # Some query failed, send them again one client at a time to know who caused the error
+            for r in requests:
+                await self._send_alone(r)
+            return
+        by_command = dict(zip(unique, answers))
+        for r in requests:
+            r.future.set_result([by_command[command] for command in r.commands])
+
+    async def _dispatch(self):
+        # Single consumer of the queue, so messages are sent to the power supply one after the other
+        request = None
+        while True:
+            if request is None:
+                request = await self._queue.get()
+            if not request.read_only:
+                await self._send_alone(request)
+                request = None
+                continue
+            reads = [request]
+            size = len(request.commands)
+            request = None
+            while not self._queue.empty():
+                following = self._queue.get_nowait()
+                if not following.read_only or size + len(following.commands) > self.max_commands:
+                    request = following
+                    break
+                reads.append(following)
+                size += len(following.commands)
+            await self._send_reads(reads)
+
+    def statistics(self):
+        return {'client_messages': self.client_messages, 'upstream_messages': self.upstream_messages,
+                'coalesced': self.coalesced}
+
+
+class _AnyCommand(Commands):
+    # Commands sent to a proxy are validated by the proxy
+    def validate_command(self, command):
+        return True
+
+
+class _UnixSockCommand(SockCommand):
+    # SockCommand to a Unix socket, ip is its path
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect(self._ip)
+        except socket.timeout:
+            sock.close()
+            raise TTiBackendTimeout(f"Timeout connecting to {self._ip}")
+        return sock
+
+
+class ProxyBackend(CommonBackend):
+    """
+    CommonBackend that connects to a ProxyServer, on a TCP port or on a Unix socket. Use ProxyPLBackend or
+    ProxyCPxBackend to get the methods of a series
+    """
+
+    def connect(self, ip, port=9221):
+        """
+        Connect to the proxy at ip:port or, if ip is a path, to the proxy on that Unix socket
+        """
+        sock_class = _UnixSockCommand if os.sep in ip else SockCommand
+        if type(self.sock) is not sock_class:
+            self.sock = sock_class(ip=ip, port=port, valid_commands=_AnyCommand(), timeout=self.timeout,
+                                   connect_timeout=self.connect_timeout)
+        self.sock.connect(ip, port)
+        if self.setpoint_cache is not None:
+            self.setpoint_cache.clear()
+        if self.readback_cache is not None:
+            self.readback_cache.clear()
+
+
+class ProxyPLBackend(ProxyBackend, PLBackend):
+    pass
+
+
+class ProxyCPxBackend(ProxyBackend, CPxBackend):
+    pass
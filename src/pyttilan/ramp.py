@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Ramps of the voltage or current limit of many outputs at once.
+
+    engine = RampEngine([Ramp(backend, 1, target=12.0, step=0.1),
+                         Ramp(backend, 2, target=5.0, step=0.05),
+                         Ramp(other_backend, 1, target=0.5, step=0.01, quantity='current')],
+                        period=0.05)
+    report = engine.run()
+    print(report.aborted, report.lateness_max)
+
+Before starting, the step of every ramp is set with DELTAV (or DELTAI) and the start value is read. Then, on every
+step, the power supply is sent INCV/DECV (INCI/DECI) for each output still ramping, all the outputs of a power supply
+on a single message. If the distance to the target is not a whole number of steps, the last step sets the target. The
+messages of every step are built, validated and encoded once, before starting, and sent as they are.
+
+Each power supply is stepped by its own thread, all of them on the same schedule: step k is sent at start + k * period
+on the monotonic clock, so delays do not accumulate. Errors are not checked on every step. Every check_every steps, and
+after the last one, the message also reads the error registers, the limit event status register and (if tolerance is
+given) the output readback of each enabled output. Then all the ramps are aborted if an output tripped, reached its
+current limit (abort_on_limit), or if a readback is farther than tolerance from the expected value.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import logging
+import math
+import threading
+import time
+
+from pyttilan.backend import CommandBatch, ErrorPolicy, TTiBackendExc
+from pyttilan.status import StatusSnapshot
+from pyttilan.telemetry import parse_number
+
+log = logging.getLogger(__name__)
+
+# Backend methods used to ramp each quantity: set delta, increment, decrement, set value, query of the value set and
+# query of the readback
+QUANTITIES = {
+    'voltage': ('set_delta_voltage', 'inc_voltage', 'dec_voltage', 'set_voltage', 'V{}?', 'V{}O?'),
+    'current': ('set_delta_current_limit', 'inc_current_limit', 'dec_current', 'set_current_limit', 'I{}?', 'I{}O?'),
+}
+
+
+def _commands(backend, method, *args):
+    # Commands generated by a backend method, without sending them
+    batch = CommandBatch(backend)
+    getattr(batch, method)(*args)
+    return batch._take_pending()[0]
+
+
+class Ramp:
+    """
+    Ramp of the voltage (or the current limit, quantity='current') of an output to target, in steps of step. start is
+    read from the power supply if it is not given.
+
+    Readbacks are compared with the expected value only for voltage ramps, current readbacks depend on the load
+    """
+
+    def __init__(self, backend, output, target, step, quantity='voltage', start=None):
+        if quantity not in QUANTITIES:
+            raise TTiBackendExc(f"Can not ramp {quantity}, only {', '.join(QUANTITIES)}")
+        if step <= 0:
+            raise TTiBackendExc("The step of a ramp must be positive")
+        self.backend = backend
+        self.output = backend._check_output(output)
+        self.target = float(target)
+        self.step = float(step)
+        self.quantity = quantity
+        self.start = start
+        self.steps = None
+        self.done = 0  # steps sent
+
+    def __repr__(self):
+        return f"Ramp(output={self.output}, {self.quantity} {self.start} -> {self.target}, step={self.step})"
+
+    @property
+    def _methods(self):
+        return QUANTITIES[self.quantity]
+
+    def _plan(self, start):
+        # Build the commands of the steps once the start value is known
+        self.start = start
+        distance = self.target - start
+        increments = int(abs(distance) / self.step + 1e-9)
+        set_delta, inc, dec, set_value, _, readback = self._methods
+        self._step_commands = _commands(self.backend, inc if distance > 0 else dec, self.output)
+        self._final_commands = None
+        if abs(abs(distance) - increments * self.step) > 1e-9:
+            self._final_commands = _commands(self.backend, set_value, self.output, self.target)
+        self.steps = increments + (self._final_commands is not None)
+        self._increments = increments
+        self._readback = readback.format(self.output)
+
+    def commands(self, step):
+        """
+        Commands of step (0 is the first), empty if the ramp has already finished
+        """
+        if step < self._increments:
+            return self._step_commands
+        if step < self.steps:
+            return self._final_commands
+        return []
+
+    def expected(self, steps_done):
+        """
+        Value expected after steps_done steps
+        """
+        if steps_done >= self.steps:
+            return self.target
+        return self.start + math.copysign(self.step * steps_done, self.target - self.start)
+
+
+class RampReport:
+    """
+    Result of RampEngine.run.
+
+    steps: number of steps scheduled (the longest ramp), sent: steps sent to each power supply, by its address
+    duration: seconds from the first step to the last one sent, target_duration: the scheduled ones
+    lateness_mean, lateness_max: delay of the steps with respect to their schedule
+    aborted: reason why the ramps were aborted, None if they finished
+    """
+
+    def __init__(self, period, steps):
+        self.period = period
+        self.steps = steps
+        self.target_duration = period * max(steps - 1, 0)
+        self.duration = 0.0
+        self.sent = {}
+        self.lateness_mean = 0.0
+        self.lateness_max = 0.0
+        self.aborted = None
+        self._lateness = []
+
+    def __repr__(self):
+        return (f"RampReport(steps={self.steps}, duration={self.duration:.6f}, "
+                f"target_duration={self.target_duration:.6f}, lateness_mean={self.lateness_mean:.6f}, "
+                f"lateness_max={self.lateness_max:.6f}, aborted={self.aborted})")
+
+    @property
+    def ok(self):
+        return self.aborted is None
+
+
+class RampEngine:
+    """
+    Runs ramps of several outputs and power supplies on a common schedule of one step every period seconds. See the
+    module documentation
+    """
+
+    def __init__(self, ramps, period, check_every=10, tolerance=None, abort_on_trip=True, abort_on_limit=False):
+        self.ramps = list(ramps)
+        self.period = period
+        self.check_every = max(1, int(check_every))
+        self.tolerance = tolerance
+        self.abort_on_trip = abort_on_trip
+        self.abort_on_limit = abort_on_limit
+        self._abort = threading.Event()
+        self._report = None
+        self._report_lock = threading.Lock()
+
+    def _by_backend(self):
+        groups = {}
+        for ramp in self.ramps:
+            groups.setdefault(id(ramp.backend), (ramp.backend, []))[1].append(ramp)
+        return list(groups.values())
+
+    def prepare(self):
+        """
+        Set the step of every ramp and read the start values, a single message for each power supply
+        """
+        for backend, ramps in self._by_backend():
+            with backend.batch() as b:
+                for ramp in ramps:
+                    set_delta, *_ = ramp._methods
+                    getattr(b, set_delta)(ramp.output, ramp.step)
+                unknown = [ramp for ramp in ramps if ramp.start is None]
+                for ramp in unknown:
+                    b._query(ramp._methods[4].format(ramp.output), parse_number)
+            for ramp, start in zip(unknown, b.results):
+                ramp.start = start
+            for ramp in ramps:
+                ramp._plan(ramp.start)
+
+    def abort(self, reason="Aborted"):
+        """
+        Stop all the ramps after the step in progress
+        """
+        with self._report_lock:
+            if self._report is not None and self._report.aborted is None:
+                self._report.aborted = reason
+        self._abort.set()
+
+    def _check(self, backend, ramps, steps_done, answers):
+        # Answers are the readbacks and output states (if checked) and the LSR of every ramp. The error registers were
+        # checked already
+        outputs = [ramp.output for ramp in ramps]
+        if self.tolerance is not None:
+            n = len(ramps)
+            readbacks, enabled, answers = answers[:n], answers[n:2 * n], answers[2 * n:]
+            for ramp, answer, on in zip(ramps, readbacks, enabled):
+                # Disabled outputs read 0
+                if ramp.quantity != 'voltage' or int(on) != 1:
+                    continue
+                expected = ramp.expected(steps_done)
+                value = parse_number(answer)
+                if abs(value - expected) > self.tolerance:
+                    return f"Output {ramp.output} reads {value} instead of {expected}"
+        lsr = [0] * max(outputs)
+        for output, answer in zip(outputs, answers):
+            lsr[output - 1] = int(answer)
+        status = StatusSnapshot(lsr=lsr)
+        if self.abort_on_trip and status.tripped_outputs:
+            return f"Outputs {status.tripped_outputs} tripped"
+        if self.abort_on_limit and status.current_limited_outputs:
+            return f"Outputs {status.current_limited_outputs} reached their current limit"
+        return None
+
+    def _step_messages(self, backend, ramps, steps):
+        # (commands, number of queries, encoded message) of every step of a backend, built before starting. The error
+        # registers and the readbacks are checked on some steps. Identical messages are validated and encoded once
+        checks = self._check_queries(ramps)
+        encoded = {}
+        messages = []
+        for step in range(steps):
+            commands = [command for ramp in ramps for command in ramp.commands(step)]
+            queries = 0
+            if step == steps - 1 or (step + 1) % self.check_every == 0:
+                commands += checks
+                queries = len(checks)
+            key = tuple(commands)
+            if key not in encoded:
+                for command in commands:
+                    backend.sock._validate(command)
+                encoded[key] = (";".join(commands) + "\n").encode()
+            messages.append((commands, queries, encoded[key]))
+        return messages
+
+    def _check_queries(self, ramps):
+        queries = []
+        if self.tolerance is not None:
+            queries = [ramp._readback for ramp in ramps] + [f"OP{ramp.output}?" for ramp in ramps]
+        return queries + [f"LSR{ramp.output}?" for ramp in ramps]
+
+    @staticmethod
+    def _send(backend, commands, queries, encoded):
+        # Sends an encoded message through the backend exchange. Errors are checked only on the messages with queries
+        with backend._locked():
+            try:
+                policy = ErrorPolicy.always if queries else ErrorPolicy.never
+                return backend._transfer(commands, queries, policy, encoded=encoded)[0]
+            finally:
+                backend._clear_caches()
+
+    def _run_backend(self, backend, ramps, messages, start, report):
+        lateness = []
+        completed = 0
+        last_sent = start
+        try:
+            for step, (commands, queries, encoded) in enumerate(messages):
+                deadline = start + step * self.period
+                delay = deadline - time.monotonic()
+                if delay > 0 and self._abort.wait(delay):
+                    break
+                if self._abort.is_set():
+                    break
+                last_sent = time.monotonic()
+                lateness.append(last_sent - deadline)
+                answers = self._send(backend, commands, queries, encoded)
+                completed = step + 1
+                if queries:
+                    reason = self._check(backend, ramps, completed, answers)
+                    if reason:
+                        self.abort(reason)
+                        break
+        except Exception as e:
+            log.error("Error ramping: %s", e)
+            self.abort(str(e))
+        finally:
+            for ramp in ramps:
+                ramp.done = min(completed, ramp.steps)
+            with self._report_lock:
+                report.sent[f"{backend.sock._ip}:{backend.sock._port}"] = completed
+                report._lateness.extend(lateness)
+                report.duration = max(report.duration, last_sent - start)
+
+    def run(self, lead=0.01):
+        """
+        Prepare the ramps if needed and run them, starting lead seconds from now. Returns a RampReport. Raises
+        TTiBackendExc, before sending any step, if a command is not valid
+        """
+        if any(ramp.steps is None for ramp in self.ramps):
+            self.prepare()
+        steps = max((ramp.steps for ramp in self.ramps), default=0)
+        report = RampReport(self.period, steps)
+        plans = [(backend, ramps, self._step_messages(backend, ramps, max(ramp.steps for ramp in ramps)))
+                 for backend, ramps in self._by_backend()]
+        self._abort.clear()
+        self._report = report
+        start = time.monotonic() + lead
+        threads = [threading.Thread(target=self._run_backend, args=(*plan, start, report), name="RampEngine",
+                                    daemon=True)
+                   for plan in plans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if report._lateness:
+            report.lateness_mean = sum(report._lateness) / len(report._lateness)
+            report.lateness_max = max(report._lateness)
+        return report
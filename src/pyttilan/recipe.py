@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Timed setpoint programs (recipes) for several power supplies.
+
+A recipe is a table of steps with columns time, supply, output, voltage, current and enabled, as a CSV file with a
+header or as JSON Lines (one object per line, .jsonl or .ndjson). time is in seconds from the start of the program and
+must not decrease. voltage, current and enabled are optional, values that are empty or missing are not changed.
+
+    time,supply,output,voltage,current,enabled
+    0,bias,1,3.3,0.5,1
+    0,heaters,1,12,,1
+    10.5,bias,1,3.0,,
+
+    player = RecipePlayer({'bias': bias_backend, 'heaters': heaters_backend}, check_every=100)
+    report = player.play('program.csv')
+
+Recipes are read and compiled as a stream, so they can have any number of steps. Before playing, the whole recipe is
+read once to validate every command (validate_recipe). Then the rows with the same time are compiled to a single
+message for each power supply and sent at start + time on the monotonic clock, messages of different power supplies
+concurrently.
+
+Errors are not checked after every message: every check_every time steps (and at the end) the error registers of the
+power supplies that got commands since the last check are read. The delay of every time step with respect to its
+planned time is measured, and can be written to timing_log as CSV.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import csv
+import json
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pyttilan.backend import CommandBatch, ErrorPolicy, TTiBackendExc
+
+log = logging.getLogger(__name__)
+
+RECIPE_FIELDS = ('time', 'supply', 'output', 'voltage', 'current', 'enabled')
+
+RecipeStep = namedtuple('RecipeStep', RECIPE_FIELDS, defaults=(None, None, None))
+RecipeStep.__doc__ = "Row of a recipe. voltage, current and enabled are None when they are not changed"
+
+CompiledStep = namedtuple('CompiledStep', ('time', 'messages', 'line'))
+CompiledStep.__doc__ = ("Rows of a recipe with the same time. messages has the commands for each power supply, "
+                        "line is the number of the first row")
+
+
+def _optional(value, convert):
+    if value is None or value == '':
+        return None
+    return convert(value)
+
+
+def _enabled(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ('1', 'on', 'true'):
+            return True
+        if value in ('0', 'off', 'false'):
+            return False
+        raise ValueError(f"Invalid output state {value}")
+    return bool(value)
+
+
+def _step(row):
+    return RecipeStep(float(row['time']), str(row['supply']), int(row['output']),
+                      _optional(row.get('voltage'), float), _optional(row.get('current'), float),
+                      _optional(row.get('enabled'), _enabled))
+
+
+def parse_csv(lines):
+    """
+    Generator of the RecipeStep of the lines of a CSV recipe, the first one is the header
+    """
+    for number, row in enumerate(csv.DictReader(lines), start=2):
+        try:
+            yield _step(row)
+        except (KeyError, TypeError, ValueError) as e:
+            raise TTiBackendExc(f"Invalid recipe row on line {number}: {e}")
+
+
+def parse_ndjson(lines):
+    """
+    Generator of the RecipeStep of the lines of a JSON Lines recipe
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield _step(json.loads(line))
+        except (KeyError, TypeError, ValueError) as e:
+            raise TTiBackendExc(f"Invalid recipe row on line {number}: {e}")
+
+
+def read_recipe(path):
+    """
+    Generator of the RecipeStep of a recipe file, CSV or JSON Lines depending on its extension
+    """
+    parser = parse_ndjson if path.endswith(('.jsonl', '.ndjson')) else parse_csv
+    with open(path, newline='') as fp:
+        yield from parser(fp)
+
+
+def _record(batch, step):
+    if step.voltage is not None:
+        batch.set_voltage(step.output, step.voltage)
+    if step.current is not None:
+        batch.set_current_limit(step.output, step.current)
+    if step.enabled is not None:
+        (batch.enable_output_channel if step.enabled else batch.disable_output_channel)(step.output)
+
+
+def compile_recipe(steps, backends):
+    """
+    Generator of the CompiledStep of steps. The commands of every row are generated by the backend methods of its
+    power supply (backends is a dictionary of backends by name) and validated
+    """
+    current = None
+    batches = {}
+    first_line = 0
+
+    def compiled():
+        messages = {}
+        for name, batch in batches.items():
+            commands = batch._take_pending()[0]
+            validator = batch._backend._valid_commands
+            for command in commands:
+                if validator.validate_command(command) is None:
+                    raise TTiBackendExc(f"Invalid command {command} for {name} at time {current}")
+            messages[name] = commands
+        return CompiledStep(current, messages, first_line)
+
+    for line, step in enumerate(steps, start=1):
+        if step.time != current:
+            if current is not None:
+                if step.time < current:
+                    raise TTiBackendExc(f"Recipe time goes back from {current} to {step.time} on row {line}")
+                yield compiled()
+            current = step.time
+            batches = {}
+            first_line = line
+        if step.supply not in backends:
+            raise TTiBackendExc(f"Unknown power supply {step.supply} on row {line}")
+        batch = batches.get(step.supply)
+        if batch is None:
+            batch = batches[step.supply] = CommandBatch(backends[step.supply])
+        try:
+            _record(batch, step)
+        except (TTiBackendExc, ValueError) as e:
+            raise TTiBackendExc(f"Invalid recipe row {line}: {e}")
+    if current is not None:
+        yield compiled()
+
+
+def validate_recipe(steps, backends):
+    """
+    Compile all the steps without sending them. Returns the number of time steps and the time of the last one.
+    Raises TTiBackendExc on the first error
+    """
+    count, last = 0, 0.0
+    for compiled in compile_recipe(steps, backends):
+        count += 1
+        last = compiled.time
+    return count, last
+
+
+class RecipeReport:
+    """
+    Result of RecipePlayer.play. lateness is the delay of the time steps with respect to their planned time
+    """
+
+    def __init__(self):
+        self.steps = 0
+        self.messages = 0
+        self.checks = 0
+        self.late_steps = 0
+        self.lateness_mean = 0.0
+        self.lateness_max = 0.0
+        self.duration = 0.0
+
+    def __repr__(self):
+        return (f"RecipeReport(steps={self.steps}, messages={self.messages}, checks={self.checks}, "
+                f"late_steps={self.late_steps}, lateness_mean={self.lateness_mean:.6f}, "
+                f"lateness_max={self.lateness_max:.6f}, duration={self.duration:.6f})")
+
+    def _record(self, lateness, late):
+        self.steps += 1
+        self.lateness_mean += (lateness - self.lateness_mean) / self.steps
+        self.lateness_max = max(self.lateness_max, lateness)
+        self.late_steps += lateness > late
+
+
+class RecipePlayer:
+    """
+    Plays recipes on the backends, a dictionary of them by name or a fleet.SupplyFleet.
+
+    check_every: time steps between error checks, None to check only at the end
+    late: time steps delayed more than these seconds are counted as late
+    timing_log: file where the planned time, the actual time and the delay of every time step are written as CSV
+    """
+
+    def __init__(self, backends, check_every=None, late=0.01, timing_log=None, max_workers=16):
+        self._backends = backends
+        self.check_every = check_every
+        self.late = late
+        self.timing_log = timing_log
+        self.max_workers = max_workers
+
+    def _backend_map(self):
+        if hasattr(self._backends, 'backend'):
+            # SupplyFleet, connected when first used
+            return {name: self._backends.backend(name) for name in self._backends}
+        return self._backends
+
+    def _steps(self, recipe):
+        return read_recipe(recipe) if isinstance(recipe, str) else iter(recipe)
+
+    def play(self, recipe, validate=True):
+        """
+        Play a recipe, a file name or an iterable of RecipeStep. If validate, a file is validated completely before
+        sending anything (an iterable can only be read once and is validated as it is played). Returns a RecipeReport
+        """
+        backends = self._backend_map()
+        if validate and isinstance(recipe, str):
+            count, last = validate_recipe(read_recipe(recipe), backends)
+            log.info("Recipe %s validated: %d time steps, %.3f s", recipe, count, last)
+        report = RecipeReport()
+        writer = csv.writer(self.timing_log, lineterminator="\n") if self.timing_log else None
+        if writer:
+            writer.writerow(['planned', 'actual', 'lateness'])
+        dirty = set()
+        pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="RecipePlayer")
+        start = time.monotonic()
+        try:
+            for compiled in compile_recipe(self._steps(recipe), backends):
+                planned = start + compiled.time
+                delay = planned - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                actual = time.monotonic()
+                self._send(pool, backends, compiled.messages)
+                report.messages += len(compiled.messages)
+                dirty.update(compiled.messages)
+                report._record(actual - planned, self.late)
+                if writer:
+                    writer.writerow([f"{compiled.time:.6f}", f"{actual - start:.6f}", f"{actual - planned:.6f}"])
+                if self.check_every and report.steps % self.check_every == 0:
+                    self._check(pool, backends, dirty, compiled.time)
+                    report.checks += 1
+            self._check(pool, backends, dirty, 'end')
+            report.checks += 1
+        finally:
+            pool.shutdown()
+            report.duration = time.monotonic() - start
+        return report
+
+    def _run(self, pool, func, names):
+        # Run func(name) for every name, concurrently if there are several
+        names = list(names)
+        if len(names) == 1:
+            func(names[0])
+            return
+        for future in [pool.submit(func, name) for name in names]:
+            future.result()
+
+    def _send(self, pool, backends, messages):
+        def send(name):
+            commands = messages[name]
+            backends[name]._exchange(commands, [False] * len(commands), ErrorPolicy.never)
+
+        self._run(pool, send, messages)
+
+    def _check(self, pool, backends, dirty, when):
+        errors = {}
+
+        def check(name):
+            try:
+                backends[name].flush_errors()
+            except TTiBackendExc as e:
+                errors[name] = e
+
+        if dirty:
+            self._run(pool, check, dirty)
+            dirty.clear()
+        if errors:
+            detail = "; ".join(f"{name}: {error}" for name, error in errors.items())
+            raise TTiBackendExc(f"Recipe errors found at time {when}: {detail}")
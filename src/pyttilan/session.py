@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Recording of the communication with power supplies and replay of the recordings without hardware.
+
+    recorder = SessionRecorder('lab.ttirec', compress=True)
+    recorder.attach(backend)  # once connected, it keeps being recorded after reconnecting
+    ...
+    recorder.close()
+
+    backend = PLBackend()
+    backend.sock = ReplaySockCommand('lab.ttirec', valid_commands=TTiPLCommands())
+    backend.connect('172.16.7.253')
+    backend.get_configured_voltage(1)  # answered from the recording
+
+The recorder wraps the socket of a SockCommand, so it logs the bytes exactly as they are sent and received, including
+the error checks, the reads that timed out and their late answers. Each record is appended to the file as kind,
+connection, timestamp (seconds since the recording started) and length of the payload, followed by the payload. Every
+SockCommand attached to a recorder is a connection, numbered from 1 on each session, whose CONNECT records give the
+host:port it connected to. With compress the file is a gzip stream, every session appended to it is a new gzip member.
+Sessions can only be appended to recordings with the same compress.
+
+ReplaySockCommand is a SockCommand whose socket serves the recording of the last connection to the address it connects
+to: every message sent must be the next one recorded (strict) and the bytes received after it on the recording are
+returned as answers. Reads time out where they timed
+out while recording, and also if nothing more was received. Answers are returned as fast as possible, or with the
+recorded delays after each message divided by speed.
+
+Only synchronous backends (SockCommand) can be recorded and replayed.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import gzip
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from itertools import count
+
+from pyttilan.backend import SockCommand, TTiBackendExc
+from pyttilan.commands import Commands
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'TTIREC2\n'
+# Kinds of records
+SESSION = 0  # payload: wall clock time when the recording started, as text. Connection 0
+CONNECT = 1  # payload: host:port
+SENT = 2
+RECEIVED = 3
+DISCONNECT = 4
+TIMEOUT = 5  # A read timed out
+_RECORD = struct.Struct('<BHdI')
+_GZIP_MAGIC = b'\x1f\x8b'
+# Errors reading a compressed recording cut off or corrupted
+_GZIP_ERRORS = (EOFError, gzip.BadGzipFile, zlib.error)
+
+
+def _open_recording(path):
+    # Open a recording to read it after its magic, compressed or not
+    with open(path, 'rb') as fp:
+        compressed = fp.read(2) == _GZIP_MAGIC
+    fp = gzip.open(path, 'rb') if compressed else open(path, 'rb')
+    try:
+        magic = fp.read(len(MAGIC))
+    except _GZIP_ERRORS:
+        magic = b''
+    if magic != MAGIC:
+        fp.close()
+        raise TTiBackendExc(f"{path} is not a recording of a session")
+    return compressed, fp
+
+
+class SessionRecorder:
+    """
+    Appends the communication of the SockCommands attached to it to path
+    """
+
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.compress = compress
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            compressed, fp = _open_recording(path)
+            fp.close()
+            if compressed != compress:
+                raise TTiBackendExc(f"{path} is {'' if compressed else 'not '}compressed, sessions appended to it "
+                                    f"must be recorded with compress={compressed}")
+        self._fp = gzip.open(path, 'ab') if compress else open(path, 'ab')
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._attached = []
+        self._connections = count(1)
+        self.records = 0
+        if new:
+            self._fp.write(MAGIC)
+        self.record(SESSION, repr(time.time()).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, kind, payload=b'', connection=0):
+        with self._lock:
+            if self._fp is None:
+                return
+            self._fp.write(_RECORD.pack(kind, connection, time.monotonic() - self._start, len(payload)))
+            self._fp.write(payload)
+            self.records += 1
+
+    def flush(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.flush()
+
+    def attach(self, target):
+        """
+        Record the communication of a SockCommand, or of the SockCommand of a backend, from now on. It keeps being
+        recorded after reconnecting
+        """
+        sock = getattr(target, 'sock', target)
+        if not isinstance(sock, SockCommand) or hasattr(sock, '_recorder'):
+            raise TTiBackendExc("Only SockCommands that are not being recorded can be recorded")
+        open_socket = sock._open_socket
+        connection = next(self._connections)
+
+        def recorded_open_socket():
+            raw = open_socket()
+            self.record(CONNECT, f"{sock._ip}:{sock._port}".encode(), connection)
+            return _RecordingSocket(raw, self, connection)
+
+        sock._recorder = self
+        sock._open_socket = recorded_open_socket
+        if sock._sock is not None:
+            self.record(CONNECT, f"{sock._ip}:{sock._port}".encode(), connection)
+            sock._sock = _RecordingSocket(sock._sock, self, connection)
+            sock._lines._sock = sock._sock
+        self._attached.append(sock)
+
+    def detach(self, sock):
+        sock = getattr(sock, 'sock', sock)
+        del sock._open_socket
+        del sock._recorder
+        if isinstance(sock._sock, _RecordingSocket):
+            sock._sock = sock._sock.raw
+            sock._lines._sock = sock._sock
+        self._attached.remove(sock)
+
+    def close(self):
+        """
+        Stop recording the attached SockCommands and close the file
+        """
+        for sock in list(self._attached):
+            self.detach(sock)
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+
+class _RecordingSocket:
+    # Socket that records what is sent and received through it
+    def __init__(self, raw, recorder, connection):
+        self.raw = raw
+        self._recorder = recorder
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def sendall(self, data):
+        self._recorder.record(SENT, bytes(data), self._connection)
+        return self.raw.sendall(data)
+
+    def recv_into(self, buffer, nbytes=0):
+        try:
+            received = self.raw.recv_into(buffer, nbytes)
+        except socket.timeout:
+            self._recorder.record(TIMEOUT, connection=self._connection)
+            raise
+        self._recorder.record(RECEIVED, bytes(memoryview(buffer)[:received]), self._connection)
+        return received
+
+    def shutdown(self, how):
+        self._recorder.record(DISCONNECT, connection=self._connection)
+        return self.raw.shutdown(how)
+
+
+def read_session(path):
+    """
+    Generator of the records of a recording, as (kind, connection, timestamp, payload). A recording cut off, like
+    when the process recording it crashed, ends at its last complete record
+    """
+    _, fp = _open_recording(path)
+    with fp:
+        while True:
+            try:
+                header = fp.read(_RECORD.size)
+                if not header:
+                    return
+                payload = b''
+                if len(header) == _RECORD.size:
+                    kind, connection, timestamp, length = _RECORD.unpack(header)
+                    payload = fp.read(length)
+            except _GZIP_ERRORS:
+                header = b''
+            if len(header) < _RECORD.size or len(payload) < length:
+                log.warning("Recording %s is truncated", path)
+                return
+            yield kind, connection, timestamp, payload
+
+
+class _ReplaySocket:
+    # Socket that serves the answers of a recording to the connection followed
+    def __init__(self, records, strict, speed):
+        self._records = records
+        self._strict = strict
+        self._speed = speed
+        self.address = None  # host:port whose last connection is replayed
+        self._connection = None  # Connection followed on the current session
+        self._pending = []  # (timestamp, bytes, or None for a timeout) received after the last message sent
+        self._next = None  # Next record sent, already read from the recording
+        self._anchor = None  # (time.monotonic(), recorded timestamp) of the last message sent
+        self._timeout = None
+
+    def settimeout(self, timeout):
+        self._timeout = timeout
+
+    def setsockopt(self, *args):
+        pass
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+    def _advance(self):
+        # Queue the answers until the next message sent, which is kept on _next
+        for kind, connection, timestamp, payload in self._records:
+            if kind == SESSION:
+                # Connections are numbered again on every session
+                self._connection = None
+            elif kind == CONNECT:
+                if payload.decode() == self.address:
+                    self._connection = connection
+                elif connection == self._connection:
+                    self._connection = None
+            elif connection != self._connection:
+                continue
+            elif kind == RECEIVED and payload:
+                self._pending.append((timestamp, payload))
+            elif kind == TIMEOUT:
+                self._pending.append((timestamp, None))
+            elif kind == SENT:
+                self._next = (timestamp, payload)
+                return
+        self._next = None
+
+    def sendall(self, data):
+        if self._next is None:
+            self._advance()
+        if self._next is None:
+            raise TTiBackendExc(f"Nothing more was sent to {self.address} on the recording, "
+                                f"sending {bytes(data)!r}")
+        timestamp, expected = self._next
+        if self._strict and bytes(data) != expected:
+            raise TTiBackendExc(f"Replay diverged: sending {bytes(data)!r} instead of {expected!r}")
+        # Answers not read before sending were stale, they are discarded like the power supply would have sent them
+        self._pending = []
+        self._next = None
+        self._anchor = (time.monotonic(), timestamp)
+        self._advance()
+
+    def _wait(self, timestamp):
+        if self._speed is None or self._anchor is None:
+            return
+        delay = self._anchor[0] + (timestamp - self._anchor[1]) / self._speed - time.monotonic()
+        if delay > 0:
+            if self._timeout is not None and delay > self._timeout:
+                time.sleep(self._timeout)
+                raise socket.timeout("timed out")
+            time.sleep(delay)
+
+    def recv_into(self, buffer, nbytes=0):
+        if not self._pending:
+            if self._next is None:
+                # End of the recording, like a closed connection
+                return 0
+            # Nothing was received after this message while recording
+            raise socket.timeout("timed out")
+        timestamp, payload = self._pending[0]
+        if payload is None:
+            # The read timed out while recording
+            self._pending.pop(0)
+            self._wait(timestamp)
+            raise socket.timeout("timed out")
+        self._wait(timestamp)
+        size = min(len(payload), nbytes or len(buffer))
+        buffer[:size] = payload[:size]
+        if size < len(payload):
+            self._pending[0] = (timestamp, payload[size:])
+        else:
+            self._pending.pop(0)
+        return size
+
+
+class ReplaySockCommand(SockCommand):
+    """
+    SockCommand that answers from a recording made by SessionRecorder (path) or from an iterable of records. It
+    replays the last connection recorded to the host:port it connects to.
+
+    strict: raise TTiBackendExc if a message sent is not the one recorded
+    speed: None to answer immediately, 1.0 to answer with the recorded delays, 10.0 ten times faster...
+    """
+
+    def __init__(self, path, valid_commands=Commands(), strict=True, speed=None, timeout=None, ip='replay',
+                 port=9221, **kwargs):
+        super().__init__(ip, port, valid_commands, timeout=timeout, **kwargs)
+        self._records = iter(read_session(path)) if isinstance(path, (str, os.PathLike)) else iter(path)
+        self._replay = _ReplaySocket(self._records, strict, speed)
+
+    def _open_socket(self):
+        self._replay.address = f"{self._ip}:{self._port}"
+        return self._replay
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Publication of telemetry samples on shared memory, so many local processes read them without connecting to the power
+supply.
+
+    publisher = SharedTelemetryPublisher(backend, [('voltage', 1), ('current', 1)], rate=20, name='pl068')
+    with publisher:
+        ...
+
+and, on any other process:
+
+    reader = SharedTelemetryReader('pl068')
+    for timestamp, (volts, amps) in reader.samples():
+        ...
+
+The shared memory block has a header, a table with the channels (position of the channel on telemetry.CHANNEL_QUERIES
+and output, like the channels of TelemetrySampler) and a ring buffer with a row of doubles per sample: the timestamp
+and the value of each channel.
+
+Readers are never blocked by the publisher. The header holds a sequence number that the publisher makes odd before
+writing a row and even again after it (a seqlock), so the number of samples written is sequence // 2. A reader
+copies the rows it wants and reads the sequence again: the rows that the publisher may have overwritten meanwhile are
+discarded. Reader.array is a view of the ring buffer, without copies, for consumers that check the sequence themselves.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import struct
+import time
+from array import array
+from multiprocessing import shared_memory
+
+from pyttilan.backend import TTiBackendExc
+from pyttilan.telemetry import CHANNEL_QUERIES, TelemetrySampler, np
+
+MAGIC = b'TTIS'
+LAYOUT_VERSION = 2
+# magic, layout version, capacity, number of channels, sampling period and sequence
+_HEADER = struct.Struct('<4sIIIdQ')
+_SEQUENCE_OFFSET = _HEADER.size - 8
+_SEQUENCE = struct.Struct('<Q')
+# Position of the channel on CHANNEL_QUERIES and output
+_CHANNEL = struct.Struct('<II')
+_CHANNEL_NAMES = tuple(CHANNEL_QUERIES)
+_DOUBLE = 8
+
+
+def _data_offset(n_channels):
+    return _HEADER.size + n_channels * _CHANNEL.size
+
+
+def _attach(name):
+    # Readers must not unlink the block when they exit, only the publisher owns it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedTelemetryPublisher(TelemetrySampler):
+    """
+    TelemetrySampler that also writes every sample on a shared memory block called name (a random name if it is not
+    given, see the name attribute). The last capacity samples are kept. The block is removed by close, or stop
+    when the publisher is used as a context manager
+    """
+
+    def __init__(self, backend, channels, rate, name=None, capacity=10000, use_numpy=True):
+        super().__init__(backend, channels, rate, capacity, use_numpy)
+        n_channels = len(self.channels)
+        size = _data_offset(n_channels) + self.capacity * self._width * _DOUBLE
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self._shm.name
+        buf = self._shm.buf
+        _HEADER.pack_into(buf, 0, MAGIC, LAYOUT_VERSION, self.capacity, n_channels, self.period, 0)
+        for i, (channel, output) in enumerate(self.channels):
+            _CHANNEL.pack_into(buf, _HEADER.size + i * _CHANNEL.size, _CHANNEL_NAMES.index(channel), output)
+        self._rows = buf[_data_offset(n_channels):].cast('d')
+        self._sequence = 0
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        self.close()
+
+    def _store(self, timestamp, values):
+        super()._store(timestamp, values)
+        self.publish(timestamp, values)
+
+    def publish(self, timestamp, values):
+        """
+        Write a sample on the shared memory. Samples taken by the sampler are published automatically
+        """
+        start = (self._sequence // 2) % self.capacity * self._width
+        _SEQUENCE.pack_into(self._shm.buf, _SEQUENCE_OFFSET, self._sequence + 1)
+        self._rows[start] = timestamp
+        self._rows[start + 1:start + self._width] = array('d', values)
+        self._sequence += 2
+        _SEQUENCE.pack_into(self._shm.buf, _SEQUENCE_OFFSET, self._sequence)
+
+    def close(self):
+        """
+        Stop sampling and remove the shared memory block. Readers attached keep their mapping until they close
+        """
+        self.stop()
+        if self._shm is None:
+            return
+        self._rows.release()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+
+class SharedTelemetryReader:
+    """
+    Reads the samples published by a SharedTelemetryPublisher on the shared memory block called name.
+
+    channels is the list of (channel name, output) of the publisher, in the order of the values of each sample
+    """
+
+    def __init__(self, name):
+        self._shm = _attach(name)
+        buf = self._shm.buf
+        magic, version, self.capacity, n_channels, self.period, _ = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self._shm.close()
+            raise TTiBackendExc(f"{name} is not a telemetry block of this version")
+        self.name = name
+        self.channels = []
+        for i in range(n_channels):
+            channel, output = _CHANNEL.unpack_from(buf, _HEADER.size + i * _CHANNEL.size)
+            self.channels.append((_CHANNEL_NAMES[channel], output))
+        self._width = 1 + n_channels
+        self._rows = buf[_data_offset(n_channels):].cast('d')
+        self.overruns = 0
+        if np is not None:
+            self.array = np.frombuffer(self._rows, dtype='f8').reshape(self.capacity, self._width)
+        else:
+            self.array = self._rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._shm is None:
+            return
+        # The NumPy view must be released before the memory it points to
+        self.array = None
+        self._rows.release()
+        self._shm.close()
+        self._shm = None
+
+    @property
+    def sequence(self):
+        return _SEQUENCE.unpack_from(self._shm.buf, _SEQUENCE_OFFSET)[0]
+
+    @property
+    def count(self):
+        """Number of samples published"""
+        return self.sequence // 2
+
+    def index(self, channel, output):
+        """
+        Position of a channel on the values of the samples
+        """
+        return self.channels.index((channel, output))
+
+    def _read(self, first, last):
+        # Copy of samples first to last - 1 that were not overwritten while copying them
+        rows = []
+        for sample in range(first, last):
+            start = sample % self.capacity * self._width
+            rows.append(self._rows[start:start + self._width].tolist())
+        # Sample (sequence - 1) // 2 may be being written, it overwrites sample (sequence - 1) // 2 - capacity
+        oldest = (self.sequence - 1) // 2 - self.capacity + 1
+        skip = max(0, oldest - first)
+        return [(row[0], tuple(row[1:])) for row in rows[skip:]]
+
+    def latest(self, n=1):
+        """
+        Return the last n samples (or less if not available) as a list of (timestamp, values), oldest first
+        """
+        count = self.count
+        return self._read(max(0, count - min(n, self.capacity)), count)
+
+    def samples(self, timeout=None, poll_interval=None):
+        """
+        Generator of (timestamp, values) for every sample published from now on. It ends when no sample arrives in
+        timeout seconds. The shared memory is polled every poll_interval seconds, half the sampling period by default.
+        Samples overwritten before they are read are skipped and counted on overruns
+        """
+        poll_interval = self.period / 2 if poll_interval is None else poll_interval
+        position = self.count
+        last_sample = time.monotonic()
+        while True:
+            count = self.count
+            if count == position:
+                if timeout is not None and time.monotonic() - last_sample > timeout:
+                    return
+                time.sleep(poll_interval)
+                continue
+            if count - position > self.capacity:
+                self.overruns += count - position - self.capacity
+                position = count - self.capacity
+            rows = self._read(position, count)
+            self.overruns += count - position - len(rows)
+            position = count
+            last_sample = time.monotonic()
+            yield from rows
+
+    def __iter__(self):
+        return self.samples()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Simulator of TTi PL and CPx power supplies, to test and benchmark without hardware.
+
+    python -m pyttilan.simulator --model PL068 --port 9221
+
+starts a simulated PL068 that can be used with PLBackend like a real one.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+from pyttilan.simulator.instrument import Instrument, Model, MODELS
+from pyttilan.simulator.server import SimulatorServer, SimulatorThread, Faults
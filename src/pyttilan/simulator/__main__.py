@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Run simulated power supplies
+
+Each simulated power supply listens on its own port, starting at --port
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__license__ = 'CC0 1.0 Universal'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import argparse
+import asyncio
+import logging
+
+from pyttilan.simulator import Instrument, SimulatorServer, Faults, MODELS
+
+
+async def main(args):
+    servers = []
+    for i in range(args.count):
+        instrument = Instrument(args.model, serial=f"{i + 1:06d}")
+        server = SimulatorServer(instrument, host=args.host, port=args.port + i, latency=args.latency,
+                                 jitter=args.jitter,
+                                 faults=Faults(args.drop, args.disconnect, args.command_error))
+        servers.append(await server.start())
+        logging.info(f"Simulated {instrument.model.name} listening on {args.host}:{server.port}")
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulator of TTi power supplies")
+    parser.add_argument('--model', choices=sorted(MODELS), default='PL068')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9221, help="port of the first simulated power supply")
+    parser.add_argument('--count', type=int, default=1, help="number of simulated power supplies")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to answer each message")
+    parser.add_argument('--jitter', type=float, default=0.0, help="maximum random extra latency in seconds")
+    parser.add_argument('--drop', type=float, default=0.0, help="probability of not answering a message")
+    parser.add_argument('--disconnect', type=float, default=0.0, help="probability of closing the connection")
+    parser.add_argument('--command-error', type=float, default=0.0, help="probability of a command error")
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Simulated TTi power supply: keeps the state of the outputs and registers and answers commands of the PL and CPx
+command sets
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import re
+from dataclasses import dataclass, field
+
+from pyttilan.commands import TTiPLCommands, TTiCPxCommands
+
+# Standard event status register bits
+ESR_OPC = 1 << 0
+ESR_QUERY_ERROR = 1 << 2
+ESR_VERIFY_TIMEOUT = 1 << 3
+ESR_EXECUTION_ERROR = 1 << 4
+ESR_COMMAND_ERROR = 1 << 5
+
+# Limit event status register bits
+LSR_VOLTAGE_LIMIT = 1 << 0
+LSR_CURRENT_LIMIT = 1 << 1
+LSR_OVP_TRIP = 1 << 2
+LSR_OCP_TRIP = 1 << 3
+
+# Execution error register values
+EER_RANGE = 100
+EER_NO_OUTPUT = 103
+EER_OUTPUT_ON = 104
+
+
+@dataclass(frozen=True)
+class Model:
+    """
+    Description of a power supply model
+    """
+    name: str
+    commands: type
+    num_outputs: int
+    max_voltage: float
+    max_current: float
+    # PL068 answers OVP?/OCP? with the value only, instead of VP<N> <NR2> / CP<N> <NR2>
+    protection_value_only: bool = False
+    ocp_format: str = '{:.3f}'
+
+
+MODELS = {
+    'PL068': Model('PL068-P', TTiPLCommands, 1, 6.0, 8.0, protection_value_only=True, ocp_format='{:.4f}'),
+    'PL303QMD': Model('PL303QMD-P', TTiPLCommands, 2, 30.0, 3.0, protection_value_only=True,
+                      ocp_format='{:.4f}'),
+    'CPX400DP': Model('CPX400DP', TTiCPxCommands, 2, 60.0, 20.0),
+}
+
+
+@dataclass
+class OutputState:
+    voltage: float = 1.0
+    current_limit: float = 1.0
+    ovp: float = 7.0
+    ocp: float = 9.0
+    delta_v: float = 0.01
+    delta_i: float = 0.01
+    enabled: bool = False
+    irange: int = 2
+    damping: int = 0
+    # Simulated load connected to the output
+    load_ohms: float = 10.0
+    lsr: int = 0
+    lse: int = 0
+    stores: dict = field(default_factory=dict)
+
+    @property
+    def constant_current(self):
+        return self.voltage / self.load_ohms > self.current_limit
+
+    @property
+    def measured_voltage(self):
+        if not self.enabled:
+            return 0.0
+        if self.constant_current:
+            return self.current_limit * self.load_ohms
+        return self.voltage
+
+    @property
+    def measured_current(self):
+        if not self.enabled:
+            return 0.0
+        return min(self.voltage / self.load_ohms, self.current_limit)
+
+
+_NUMBER = r"([0-9,\.,e,\-]*)"
+
+
+class Instrument:
+    """
+    State of a simulated power supply. execute receives a program message (commands separated by ';') and returns
+    the response message, or None if there were no queries
+    """
+
+    def __init__(self, model='PL068', serial='000001', address=11):
+        self.model = MODELS[model] if isinstance(model, str) else model
+        self.serial = serial
+        self.address = address
+        self._valid = self.model.commands()
+        self._handlers = [(re.compile(pattern + "$"), handler) for pattern, handler in self._table()]
+        self.reset()
+        self.esr = 0
+        self.eer = 0
+        self.qer = 0
+        self.ese = 0
+        self.sre = 0
+        self.pre = 0
+        self.lock_owner = None
+        self.ipaddr = "192.168.1.100"
+        self.netmask = "255.255.255.0"
+        self.netconfig = "STATIC"
+
+    def reset(self):
+        self.outputs = [OutputState(ovp=self.model.max_voltage * 1.1, ocp=self.model.max_current * 1.1)
+                        for _ in range(self.model.num_outputs)]
+        self.config = 0
+        self.ratio = 100
+
+    # Registers
+
+    @property
+    def stb(self):
+        stb = 0
+        for i, output in enumerate(self.outputs[:2]):
+            if output.lsr & output.lse:
+                stb |= 1 << i
+        if self.esr & self.ese:
+            stb |= 1 << 5
+        if stb & self.sre:
+            stb |= 1 << 6
+        return stb
+
+    def _error(self, esr_bit, eer=None):
+        self.esr |= esr_bit
+        if eer is not None:
+            self.eer = eer
+
+    def _output(self, n):
+        n = int(n)
+        if n > len(self.outputs):
+            self._error(ESR_EXECUTION_ERROR, EER_NO_OUTPUT)
+            return None
+        return self.outputs[n - 1]
+
+    def _update(self, output):
+        # Latch limit and trip events after a change of the output
+        if not output.enabled:
+            return
+        if output.voltage > output.ovp:
+            output.enabled = False
+            output.lsr |= LSR_OVP_TRIP
+            return
+        if output.measured_current > output.ocp:
+            output.enabled = False
+            output.lsr |= LSR_OCP_TRIP
+            return
+        output.lsr |= LSR_CURRENT_LIMIT if output.constant_current else LSR_VOLTAGE_LIMIT
+
+    def _set(self, n, attribute, value, maximum):
+        output = self._output(n)
+        if output is None:
+            return
+        value = float(value)
+        if not 0 <= value <= maximum:
+            self._error(ESR_EXECUTION_ERROR, EER_RANGE)
+            return
+        setattr(output, attribute, value)
+        self._update(output)
+
+    def _get(self, n, fmt, attribute):
+        output = self._output(n)
+        if output is None:
+            return None
+        return fmt.format(n=n, value=getattr(output, attribute))
+
+    def _protection(self, n, prefix, attribute, value_format):
+        output = self._output(n)
+        if output is None:
+            return None
+        value = value_format.format(getattr(output, attribute))
+        if self.model.protection_value_only:
+            return value
+        return f"{prefix}{n} {value}"
+
+    def _step(self, n, attribute, delta, maximum, sign):
+        output = self._output(n)
+        if output is None:
+            return
+        self._set(n, attribute, getattr(output, attribute) + sign * getattr(output, delta), maximum)
+
+    def _enable(self, n, value):
+        output = self._output(n)
+        if output is not None:
+            output.enabled = value == '1'
+            self._update(output)
+
+    def _enable_all(self, value):
+        for output in self.outputs:
+            output.enabled = value == '1'
+            self._update(output)
+
+    def _read_lsr(self, n):
+        output = self._output(n)
+        if output is None:
+            return None
+        value, output.lsr = output.lsr, 0
+        return str(value)
+
+    def _read_esr(self):
+        value, self.esr = self.esr, 0
+        return str(value)
+
+    def _read_eer(self):
+        value, self.eer = self.eer, 0
+        return str(value)
+
+    def _read_qer(self):
+        value, self.qer = self.qer, 0
+        return str(value)
+
+    def _clear_status(self):
+        self.esr = self.eer = self.qer = 0
+        for output in self.outputs:
+            output.lsr = 0
+
+    def _clear_trip(self):
+        for output in self.outputs:
+            output.lsr &= ~(LSR_OVP_TRIP | LSR_OCP_TRIP)
+
+    def _save(self, n, store):
+        output = self._output(n)
+        if output is not None:
+            output.stores[store] = (output.voltage, output.current_limit)
+
+    def _recall(self, n, store):
+        output = self._output(n)
+        if output is None:
+            return
+        if store not in output.stores:
+            self._error(ESR_EXECUTION_ERROR, 102)
+            return
+        output.voltage, output.current_limit = output.stores[store]
+        self._update(output)
+
+    def _set_attribute(self, name, value):
+        setattr(self, name, value)
+
+    def _set_output_int(self, n, attribute, value):
+        output = self._output(n)
+        if output is not None:
+            setattr(output, attribute, int(float(value)))
+
+    def _set_irange(self, n, value):
+        output = self._output(n)
+        if output is None:
+            return
+        if output.enabled:
+            self._error(ESR_EXECUTION_ERROR, EER_OUTPUT_ON)
+            return
+        output.irange = int(float(value))
+
+    def _lock(self):
+        self.lock_owner = True
+        return '1'
+
+    def _unlock(self):
+        self.lock_owner = None
+        return '0'
+
+    def _table(self):
+        m = self.model
+        return [
+            (r"V([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'voltage', v, m.max_voltage)),
+            (r"V([1-3])V " + _NUMBER, lambda n, v: self._set(n, 'voltage', v, m.max_voltage)),
+            (r"OVP([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'ovp', v, m.max_voltage * 1.1)),
+            (r"I([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'current_limit', v, m.max_current)),
+            (r"OCP([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'ocp', v, m.max_current * 1.1)),
+            (r"V([1-3])\?", lambda n: self._get(n, "V{n} {value:.3f}", 'voltage')),
+            (r"I([1-3])\?", lambda n: self._get(n, "I{n} {value:.3f}", 'current_limit')),
+            (r"OVP([1-3])\?", lambda n: self._protection(n, 'VP', 'ovp', '{:.3f}')),
+            (r"OCP([1-3])\?", lambda n: self._protection(n, 'CP', 'ocp', m.ocp_format)),
+            (r"V([1-3])O\?", lambda n: self._get(n, "{value:.3f}V", 'measured_voltage')),
+            (r"I([1-3])O\?", lambda n: self._get(n, "{value:.3f}A", 'measured_current')),
+            (r"IRANGE([1-3]) " + _NUMBER, self._set_irange),
+            (r"IRANGE([1-3])\?", lambda n: self._get(n, "{value}", 'irange')),
+            (r"DELTAV([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'delta_v', v, m.max_voltage)),
+            (r"DELTAI([1-3]) " + _NUMBER, lambda n, v: self._set(n, 'delta_i', v, m.max_current)),
+            (r"DELTAV([1-3])\?", lambda n: self._get(n, "DELTAV{n} {value:.3f}", 'delta_v')),
+            (r"DELTAI([1-3])\?", lambda n: self._get(n, "DELTAI{n} {value:.3f}", 'delta_i')),
+            (r"INCV([1-3])V?", lambda n: self._step(n, 'voltage', 'delta_v', m.max_voltage, 1)),
+            (r"DECV([1-3])V?", lambda n: self._step(n, 'voltage', 'delta_v', m.max_voltage, -1)),
+            (r"INCI([1-3])", lambda n: self._step(n, 'current_limit', 'delta_i', m.max_current, 1)),
+            (r"DECI([1-3])", lambda n: self._step(n, 'current_limit', 'delta_i', m.max_current, -1)),
+            (r"OP([1-3]) ([0-1])", self._enable),
+            (r"OPALL ([0-1])", self._enable_all),
+            (r"OP([1-3])\?", lambda n: self._get(n, "{value:d}", 'enabled')),
+            (r"TRIPRST", self._clear_trip),
+            (r"LSR([1-3])\?", self._read_lsr),
+            (r"LSE([1-3]) " + _NUMBER, lambda n, v: self._set_output_int(n, 'lse', v)),
+            (r"LSE([1-3])\?", lambda n: self._get(n, "{value}", 'lse')),
+            (r"SAV([1-3]) ([0-9])", self._save),
+            (r"RCL([1-3]) ([0-9])", self._recall),
+            (r"RATIO " + _NUMBER, lambda v: self._set_attribute('ratio', int(float(v)))),
+            (r"RATIO\?", lambda: str(self.ratio)),
+            (r"CONFIG ([02])", lambda v: self._set_attribute('config', int(v))),
+            (r"CONFIG\?", lambda: str(self.config)),
+            (r"\*CLS", self._clear_status),
+            (r"EER\?", self._read_eer),
+            (r"\*ESE " + _NUMBER, lambda v: self._set_attribute('ese', int(float(v)))),
+            (r"\*ESE\?", lambda: str(self.ese)),
+            (r"\*ESR\?", self._read_esr),
+            (r"\*IST\?", lambda: '1' if self.stb & self.pre else '0'),
+            (r"\*OPC", lambda: self._error(ESR_OPC)),
+            (r"\*OPC\?", lambda: '1'),
+            (r"\*PRE " + _NUMBER, lambda v: self._set_attribute('pre', int(float(v)))),
+            (r"\*PRE\?", lambda: str(self.pre)),
+            (r"QER\?", self._read_qer),
+            (r"\*RST", self.reset),
+            (r"\*SRE " + _NUMBER, lambda v: self._set_attribute('sre', int(float(v)))),
+            (r"\*SRE\?", lambda: str(self.sre)),
+            (r"\*STB\?", lambda: str(self.stb)),
+            (r"\*WAI", lambda: None),
+            (r"LOCAL", lambda: None),
+            (r"IFLOCK", self._lock),
+            (r"IFLOCK\?", lambda: '1' if self.lock_owner else '0'),
+            (r"IFUNLOCK", self._unlock),
+            (r"ADDRESS\?", lambda: str(self.address)),
+            (r"IPADDR\?", lambda: self.ipaddr),
+            (r"NETMASK\?", lambda: self.netmask),
+            (r"NETCONFIG\?", lambda: self.netconfig),
+            (r"NETCONFIG (DHCP|AUTO|STATIC)", lambda v: self._set_attribute('netconfig', v)),
+            (r"IPADDR ([0-9\.]+)", lambda v: self._set_attribute('ipaddr', v)),
+            (r"NETMASK ([0-9\.]+)", lambda v: self._set_attribute('netmask', v)),
+            (r"\*IDN\?", lambda: f"THURLBY THANDAR, {m.name}, {self.serial}, 1.00 - 1.00"),
+            (r"DAMPING([1-3]) " + _NUMBER, lambda n, v: self._set_output_int(n, 'damping', v)),
+            (r"NOLANOK " + _NUMBER, lambda v: None),
+            (r"\*TST\?", lambda: '0'),
+            (r"\*TRG", lambda: None),
+        ]
+
+    def execute_command(self, command):
+        """
+        Execute a single command. Returns the answer of queries or None
+        """
+        if self._valid.validate_command(command) is None:
+            self._error(ESR_COMMAND_ERROR)
+            return None
+        for regex, handler in self._handlers:
+            match = regex.match(command)
+            if match:
+                try:
+                    answer = handler(*match.groups())
+                except ValueError:
+                    self._error(ESR_EXECUTION_ERROR, EER_RANGE)
+                    return None
+                return answer
+        self._error(ESR_COMMAND_ERROR)
+        return None
+
+    def execute(self, message):
+        """
+        Execute a program message, commands separated by ';'. Returns the response message (answers separated by
+        ';') or None if no command had an answer
+        """
+        answers = []
+        for command in message.strip().split(';'):
+            command = command.strip()
+            if not command:
+                continue
+            answer = self.execute_command(command)
+            if answer is not None:
+                answers.append(answer)
+        if not answers:
+            return None
+        return ";".join(answers)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TCP server that makes simulated instruments reachable like real ones on the LAN
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import asyncio
+import random
+import threading
+from dataclasses import dataclass
+
+from pyttilan.simulator.instrument import Instrument
+
+
+@dataclass
+class Faults:
+    """
+    Probabilities, per received message, of injected faults
+    """
+    # The message is processed but no answer is sent
+    drop_response: float = 0.0
+    # The connection is closed without processing the message
+    disconnect: float = 0.0
+    # The message is ignored and a command error is flagged on the standard event status register
+    command_error: float = 0.0
+
+
+class SimulatorServer:
+    """
+    Serves an Instrument over TCP. Any number of clients can be connected at the same time, all of them see the same
+    instrument.
+
+    Every message is answered after latency seconds plus a random uniform jitter between 0 and jitter seconds.
+    faults allows injecting errors.
+    """
+
+    def __init__(self, instrument=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, faults=None, seed=None):
+        self.instrument = instrument or Instrument()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.faults = faults or Faults()
+        self._random = random.Random(seed)
+        self._server = None
+        self._writers = set()
+        self.connections = 0
+        self.messages = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Since python 3.12 wait_closed waits for the connections to be closed
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.messages += 1
+                faults = self.faults
+                if faults.disconnect and self._random.random() < faults.disconnect:
+                    break
+                if faults.command_error and self._random.random() < faults.command_error:
+                    self.instrument.esr |= 1 << 5
+                    continue
+                answer = self.instrument.execute(line.decode(errors='replace'))
+                await self._delay()
+                if answer is None or (faults.drop_response and self._random.random() < faults.drop_response):
+                    continue
+                writer.write((answer + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+
+class SimulatorThread:
+    """
+    Runs simulator servers on an event loop in a background thread, so they can be used from synchronous code:
+
+        with SimulatorThread(SimulatorServer(Instrument('PL068'))) as sim:
+            backend = PLBackend()
+            backend.connect(sim.host, sim.ports[0])
+    """
+
+    def __init__(self, *servers):
+        self.servers = list(servers) or [SimulatorServer()]
+        self._loop = None
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.servers[0].host
+
+    @property
+    def ports(self):
+        return [server.port for server in self.servers]
+
+    def start(self):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(asyncio.gather(*(s.start() for s in self.servers)))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="SimulatorThread", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def stop_servers():
+            await asyncio.gather(*(s.stop() for s in self.servers))
+
+        asyncio.run_coroutine_threadsafe(stop_servers(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
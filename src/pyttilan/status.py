@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Status registers of the power supplies decoded in a single immutable object.
+
+    status = backend.status_snapshot()
+    if status.trip:
+        print("Tripped outputs", status.tripped_outputs)
+
+A StatusSnapshot is built from the answers to *ESR?, EER?, QER?, *STB? and LSRn? of each output, which are read in
+a single message. Bits are decoded with tables computed once, for every possible value of each register.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+# Name of each bit of the registers
+ESR_BITS = {0: 'operation_complete', 2: 'query_error', 3: 'verify_timeout', 4: 'execution_error',
+            5: 'command_error', 7: 'power_on'}
+STB_BITS = {0: 'limit_1', 1: 'limit_2', 4: 'message_available', 5: 'event_status', 6: 'service_request'}
+LSR_BITS = {0: 'voltage_limit', 1: 'current_limit', 2: 'ovp_trip', 3: 'ocp_trip', 4: 'power_limit',
+            6: 'sense_trip'}
+
+# Errors reported by the standard event status register, in the order they are reported
+ESR_ERRORS = (
+    ('command_error', "Command error detected"),
+    ('execution_error', "Execution error"),
+    ('verify_timeout', "Verify timeout detected"),
+    ('query_error', "Query error detected"),
+)
+
+# Meaning of the values of the execution error register
+EER_ERRORS = {code: "Internal hardware error" for code in range(1, 10)}
+EER_ERRORS.update({
+    100: "Range error",
+    101: "Corrupted data",
+    102: "There are no data",
+    103: "Second output not available",
+    104: "Command not valid with output on",
+    200: "Cannot write (read only)",
+})
+
+TRIP_FLAGS = frozenset(('ovp_trip', 'ocp_trip', 'sense_trip'))
+
+
+def _decoding_table(bits):
+    # Flags set on each of the 256 values of an 8 bit register
+    return tuple(frozenset(name for bit, name in bits.items() if value & (1 << bit)) for value in range(256))
+
+
+_ESR_TABLE = _decoding_table(ESR_BITS)
+_STB_TABLE = _decoding_table(STB_BITS)
+_LSR_TABLE = _decoding_table(LSR_BITS)
+
+
+def _flags(table, value):
+    return table[value & 0xFF] if value is not None else frozenset()
+
+
+class StatusSnapshot:
+    """
+    Values of the status registers of a power supply at one moment. Registers that were not read are None.
+
+    esr: standard event status register
+    eer: execution error register
+    qer: query error register
+    stb: status byte
+    lsr: tuple with the limit event status register of each output
+    """
+    __slots__ = ('esr', 'eer', 'qer', 'stb', 'lsr')
+
+    def __init__(self, esr=None, eer=None, qer=None, stb=None, lsr=()):
+        object.__setattr__(self, 'esr', esr)
+        object.__setattr__(self, 'eer', eer)
+        object.__setattr__(self, 'qer', qer)
+        object.__setattr__(self, 'stb', stb)
+        object.__setattr__(self, 'lsr', tuple(lsr))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StatusSnapshot is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, StatusSnapshot) and self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        return (f"StatusSnapshot(esr={self.esr}, eer={self.eer}, qer={self.qer}, stb={self.stb}, "
+                f"lsr={self.lsr})")
+
+    def _values(self):
+        return self.esr, self.eer, self.qer, self.stb, self.lsr
+
+    @staticmethod
+    def queries(outputs):
+        """
+        Queries to read all the registers, for the outputs given (1, 2...)
+        """
+        return ["*ESR?", "EER?", "QER?", "*STB?"] + [f"LSR{output}?" for output in outputs]
+
+    @classmethod
+    def from_answers(cls, answers):
+        """
+        Build a snapshot from the answers to the queries returned by StatusSnapshot.queries
+        """
+        esr, eer, qer, stb, *lsr = (int(answer) for answer in answers)
+        return cls(esr, eer, qer, stb, lsr)
+
+    # Decoded flags
+
+    @property
+    def esr_flags(self):
+        return _flags(_ESR_TABLE, self.esr)
+
+    @property
+    def stb_flags(self):
+        return _flags(_STB_TABLE, self.stb)
+
+    def lsr_flags(self, output):
+        return _flags(_LSR_TABLE, self.lsr[output - 1])
+
+    @property
+    def command_error(self):
+        return 'command_error' in self.esr_flags
+
+    @property
+    def execution_error(self):
+        return 'execution_error' in self.esr_flags
+
+    @property
+    def verify_timeout(self):
+        return 'verify_timeout' in self.esr_flags
+
+    @property
+    def query_error(self):
+        return 'query_error' in self.esr_flags
+
+    @property
+    def tripped_outputs(self):
+        return tuple(i + 1 for i, value in enumerate(self.lsr) if _LSR_TABLE[value & 0xFF] & TRIP_FLAGS)
+
+    @property
+    def trip(self):
+        return bool(self.tripped_outputs)
+
+    @property
+    def current_limited_outputs(self):
+        return tuple(i + 1 for i, value in enumerate(self.lsr) if 'current_limit' in _LSR_TABLE[value & 0xFF])
+
+    @property
+    def current_limit(self):
+        return bool(self.current_limited_outputs)
+
+    @property
+    def errors(self):
+        """
+        Messages of all the errors reported, in the order the power supply reports them (a command error first).
+        An execution error is only reported if EER has one of the codes of EER_ERRORS
+        """
+        flags = self.esr_flags
+        errors = []
+        for flag, message in ESR_ERRORS:
+            if flag not in flags:
+                continue
+            if flag == 'execution_error':
+                if self.eer not in EER_ERRORS:
+                    continue
+                message = f"[Execution error] {EER_ERRORS[self.eer]}"
+            errors.append(message)
+        return tuple(errors)
+
+    @property
+    def error(self):
+        """
+        Message of the first error reported, None if there is no error
+        """
+        errors = self.errors
+        return errors[0] if errors else None
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Changes of several power supplies applied at the same time.
+
+    group = SyncGroup({'bias': bias_backend, 'heaters': heaters_backend})
+    group.stage('bias').set_voltage(1, 3.3)
+    group.stage('bias').enable_output_channel(1)
+    with group.stage('heaters') as b:
+        b.set_voltage(1, 12)
+        b.enable_output_channel(1)
+        b.enable_output_channel(2)
+    result = group.fire()
+    print(f"Sent with a skew of {result.skew * 1e6:.0f} us")
+
+Commands are staged with the backend methods, like on a CommandBatch. prepare (called by fire if needed) joins the
+commands of each power supply on a single message, replacing the enabling or disabling of all the outputs one by one
+with OPALL, validates and encodes them. fire takes the lock of every backend, discards stale answers, and then all the
+messages are sent at once: one thread per power supply waits on a barrier and sends its bytes as soon as it is
+released, through the backend exchange (with its hooks and instrumentation). The errors are checked afterwards, as the
+error policy of each backend requires. If a power supply fails before sending, the others are not sent either.
+
+The time each message was sent is measured, and the skew is the time between the first and the last one.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import logging
+import threading
+import time
+
+from pyttilan.backend import CommandBatch, TTiBackendExc
+from pyttilan.fleet import FleetResult
+
+log = logging.getLogger(__name__)
+
+
+class _Stage(CommandBatch):
+    # Records the commands of a member of a group, they are sent by SyncGroup.fire
+    def execute(self):
+        return self.results
+
+
+def combine_outputs(commands, num_outputs):
+    """
+    Replace OPn 1 (or OPn 0) of every output of a power supply with a single OPALL 1 (OPALL 0), at the position of
+    the last of them, so all the outputs switch together
+    """
+    if num_outputs < 2:
+        return list(commands)
+    for state in ('1', '0'):
+        switches = {f"OP{output} {state}" for output in range(1, num_outputs + 1)}
+        if not switches.issubset(commands):
+            continue
+        last = max(i for i, command in enumerate(commands) if command in switches)
+        commands = [f"OPALL {state}" if i == last else command for i, command in enumerate(commands)
+                    if i == last or command not in switches]
+    return commands
+
+
+class GroupResult(FleetResult):
+    """
+    FleetResult of SyncGroup.fire. send_times has the time.perf_counter() when the message of each power supply
+    started and finished being sent
+    """
+
+    def __init__(self, results=(), errors=None, send_times=None):
+        super().__init__(results, errors)
+        self.send_times = send_times or {}
+
+    @property
+    def skew(self):
+        """Seconds between the first and the last message starting to be sent"""
+        starts = [start for start, _ in self.send_times.values()]
+        return max(starts) - min(starts) if starts else 0.0
+
+    @property
+    def completion_skew(self):
+        """Seconds between the first and the last message being completely sent"""
+        ends = [end for _, end in self.send_times.values()]
+        return max(ends) - min(ends) if ends else 0.0
+
+
+class SyncGroup:
+    """
+    Group of power supplies, by name, whose staged commands are sent at once. backends is a dictionary of backends or
+    a fleet.SupplyFleet. timeout is the time fire waits for every backend to be ready to send
+    """
+
+    def __init__(self, backends, timeout=5.0):
+        self._backends = backends
+        self.timeout = timeout
+        self._stages = {}
+        self._messages = None
+
+    def _backend(self, name):
+        if hasattr(self._backends, 'backend'):
+            return self._backends.backend(name)
+        return self._backends[name]
+
+    def stage(self, name):
+        """
+        Return the recorder of the commands of the power supply called name. Backend methods called on it are staged
+        """
+        if name not in self._stages:
+            self._stages[name] = _Stage(self._backend(name))
+            self._messages = None
+        return self._stages[name]
+
+    def clear(self):
+        self._stages = {}
+        self._messages = None
+
+    def prepare(self):
+        """
+        Join, validate and encode the staged commands of each power supply. Raises TTiBackendExc if a command is not
+        valid or is a query
+        """
+        messages = {}
+        for name, stage in self._stages.items():
+            commands, queries, _ = stage._take_pending()
+            if any(queries):
+                raise TTiBackendExc(f"Queries can not be sent on a synchronized group ({name})")
+            if not commands:
+                continue
+            backend = stage._backend
+            commands = combine_outputs(commands, backend.n_outputs)
+            for command in commands:
+                backend.sock._validate(command)
+            messages[name] = (backend, commands, (";".join(commands) + "\n").encode())
+        self._stages = {}
+        self._messages = messages
+        return self
+
+    def _send(self, name, backend, commands, data, barrier, result):
+        try:
+            with backend._locked():
+                sock = backend.sock
+                if sock._sock is None:
+                    raise TTiBackendExc("Client not connected")
+                # Everything that could delay sending is done before waiting
+                if sock._stale:
+                    sock.resync()
+                sock._set_timeout(sock.timeout)
+                barrier.wait()
+                start = time.perf_counter()
+                try:
+                    backend._transfer(commands, 0, None, encoded=data)
+                finally:
+                    if sock.sent_at is not None and sock.sent_at >= start:
+                        result.send_times[name] = (start, sock.sent_at)
+                    backend._clear_caches()
+        except BaseException:
+            # Nobody waits for a power supply that failed
+            barrier.abort()
+            raise
+
+    def fire(self):
+        """
+        Send the prepared messages (preparing the staged ones first, if needed) at the same time. Returns a
+        GroupResult with the errors of each power supply and the send times
+        """
+        if self._messages is None or self._stages:
+            self.prepare()
+        messages, self._messages = self._messages, None
+        result = GroupResult()
+        if not messages:
+            return result
+        barrier = threading.Barrier(len(messages), timeout=self.timeout)
+
+        def send(name, backend, commands, data):
+            try:
+                self._send(name, backend, commands, data, barrier, result)
+                result[name] = None
+            except threading.BrokenBarrierError:
+                result.errors[name] = TTiBackendExc("Not sent, another power supply of the group was not ready")
+            except Exception as e:
+                log.warning("Error on power supply %s: %s", name, e)
+                result.errors[name] = e
+
+        threads = [threading.Thread(target=send, args=(name, *message), name=f"SyncGroup-{name}")
+                   for name, message in messages.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
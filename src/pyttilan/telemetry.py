@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Telemetry records of power supplies.
+
+A snapshot holds, for every output, the measured voltage and current, the configured voltage and current limit,
+the protection levels and whether the output is enabled. When NumPy is installed snapshots are NumPy structured
+arrays, otherwise they are Snapshot objects that store the values on an array.array.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import math
+import time
+import asyncio
+import logging
+import threading
+from array import array
+
+from pyttilan.framing import parse_number, parse_numbers
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Fields of a snapshot and the query that reads each of them. {} is replaced by the output number
+SNAPSHOT_FIELDS = ('output', 'voltage', 'current', 'voltage_set', 'current_limit', 'ovp', 'ocp', 'enabled')
+SNAPSHOT_QUERIES = ('V{}O?', 'I{}O?', 'V{}?', 'I{}?', 'OVP{}?', 'OCP{}?', 'OP{}?')
+# Query of each channel that can be sampled
+CHANNEL_QUERIES = dict(zip(SNAPSHOT_FIELDS[1:], SNAPSHOT_QUERIES))
+
+log = logging.getLogger(__name__)
+
+if np is not None:
+    SNAPSHOT_DTYPE = np.dtype([('output', 'u1'), ('voltage', 'f8'), ('current', 'f8'), ('voltage_set', 'f8'),
+                               ('current_limit', 'f8'), ('ovp', 'f8'), ('ocp', 'f8'), ('enabled', '?')])
+else:
+    SNAPSHOT_DTYPE = None
+
+
+class Snapshot:
+    """
+    Array backed snapshot used when NumPy is not available. Values are stored row by row (one row per output) on a
+    single array of doubles. Like NumPy structured arrays, snapshot['voltage'] returns the column of a field and
+    snapshot[i] a row, as a dictionary
+    """
+    fields = SNAPSHOT_FIELDS
+
+    def __init__(self, values, shape):
+        self._values = values
+        self.shape = tuple(shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def size(self):
+        return math.prod(self.shape)
+
+    def __getitem__(self, key):
+        n_fields = len(self.fields)
+        if isinstance(key, str):
+            column = self._values[self.fields.index(key)::n_fields]
+            if key == 'output':
+                return array('B', (int(v) for v in column))
+            if key == 'enabled':
+                return [bool(v) for v in column]
+            return column
+        if len(self.shape) > 1:
+            row_size = math.prod(self.shape[1:])
+            start = key * row_size * n_fields
+            return Snapshot(self._values[start:start + row_size * n_fields], self.shape[1:])
+        row = self._values[key * n_fields:(key + 1) * n_fields]
+        return dict(zip(self.fields, row))
+
+
+def make_snapshot(outputs, answers, use_numpy=True):
+    """
+    Build a snapshot from the answers to SNAPSHOT_QUERIES for each output, in that order
+    """
+    n_queries = len(SNAPSHOT_QUERIES)
+    values = array('d')
+    for i, output in enumerate(outputs):
+        values.append(output)
+        values.extend(parse_number(a) for a in answers[i * n_queries:(i + 1) * n_queries])
+    if np is not None and use_numpy:
+        record = np.empty(len(outputs), dtype=SNAPSHOT_DTYPE)
+        table = np.frombuffer(values, dtype='f8').reshape(len(outputs), len(SNAPSHOT_FIELDS))
+        for i, field in enumerate(SNAPSHOT_FIELDS):
+            record[field] = table[:, i]
+        return record
+    return Snapshot(values, (len(outputs),))
+
+
+def stack_snapshots(snapshots):
+    """
+    Stack snapshots of several power supplies in a 2-D record of shape (supplies, outputs). Power supplies with less
+    outputs than the largest one are padded with output 0 and NaN values
+    """
+    snapshots = list(snapshots)
+    width = max((len(s) for s in snapshots), default=0)
+    if np is not None and all(isinstance(s, np.ndarray) for s in snapshots):
+        stacked = np.zeros((len(snapshots), width), dtype=SNAPSHOT_DTYPE)
+        for field in SNAPSHOT_FIELDS[1:-1]:
+            stacked[field] = math.nan
+        for i, s in enumerate(snapshots):
+            stacked[i, :len(s)] = s
+        return stacked
+    n_fields = len(SNAPSHOT_FIELDS)
+    padding = array('d', [0] + [math.nan] * (n_fields - 2) + [0])
+    values = array('d')
+    for s in snapshots:
+        if not isinstance(s, Snapshot):
+            s = Snapshot(array('d', (float(v) for row in s for v in row)), (len(s),))
+        values.extend(s._values)
+        values.extend(padding * (width - len(s)))
+    return Snapshot(values, (len(snapshots), width))
+
+
+class TelemetrySampler:
+    """
+    Samples channels of a backend at a fixed rate on a background thread (start) or asyncio task (run_async, for
+    async backends) and stores the values on a preallocated ring buffer, so memory does not grow on long runs.
+
+        sampler = TelemetrySampler(backend, [('voltage', 1), ('current', 1)], rate=20)
+        with sampler:
+            for timestamp, (volts, amps) in sampler.samples():
+                ...
+
+    Channels are names of CHANNEL_QUERIES and an output number. All channels are read on a single message per
+    sample, so the backend lock is only taken once per sample and control commands sent from other threads get
+    through between samples.
+
+    Samples are scheduled on a monotonic clock without drift. If a sample takes so long that a whole period is lost,
+    the lost samples are counted as dropped instead of being taken in a burst.
+    """
+
+    def __init__(self, backend, channels, rate, capacity=10000, use_numpy=True):
+        self._backend = backend
+        self.channels = [(name, backend._check_output(output)) for name, output in channels]
+        self._commands = [CHANNEL_QUERIES[name].format(output) for name, output in self.channels]
+        self.period = 1.0 / rate
+        self.capacity = int(capacity)
+        self._width = 1 + len(self.channels)  # timestamp and channels
+        if np is not None and use_numpy:
+            self._buffer = np.full((self.capacity, self._width), math.nan)
+        else:
+            self._buffer = array('d', [math.nan]) * (self.capacity * self._width)
+        self._count = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = False
+
+        self.dropped = 0
+        self.errors = 0
+        self.overruns = 0
+        self._jitter_n = 0
+        self._jitter_mean = 0.0
+        self._jitter_m2 = 0.0
+        self._jitter_max = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TelemetrySampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    @property
+    def count(self):
+        """Number of samples taken since the sampler was created"""
+        return self._count
+
+    def _store(self, timestamp, values):
+        with self._cond:
+            index = self._count % self.capacity
+            if isinstance(self._buffer, array):
+                start = index * self._width
+                self._buffer[start:start + self._width] = array('d', [timestamp] + values)
+            else:
+                self._buffer[index, 0] = timestamp
+                self._buffer[index, 1:] = values
+            self._count += 1
+            self._cond.notify_all()
+
+    def _row(self, sample):
+        index = sample % self.capacity
+        if isinstance(self._buffer, array):
+            start = index * self._width
+            row = self._buffer[start:start + self._width]
+        else:
+            row = self._buffer[index].tolist()
+        return row[0], tuple(row[1:])
+
+    def _record_jitter(self, jitter):
+        self._jitter_n += 1
+        delta = jitter - self._jitter_mean
+        self._jitter_mean += delta / self._jitter_n
+        self._jitter_m2 += delta * (jitter - self._jitter_mean)
+        self._jitter_max = max(self._jitter_max, jitter)
+
+    def _next_deadline(self, deadline):
+        deadline += self.period
+        missed = int((time.monotonic() - deadline) // self.period)
+        if missed > 0:
+            self.dropped += missed
+            deadline += missed * self.period
+        return deadline
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            delay = deadline - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self._record_jitter(time.monotonic() - deadline)
+            timestamp = time.time()
+            try:
+                values = self._backend._query_many(self._commands, parse_numbers)
+            except Exception:
+                self.errors += 1
+                log.exception("Error sampling telemetry")
+            else:
+                self._store(timestamp, values)
+            deadline = self._next_deadline(deadline)
+
+    async def run_async(self):
+        """
+        Sample until stop is called, for async backends. Run it as a task:
+            task = asyncio.create_task(sampler.run_async())
+        """
+        self._stop.clear()
+        self._running = True
+        deadline = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    if self._stop.is_set():
+                        break
+                self._record_jitter(time.monotonic() - deadline)
+                timestamp = time.time()
+                try:
+                    values = await self._backend._query_many(self._commands, parse_numbers)
+                except Exception:
+                    self.errors += 1
+                    log.exception("Error sampling telemetry")
+                else:
+                    self._store(timestamp, values)
+                deadline = self._next_deadline(deadline)
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def latest(self, n=1):
+        """
+        Return the last n samples (or less if not available yet) as a list of (timestamp, values), oldest first
+        """
+        with self._cond:
+            first = max(0, self._count - min(n, self.capacity))
+            return [self._row(i) for i in range(first, self._count)]
+
+    def samples(self, timeout=None):
+        """
+        Generator of (timestamp, values) for every sample taken from now on. It ends when the sampler is stopped or
+        when no sample arrives in timeout seconds. If the consumer falls more than capacity samples behind, the
+        samples overwritten on the buffer are skipped and counted on overruns
+        """
+        position = self._count
+        while True:
+            with self._cond:
+                while position == self._count:
+                    if not self._running or not self._cond.wait(timeout):
+                        return
+                if self._count - position > self.capacity:
+                    self.overruns += self._count - position - self.capacity
+                    position = self._count - self.capacity
+                rows = [self._row(i) for i in range(position, self._count)]
+                position = self._count
+            yield from rows
+
+    def __iter__(self):
+        return self.samples()
+
+    def statistics(self):
+        """
+        Return a dictionary with the number of samples, dropped samples, errors, samples skipped by slow consumers
+        and the mean, standard deviation and maximum of the delay of samples with respect to their schedule (jitter)
+        """
+        n = self._jitter_n
+        return {
+            'samples': self._count,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'overruns': self.overruns,
+            'jitter_mean': self._jitter_mean,
+            'jitter_std': math.sqrt(self._jitter_m2 / n) if n else 0.0,
+            'jitter_max': self._jitter_max,
+        }
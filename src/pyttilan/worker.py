@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+I/O worker of a backend: a thread that owns the communication with the power supply and serves the requests of
+every other thread from a queue.
+
+    backend = PLBackend()
+    backend.connect(ip)
+    backend.start_worker()
+    future = backend.submit('read_voltage', 1)
+    ...
+    volts = future.result()
+
+While the worker is running, backend methods called from any thread are queued to it and wait for their result.
+Requests that are queued while the worker is busy are sent together on a single message, and the error registers are
+checked once for all of them.
+"""
+__author__ = 'IFAE Control Department'
+__copyright__ = 'Copyright 2026'
+__date__ = '17/10/26'
+__credits__ = ['David Roman', 'Otger Ballester', ]
+__license__ = 'CC0 1.0 Universal'
+__version__ = '0.1'
+__maintainer__ = 'IFAE Control Department'
+__email__ = 'ifae-control@ifae.es'
+
+import queue
+import threading
+from concurrent.futures import Future
+
+# From the policy that checks more to the one that checks less, see backend.ErrorPolicy
+_POLICY_ORDER = ('always', 'writes_only', 'every_n', 'deferred', 'never')
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ('commands', 'queries', 'error_policy', 'future')
+
+    def __init__(self, commands, queries, error_policy):
+        self.commands = commands
+        self.queries = queries
+        self.error_policy = error_policy
+        self.future = Future()
+
+
+class IOWorker:
+    """
+    Thread that sends the commands of a backend. submit queues the commands of a call and returns a Future with the
+    responses of its queries.
+
+    Requests waiting on the queue are merged on messages of up to max_commands commands. A merged message is checked
+    for errors with the error policy that checks more among the ones of its requests, and an error detected is set
+    on the futures of all of them, because it can not be known which command caused it
+    """
+
+    def __init__(self, backend, max_commands=32):
+        self._backend = backend
+        self.max_commands = max_commands
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.requests = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def is_current(self):
+        return self._thread is threading.current_thread()
+
+    def start(self):
+        with self._lock:
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name="IOWorker", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the worker after the requests already queued are served, or wait for its thread to end if it already
+        stopped
+        """
+        with self._lock:
+            thread = self._thread
+            if self._running:
+                self._queue.put(_STOP)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def submit(self, commands, queries, error_policy):
+        request = _Request(commands, queries, error_policy)
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("I/O worker is not running")
+            self._queue.put(request)
+        return request.future
+
+    def _run(self):
+        try:
+            self._serve_queue()
+        finally:
+            # Whatever ended the thread, nothing queued from now on would be served. The thread is kept to be joined
+            with self._lock:
+                self._running = False
+            self._fail_pending()
+
+    def _fail_pending(self):
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not _STOP and request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("I/O worker stopped before serving the request"))
+
+    def _serve_queue(self):
+        request = self._queue.get()
+        while request is not _STOP:
+            # Take the requests waiting on the queue that fit on one message, the first one that does not fit is
+            # served on the next one
+            requests = [request]
+            size = len(request.commands)
+            request = None
+            while size < self.max_commands:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    request = None
+                    break
+                if request is _STOP or size + len(request.commands) > self.max_commands:
+                    break
+                requests.append(request)
+                size += len(request.commands)
+                request = None
+            requests = [r for r in requests if r.future.set_running_or_notify_cancel()]
+            if requests:
+                self._serve(requests)
+            if request is None:
+                request = self._queue.get()
+
+    def _serve(self, requests):
+        commands = [cmd for r in requests for cmd in r.commands]
+        queries = [q for r in requests for q in r.queries]
+        policy = min((r.error_policy for r in requests), key=_POLICY_ORDER.index)
+        self.messages += 1
+        self.requests += len(requests)
+        try:
+            data = self._backend._exchange(commands, queries, policy)
+        except BaseException as e:
+            for r in requests:
+                r.future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for r in requests:
+            n = sum(r.queries)
+            r.future.set_result(data[:n])
+            data = data[n:]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import pytest
+from pyttilan.aio import AsyncPLBackend
+from pyttilan.backend import TTiBackendExc
+
+ANSWERS = {"V1O?": "3.300V", "I1O?": "0.100A", "V1?": "V1 3.300", "OP1?": "1", "*ESR?": "0"}
+
+
+async def fake_supply(reader, writer):
+    while line := await reader.readline():
+        replies = [ANSWERS[cmd] for cmd in line.decode().strip().split(";") if cmd.endswith("?")]
+        if replies:
+            writer.write((";".join(replies) + "\n").encode())
+            await writer.drain()
+    writer.close()
+
+
+def run_with_supply(coro_func):
+    async def main():
+        server = await asyncio.start_server(fake_supply, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await coro_func(port)
+    return asyncio.run(main())
+
+
+def test_async_backend():
+    async def scenario(port):
+        backends = [AsyncPLBackend() for _ in range(10)]
+        await asyncio.gather(*(b.connect("127.0.0.1", port) for b in backends))
+        volts = await asyncio.gather(*(b.read_voltage(1) for b in backends))
+        assert await backends[0].set_voltage(1, 3.3) is None
+        assert await backends[0].is_enabled(1)
+        assert await backends[0].get_configured_voltage(1) == 3.3
+        with pytest.raises(TTiBackendExc):
+            await backends[0].set_voltage(5, 1)
+        async with backends[0].batch() as b:
+            b.read_current(1)
+            b.set_voltage(1, 1)
+            b.read_voltage(1)
+        assert b.results == [0.1, 3.3]
+        assert backends[0].last_tx == "I1O?;V1 1.0;V1O?"
+        await asyncio.gather(*(b.disconnect() for b in backends))
+        return volts
+    assert run_with_supply(scenario) == [3.3] * 10
+
+
+def test_async_cancellation_resync():
+    from pyttilan.simulator import Instrument, SimulatorServer
+
+    async def scenario():
+        server = await SimulatorServer(Instrument('PL068'), latency=0.2).start()
+        backend = AsyncPLBackend()
+        await backend.connect(server.host, server.port)
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.05):
+                await backend.get_identifier()
+        server.latency = 0.0
+        voltage = await backend.get_configured_voltage(1)
+        await backend.disconnect()
+        await server.stop()
+        return voltage
+    assert asyncio.run(scenario()) == 1.0
+
+
+def test_async_caches_and_stats():
+    async def scenario(port):
+        backend = AsyncPLBackend(setpoint_cache=True, readback_cache=True)
+        stats = backend.enable_stats()
+        await backend.connect("127.0.0.1", port)
+        await backend.set_voltage(1, 3.3)
+        # Answered by the setpoint cache, and the second read by the readback cache
+        assert await backend.get_configured_voltage(1) == 3.3
+        assert await backend.read_voltage(1) == 3.3
+        assert await backend.read_voltage(1) == 3.3
+        await backend.disconnect()
+        return stats.summary()['counts']
+    assert run_with_supply(scenario) == {'Vn': 1, 'VnO?': 1}
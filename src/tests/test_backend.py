@@ -13,5 +13,206 @@ __version__ = '0.1'
 __maintainer__ = 'Otger Ballester'
 __email__ = 'otger@ifae.es'
 
-#  Should do tests for backend and replace sockets so it can be tested without using a real power supply
 
+import pytest
+from pyttilan.backend import PLBackend, SockCommand, TTiBackendExc, ErrorPolicy
+from pyttilan.commands import TTiPLCommands
+
+
+class FakeSockCommand(SockCommand):
+    """Replaces the network with a dictionary of canned answers to queries"""
+
+    def __init__(self, answers, esr="0"):
+        super().__init__(ip="localhost", valid_commands=TTiPLCommands())
+        self.answers = dict(answers, **{"*ESR?": esr})
+        self.sent = []
+        self._replies = []
+
+    def _sock_send(self, s):
+        message = s.decode()
+        self.sent.append(message)
+        assert message.endswith("\n")
+        replies = [self.answers[cmd] for cmd in message[:-1].split(";") if cmd.endswith("?")]
+        if replies:
+            self._replies.append(";".join(replies))
+
+    def read_response(self):
+        return self._replies.pop(0)
+
+
+@pytest.fixture
+def pl():
+    backend = PLBackend()
+    backend.sock = FakeSockCommand({"V1O?": "3.300V", "I1O?": "0.100A", "V1?": "V1 3.300", "OP1?": "1"})
+    return backend
+
+
+def test_single_command(pl):
+    assert pl.read_voltage(1) == 3.3
+    assert pl.sock.sent == ["V1O?\n", "*ESR?\n"]
+    assert pl.last_tx == "V1O?"
+    assert pl.last_rx == "3.300V"
+    assert pl.last_esr == 0
+
+
+def test_batch(pl):
+    with pl.batch() as b:
+        assert b.set_voltage(1, 3.3) is None
+        b.read_current(1)
+        b.get_configured_voltage(1)
+        b.is_enabled(1)
+        b.set_OVP(1, 4)
+    assert b.results == [0.1, 3.3, True]
+    assert pl.sock.sent == ["V1 3.3;I1O?;V1?;OP1?;OVP1 4.0\n", "*ESR?\n"]
+    assert pl.last_rx == "0.100A;V1 3.300;1"
+
+
+def test_batch_error(pl):
+    pl.sock.answers["*ESR?"] = "32"
+    with pytest.raises(TTiBackendExc):
+        with pl.batch() as b:
+            b.set_voltage(1, 3.3)
+    with pytest.raises(TTiBackendExc):
+        with pl.batch() as b:
+            b.set_voltage(4, 3.3)
+
+
+def test_batch_not_sent_on_exception(pl):
+    with pytest.raises(ValueError):
+        with pl.batch() as b:
+            b.set_voltage(1, 3.3)
+            raise ValueError()
+    assert pl.sock.sent == []
+
+
+def test_error_policies(pl):
+    pl.error_policy = ErrorPolicy.writes_only
+    pl.read_voltage(1)
+    pl.set_voltage(1, 2)
+    assert pl.sock.sent == ["V1O?\n", "V1 2.0\n", "*ESR?\n"]
+
+    pl.sock.sent.clear()
+    pl.error_policy = ErrorPolicy.every_n
+    pl.error_check_interval = 3
+    pl.read_voltage(1)
+    pl.read_voltage(1)
+    assert pl.last_esr == ''
+    pl.read_voltage(1)
+    assert pl.last_esr == 0
+    assert pl.sock.sent.count("*ESR?\n") == 1
+
+    pl.sock.sent.clear()
+    pl.error_policy = ErrorPolicy.never
+    pl.set_voltage(1, 2)
+    with pl.using_error_policy(ErrorPolicy.always):
+        pl.read_voltage(1)
+    with pl.batch(error_policy=ErrorPolicy.always) as b:
+        b.read_voltage(1)
+    assert pl.sock.sent == ["V1 2.0\n", "V1O?\n", "*ESR?\n", "V1O?\n", "*ESR?\n"]
+
+    with pytest.raises(TTiBackendExc):
+        PLBackend(error_policy="sometimes")
+
+
+def test_deferred_errors(pl):
+    pl.error_policy = ErrorPolicy.deferred
+    pl.sock.answers["*ESR?"] = "32"
+    pl.set_voltage(1, 2)
+    pl.set_voltage(1, 3)
+    assert "*ESR?\n" not in pl.sock.sent
+    with pytest.raises(TTiBackendExc):
+        pl.flush_errors()
+    assert pl.last_esr == 32
+
+
+def test_snapshot(pl):
+    pl.sock.answers.update({"I1?": "I1 0.500", "OVP1?": "4.000", "OCP1?": "2.200"})
+    snap = pl.snapshot()
+    assert pl.sock.sent == ["V1O?;I1O?;V1?;I1?;OVP1?;OCP1?;OP1?\n", "*ESR?\n"]
+    assert snap[0]['voltage'] == 3.3
+    assert snap[0]['ocp'] == 2.2
+    assert bool(snap[0]['enabled'])
+
+    with pl.batch() as b:
+        b.read_voltage(1)
+        b.snapshot()
+    assert b.results[0] == 3.3
+    assert b.results[1][0]['current_limit'] == 0.5
+
+
+def test_setpoint_cache():
+    backend = PLBackend(setpoint_cache=True)
+    backend.sock = FakeSockCommand({"V1?": "V1 1.000", "OVP1?": "4.000", "V1O?": "3.300V"})
+    assert backend.get_configured_voltage(1) == 1.0
+    assert backend.get_configured_voltage(1) == 1.0
+    assert backend.sock.sent == ["V1?\n", "*ESR?\n"]
+
+    backend.set_voltage(1, 1.0002)
+    backend.set_voltage(1, 3.3)
+    assert backend.get_configured_voltage(1) == 3.3
+    backend.set_OVP(1, 5)
+    assert backend.get_OVP(1) == 5.0
+    assert backend.sock.sent[2:] == ["V1 3.3\n", "*ESR?\n", "OVP1 5.0\n", "*ESR?\n"]
+    assert backend.setpoint_cache.hits == 4
+
+    with backend.batch() as b:
+        b.set_voltage(1, 3.3)
+        b.read_voltage(1)
+        b.get_configured_voltage(1)
+    assert b.results == [3.3, 3.3]
+    assert backend.sock.sent[-2:] == ["V1O?\n", "*ESR?\n"]
+
+    backend.inc_voltage(1)
+    backend.get_configured_voltage(1)
+    assert backend.sock.sent[-2:] == ["V1?\n", "*ESR?\n"]
+
+    backend.sock.answers["*ESR?"] = "32"
+    with pytest.raises(TTiBackendExc):
+        backend.set_voltage(1, 2)
+    backend.sock.answers["*ESR?"] = "0"
+    backend.get_configured_voltage(1)
+    assert backend.sock.sent[-2:] == ["V1?\n", "*ESR?\n"]
+
+
+def test_readback_cache():
+    backend = PLBackend(readback_cache={'VnO?': 60, 'OPn?': 60}, setpoint_cache=True)
+    backend.sock = FakeSockCommand({"V1O?": "3.300V", "I1O?": "0.100A", "OP1?": "1", "V1?": "V1 3.300"})
+    assert backend.read_voltage(1) == 3.3
+    assert backend.read_voltage(1) == 3.3
+    assert backend.is_enabled(1)
+    assert backend.is_enabled(1)
+    backend.read_current(1)
+    backend.read_current(1)
+    assert backend.sock.sent == ["V1O?\n", "*ESR?\n", "OP1?\n", "*ESR?\n", "I1O?\n", "*ESR?\n", "I1O?\n", "*ESR?\n"]
+    assert backend.readback_cache.hits == 2
+
+    backend.set_voltage(1, 1)
+    backend.read_voltage(1)
+    assert backend.sock.sent[-2:] == ["V1O?\n", "*ESR?\n"]
+    backend.disable_output_all()
+    backend.is_enabled(1)
+    assert backend.sock.sent[-2:] == ["OP1?\n", "*ESR?\n"]
+
+    with backend.batch() as b:
+        b.read_voltage(1)
+        b.get_configured_voltage(1)
+    assert b.results == [3.3, 1.0]
+    assert backend.sock.sent[-2:] == ["V1O?\n", "*ESR?\n"]
+
+
+def test_instrumentation(pl):
+    events = []
+    pl.add_hook('before_send', lambda event, exchange: events.append((event, list(exchange.commands))))
+    pl.add_hook('after_check', lambda event, exchange: events.append((event, exchange.checked)))
+    stats = pl.enable_stats()
+    pl.read_voltage(1)
+    with pl.batch() as b:
+        b.read_voltage(1)
+        b.set_voltage(1, 2)
+    assert events == [('before_send', ['V1O?']), ('after_check', True),
+                      ('before_send', ['V1O?', 'V1 2.0']), ('after_check', True)]
+    summary = stats.summary()
+    assert summary['counts'] == {'VnO?': 2, 'Vn': 1}
+    assert summary['latency_s']['VnO?']['count'] == 1
+    assert summary['latency_s']['batch']['count'] == 1
+    assert summary['latency_s']['error_check']['count'] == 2
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from pyttilan import bench
+
+
+def test_percentiles():
+    result = bench.percentiles(range(101))
+    assert result['p50'] == 50
+    assert result['p99'] == 99
+    assert result['max'] == 100
+
+
+def test_bench_simulated(tmp_path):
+    output = tmp_path / "results.json"
+    assert bench.main(["--simulate", "--count", "5", "--batch-size", "2", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results['target'] == 'simulator'
+    assert set(results['results']) == {'latency_s', 'throughput_per_s', 'error_check', 'validation', 'parsing'}
+    assert results['results']['latency_s']['query']['n'] == 5
+
+
+def test_bench_simulated_cpx(tmp_path):
+    output = tmp_path / "results.json"
+    assert bench.main(["--simulate", "--model", "CPX400DP", "--count", "5", "--batch-size", "2",
+                       "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results['model'] == 'CPX400DP'
+    assert 'read_voltage_s' in results['results']['parsing']
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from pyttilan.cli import main, parse_target, parse_address
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    with SimulatorThread(SimulatorServer(Instrument('PL068')), SimulatorServer(Instrument('PL303QMD'))) as sim:
+        yield sim
+
+
+def test_parse_target():
+    assert parse_target("10.0.0.1") == ("10.0.0.1", 9221, None)
+    assert parse_target("10.0.0.1:2") == ("10.0.0.1", 9221, 2)
+    assert parse_target("localhost:5025:1") == ("localhost", 5025, 1)
+    assert parse_address("localhost:5025") == ("localhost", 5025)
+
+
+def test_idn_get_set(simulator, capsys):
+    target = f"{simulator.host}:{simulator.ports[0]}"
+    assert main(["idn", target]) == 0
+    assert "PL068" in capsys.readouterr().out
+    assert main(["set", f"{target}:1", "voltage", "2.5"]) == 0
+    assert main(["get", f"{target}:1", "voltage_set", "enabled"]) == 0
+    assert capsys.readouterr().out == "2.5 0\n"
+
+
+def test_monitor(simulator, capsys):
+    targets = [f"{simulator.host}:{port}:{output}" for port, output in
+               [(simulator.ports[0], 1), (simulator.ports[1], 1), (simulator.ports[1], 2)]]
+    assert main(["monitor", *targets, "--rate", "100", "--count", "3", "--channels", "voltage_set,enabled"]) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(rows) == 9
+    assert {row['target'] for row in rows} == set(targets)
+    assert set(rows[0]) == {'timestamp', 'target', 'voltage_set', 'enabled'}
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import pytest
-from pyttilan.commands import TTiPLCommands, Commands
+from pyttilan.commands import TTiPLCommands, TTiCPxCommands, Commands, _literal_prefix
 import re
 
 """ A simple python script
@@ -30,3 +30,31 @@ def test_validate_command():
     assert isinstance(plc.validate_command("V1 3.25"), re.Match)
     assert isinstance(plc.validate_command("V1 0.325e-1"), re.Match)
     assert plc.validate_command("V0 0.2") is None
+
+
+def test_validator_shared_by_instances():
+    assert TTiPLCommands()._get_validator() is TTiPLCommands()._get_validator()
+    assert TTiPLCommands._get_validator() is not TTiCPxCommands._get_validator()
+
+
+def test_validate_command_same_as_linear_scan():
+    commands = ["V1 3.25", "V1V 2", "V12", "V4 1", "VX", "LOCAL", "LOCALX", "*IDN?", "*IDN", "IDN?", "OPALL 1",
+                "OP1 1", "OP1?", "IPADDR 192.168.1.1", "IPADDR 192.168.1.300", "NETCONFIG DHCP", "IRANGE1 2",
+                "INCV1V", "DAMPING1 1", "", "v1 3", "*ESR?;V1O?", "I1O?", "IFUNLOCK", "TRIPRST"]
+    for cls in (TTiPLCommands, TTiCPxCommands):
+        compiled = [re.compile(pattern) for pattern in cls._valid_commands_re]
+        validator = cls()
+        for command in commands:
+            expected = next((m for m in (r.match(command) for r in compiled) if m), None)
+            result = validator.validate_command(command)
+            assert (expected is None) == (result is None), command
+            if expected:
+                assert expected.re is result.re or expected.re.pattern == result.re.pattern
+
+
+def test_literal_prefix():
+    assert _literal_prefix(r"V([1-3]) ([0-9,\.,e,\-]*)") == "V"
+    assert _literal_prefix(r"\*IDN\?") == "*IDN"
+    assert _literal_prefix(r"OPALL ([0-1])") == "OPALL"
+    assert _literal_prefix(r"ABC?") == "AB"
+    assert _literal_prefix(r"A|B") == ""
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+from pyttilan.backend import PLBackend, CPxBackend
+from pyttilan.discovery import scan, parse_identifier, Inventory, discover, probe
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+def test_parse_identifier():
+    assert parse_identifier("THURLBY THANDAR, PL068-P, 512345, 3.02 - 4.06") == (
+        "THURLBY THANDAR", "PL068", "512345", "3.02 - 4.06")
+
+
+def test_scan_and_inventory(tmp_path):
+    servers = [SimulatorServer(Instrument('PL068', serial="000001")),
+               SimulatorServer(Instrument('PL303QMD', serial="000002")),
+               SimulatorServer(Instrument('CPX400DP', serial="000003"))]
+    with SimulatorThread(*servers) as sim:
+        # A port where nothing listens is skipped
+        ports = sim.ports + [1]
+        devices = asyncio.run(scan(["127.0.0.1"], ports, timeout=1))
+        inventory = Inventory(devices)
+        assert sorted(inventory.devices) == ["000001", "000002", "000003"]
+        assert inventory["000001"].num_outputs == 1 and inventory["000001"].backend_class is PLBackend
+        assert inventory["000002"].num_outputs == 2 and inventory["000002"].mode == 0
+        assert inventory["000003"].backend_class is CPxBackend
+
+        path = tmp_path / "inventory.json"
+        assert discover("127.0.0.1", ports, cache=path, timeout=1).devices == inventory.devices
+        backend = Inventory.load(path).connect("000002")
+        assert backend.n_outputs == 2
+        assert "PL303QMD" in backend.get_identifier()
+        # The output probes leave no error behind
+        backend.set_voltage(2, 1)
+        backend.disconnect()
+    # The cache is reused only for the same addresses and ports
+    assert discover("127.0.0.1", ports, cache=path).devices == inventory.devices
+    assert len(discover("127.0.0.1", [1], cache=path)) == 0
+    assert Inventory.load(path).scanned == {'addresses': ["127.0.0.1"], 'ports': [1]}
+
+
+def test_probe_timeout_on_outputs():
+    async def scenario():
+        async def handle(reader, writer):
+            # Answers *IDN? and nothing else
+            await reader.readline()
+            writer.write(b"THURLBY THANDAR, PL068-P, 512345, 3.02 - 4.06\n")
+            await writer.drain()
+            await reader.read()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        device = await probe('127.0.0.1', server.sockets[0].getsockname()[1], timeout=0.2)
+        server.close()
+        await server.wait_closed()
+        return device
+    device = asyncio.run(scenario())
+    assert device.serial == "512345" and device.num_outputs == 1 and device.mode is None
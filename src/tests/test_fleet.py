@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import pytest
+from pyttilan.backend import PLBackend, TTiBackendExc
+from pyttilan.fleet import SupplyFleet
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+LATENCY = 0.05
+
+
+def _simulators(n):
+    return SimulatorThread(*(SimulatorServer(Instrument('PL068', serial=str(i)), latency=LATENCY) for i in range(n)))
+
+
+def _record_setpoints(sim):
+    # Times when the simulators receive the voltage setpoints
+    received = []
+    for server in sim.servers:
+        def execute(message, execute=server.instrument.execute):
+            if message.startswith("V1 "):
+                received.append(time.monotonic())
+            return execute(message)
+        server.instrument.execute = execute
+    return received
+
+
+def test_fleet_fan_out():
+    with _simulators(4) as sim, SupplyFleet(max_workers=4) as fleet:
+        for i, port in enumerate(sim.ports):
+            fleet.add(f"psu{i}", PLBackend(timeout=2), sim.host, port)
+        assert len(fleet.snapshot()) == 4  # connects them
+        received = _record_setpoints(sim)
+        result = fleet.set_voltage({name: 2.0 + i for i, name in enumerate(fleet)})
+        assert result.ok and set(result) == set(fleet)
+        # A message is answered LATENCY after it is received. In sequence, each power supply needs two exchanges
+        # (command and error check), so a setpoint would be received 2 latencies after the previous one. Setpoints
+        # received less than a latency apart were being served at the same time
+        in_flight = max(sum(0 <= other - t < LATENCY for other in received) for t in received)
+        assert len(received) == 4 and in_flight > 1
+        snapshots = fleet.snapshot()
+        assert [float(snapshots[name]['voltage_set'][0]) for name in fleet] == [2.0, 3.0, 4.0, 5.0]
+        assert fleet.stacked_snapshot().shape == (4, 1)
+
+
+def test_fleet_errors_are_per_supply():
+    with _simulators(2) as sim, SupplyFleet() as fleet:
+        fleet.add('good', PLBackend(timeout=2), sim.host, sim.ports[0])
+        fleet.add('bad', PLBackend(timeout=2), sim.host, sim.ports[1])
+        result = fleet.set_voltage({'good': 3.0, 'bad': {1: 100}})
+        assert list(result) == ['good']
+        assert isinstance(result.errors['bad'], TTiBackendExc)
+        with pytest.raises(TTiBackendExc, match='bad'):
+            result.raise_errors()
+        assert fleet.call('get_configured_voltage', 1)['good'] == 3.0
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import socket
+import pytest
+from pyttilan.framing import LineReader, parse_number
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_parse_number():
+    assert parse_number(b"3.300V") == 3.3
+    assert parse_number(b"0.100A") == 0.1
+    assert parse_number(bytearray(b"V1 3.300")) == 3.3
+    assert parse_number(memoryview(b"-0.006V")) == -0.006
+    line = memoryview(b"V1 3.300;V2 1.000V")
+    assert parse_number(line, 0, 8) == 3.3 and parse_number(line, 9) == 1.0
+    assert parse_number(b"1") == 1
+    assert parse_number("V1 3.300") == parse_number("3.300V") == 3.3
+    with pytest.raises(ValueError):
+        parse_number(b"ERR")
+    with pytest.raises(ValueError):
+        parse_number(memoryview(b"V1 ERR"))
+
+
+def test_pipelined_lines(pair):
+    a, b = pair
+    reader = LineReader(b)
+    a.sendall(b"3.300V\r\nV1 3.300\nTTi,PL0")
+    assert bytes(reader.readline()) == b"3.300V"
+    assert bytes(reader.readline()) == b"V1 3.300"
+    a.sendall(b"68\n")
+    assert bytes(reader.readline()) == b"TTi,PL068"
+    a.close()
+    assert reader.readline() is None
+
+
+def test_read_numbers_and_long_lines(pair):
+    a, b = pair
+    reader = LineReader(b, size=16)
+    a.sendall(b"3.300V;0.100A;V1 3.300\r\n1\n" + b"x" * 40 + b"\n")
+    assert reader.read_numbers() == [3.3, 0.1, 3.3]
+    assert reader.read_numbers() == [1]
+    assert bytes(reader.readline()) == b"x" * 40
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+import pytest
+from pyttilan.instrumentation import LatencyHistogram, command_key, Instrumentation
+
+
+def test_command_key():
+    assert command_key("V1 3.3") == "Vn"
+    assert command_key("V2O?") == "VnO?"
+    assert command_key("*ESR?") == "*ESR?"
+
+
+def test_histogram_precision():
+    histogram = LatencyHistogram(precision=5)
+    rng = random.Random(1234)
+    values = [rng.uniform(1e-6, 1.0) for _ in range(10000)]
+    for v in values:
+        histogram.record(v)
+    values.sort()
+    for p in (50, 90, 99):
+        exact = values[int(p / 100 * len(values)) - 1]
+        assert histogram.percentile(p) == pytest.approx(exact, rel=0.05)
+    assert histogram.count == 10000
+    assert histogram.max == values[-1]
+
+
+def test_unknown_event():
+    with pytest.raises(ValueError):
+        Instrumentation().add_hook('after_lunch', print)
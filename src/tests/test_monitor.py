@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+from pyttilan.aio import AsyncPLBackend
+from pyttilan.backend import PLBackend
+from pyttilan.monitor import EventMonitor
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+def test_monitor_detects_trip():
+    with SimulatorThread(SimulatorServer(Instrument('PL068'))) as sim:
+        backend = PLBackend()
+        backend.connect(sim.host, sim.ports[0])
+        tripped = threading.Event()
+        events = []
+
+        def on_event(event):
+            events.append(event)
+            tripped.set()
+
+        with EventMonitor(backend, on_event, min_interval=0.005, max_interval=0.05) as monitor:
+            while monitor.polls < 10:
+                time.sleep(0.01)
+            assert monitor.interval == 0.05
+            assert events == []
+            backend.set_OVP(1, 4)
+            backend.enable_output_channel(1)
+            backend.set_voltage(1, 5)
+            assert tripped.wait(1)
+        assert events[0].status.tripped_outputs == (1,)
+        backend.disconnect()
+
+
+def test_monitor_async_events():
+    async def scenario():
+        server = await SimulatorServer(Instrument('PL068')).start()
+        backend = AsyncPLBackend()
+        await backend.connect(server.host, server.port)
+        monitor = EventMonitor(backend, min_interval=0.005, max_interval=0.02)
+
+        async def trip():
+            await asyncio.sleep(0.05)
+            await backend.set_OVP(1, 4)
+            await backend.enable_output_channel(1)
+            await backend.set_voltage(1, 5)
+
+        task = asyncio.create_task(trip())
+        async for event in monitor.events():
+            monitor.stop()
+        await task
+        await backend.disconnect()
+        await server.stop()
+        return event
+    assert asyncio.run(scenario()).status.trip
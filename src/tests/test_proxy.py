@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from pyttilan.backend import TTiBackendExc
+from pyttilan.proxy import ProxyServer, ProxyPLBackend
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+class _ProxyThread:
+    # Runs a ProxyServer on an event loop in a thread
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.proxy.start(), self.loop).result()
+        return self.proxy
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        asyncio.run_coroutine_threadsafe(self.proxy.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+def test_proxy_shares_connection():
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.005)) as sim, \
+            _ProxyThread(ProxyServer(sim.host, sim.ports[0])) as proxy:
+        clients = [ProxyPLBackend(timeout=2) for _ in range(8)]
+        for client in clients:
+            client.connect('127.0.0.1', proxy.listen_port)
+        clients[0].set_voltage(1, 2.5)
+
+        def read(client):
+            return [client.get_configured_voltage(1) for _ in range(5)]
+
+        with ThreadPoolExecutor(len(clients)) as pool:
+            results = list(pool.map(read, clients))
+        assert results == [[2.5] * 5] * len(clients)
+        stats = proxy.statistics()
+        assert stats['upstream_messages'] < stats['client_messages']
+        assert stats['coalesced'] > 0
+        for client in clients:
+            client.disconnect()
+
+
+def test_proxy_errors_are_per_client():
+    path = os.path.join(tempfile.mkdtemp(), 'proxy.sock')
+    with SimulatorThread(SimulatorServer(Instrument('PL068'))) as sim, \
+            _ProxyThread(ProxyServer(sim.host, sim.ports[0], path=path)):
+        good = ProxyPLBackend(timeout=2)
+        bad = ProxyPLBackend(timeout=2)
+        good.connect(path)
+        bad.connect(path)
+        with pytest.raises(TTiBackendExc):
+            bad.set_voltage(1, 100)
+        assert good.get_configured_voltage(1) == 1.0
+        good.set_voltage(1, 3)
+        assert bad.get_configured_voltage(1) == 3.0
+        good.disconnect()
+        bad.disconnect()
+    assert not os.path.exists(path)
+
+
+def test_proxy_rejects_invalid_commands():
+    async def scenario():
+        server = await SimulatorServer(Instrument('PL068')).start()
+        proxy = await ProxyServer(server.host, server.port).start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', proxy.listen_port)
+        writer.write(b"FOO?;V1?\n*ESR?;*ESR?\n")
+        answer = await reader.readline()
+        writer.close()
+        messages = proxy.upstream_messages
+        await proxy.stop()
+        await server.stop()
+        return answer, messages
+    answer, messages = asyncio.run(scenario())
+    assert answer == b"32;0\n"
+    assert messages == 0
+
+
+def test_proxy_missing_answers():
+    async def scenario():
+        instrument = Instrument('PL068')
+        # Errors from before the proxy started are not given to its clients
+        instrument.execute("V1 100")
+        server = await SimulatorServer(instrument).start()
+        proxy = await ProxyServer(server.host, server.port).start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', proxy.listen_port)
+        writer.write(b"*ESR?\n")
+        before = await reader.readline()
+        # V2? fails on a single output power supply, so the answers of the message can not be routed
+        writer.write(b"V1 2;V2?;V1?;*ESR?;EER?\nV1?\n")
+        answers = [await reader.readline(), await reader.readline()]
+        writer.close()
+        await proxy.stop()
+        await server.stop()
+        return before, answers
+    before, answers = asyncio.run(scenario())
+    assert before == b"0\n"
+    assert answers == [b"16;103\n", b"V1 2.000\n"]
+
+
+def test_proxy_query_errors_are_per_client():
+    async def scenario():
+        instrument = Instrument('PL068')
+        server = await SimulatorServer(instrument).start()
+        proxy = await ProxyServer(server.host, server.port).start()
+        clients = [await asyncio.open_connection('127.0.0.1', proxy.listen_port) for _ in range(2)]
+        # A query error of the power supply while it answers the first client
+        instrument.qer = 3
+        answers = []
+        for message in (b"V1?\n", b"QER?\n", b"QER?\n"):
+            reader, writer = clients[0]
+            writer.write(message)
+            answers.append(await reader.readline())
+        reader, writer = clients[1]
+        writer.write(b"QER?\n")
+        answers.append(await reader.readline())
+        for _, writer in clients:
+            writer.close()
+        await proxy.stop()
+        await server.stop()
+        return answers
+    assert asyncio.run(scenario()) == [b"V1 1.000\n", b"3\n", b"0\n", b"0\n"]
+
+
+def test_proxy_reconnect_to_another_address():
+    with SimulatorThread(SimulatorServer(Instrument('PL068', serial="000001")),
+                         SimulatorServer(Instrument('PL068', serial="000002"))) as sim, \
+            _ProxyThread(ProxyServer(sim.host, sim.ports[0])) as first, \
+            _ProxyThread(ProxyServer(sim.host, sim.ports[1])) as second:
+        client = ProxyPLBackend(timeout=2)
+        client.connect('127.0.0.1', first.listen_port)
+        assert "000001" in client.get_identifier()
+        client.disconnect()
+        client.connect('127.0.0.1', second.listen_port)
+        assert "000002" in client.get_identifier()
+        client.disconnect()
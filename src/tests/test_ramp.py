@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from pyttilan.backend import PLBackend
+from pyttilan.ramp import Ramp, RampEngine
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+def test_ramp_plan():
+    backend = PLBackend()
+    ramp = Ramp(backend, 1, target=2.05, step=0.5, start=1.0)
+    ramp._plan(1.0)
+    assert ramp.steps == 3
+    assert [ramp.commands(i) for i in range(4)] == [["INCV1"], ["INCV1"], ["V1 2.05"], []]
+    assert ramp.expected(1) == 1.5
+    down = Ramp(backend, 1, target=0.0, step=0.25, quantity='current')
+    down._plan(1.0)
+    assert down.steps == 4 and down.commands(0) == ["DECI1"]
+
+
+def test_ramp_engine():
+    servers = [SimulatorServer(Instrument('PL068', serial=str(i))) for i in range(2)]
+    with SimulatorThread(*servers) as sim:
+        backends = [PLBackend(timeout=2) for _ in servers]
+        for backend, port in zip(backends, sim.ports):
+            backend.connect(sim.host, port)
+        backends[0].enable_output_channel(1)
+        ramps = [Ramp(backends[0], 1, target=3.0, step=0.5), Ramp(backends[1], 1, target=0.5, step=0.2)]
+        report = RampEngine(ramps, period=0.005, check_every=2, tolerance=0.01).run()
+        assert report.ok, report.aborted
+        assert report.steps == 4
+        assert report.sent == {f"{sim.host}:{sim.ports[0]}": 4, f"{sim.host}:{sim.ports[1]}": 3}
+        assert report.duration >= report.target_duration
+        assert backends[0].get_configured_voltage(1) == 3.0
+        assert backends[1].get_configured_voltage(1) == 0.5
+
+        # Output 1 of the first power supply trips on its way up
+        backends[0].set_OVP(1, 4.0)
+        backends[0].enable_output_channel(1)
+        ramps = [Ramp(backends[0], 1, target=6.0, step=0.5), Ramp(backends[1], 1, target=3.0, step=0.1)]
+        report = RampEngine(ramps, period=0.002, check_every=1).run()
+        assert report.aborted and 'tripped' in report.aborted
+        assert ramps[1].done < ramps[1].steps
+        for backend in backends:
+            backend.disconnect()
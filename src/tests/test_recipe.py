@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import pytest
+from pyttilan.backend import PLBackend, TTiBackendExc
+from pyttilan.recipe import RecipePlayer, RecipeStep, compile_recipe, parse_csv, parse_ndjson, validate_recipe
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+RECIPE = """time,supply,output,voltage,current,enabled
+0,a,1,3.3,0.5,1
+0,b,1,2,,
+0.02,a,1,3.0,,
+0.04,a,1,,,off
+"""
+
+
+def test_parse_and_compile():
+    steps = list(parse_csv(io.StringIO(RECIPE)))
+    assert steps[0] == RecipeStep(0.0, 'a', 1, 3.3, 0.5, True)
+    assert steps[1].current is None and steps[3].enabled is False
+    assert list(parse_ndjson(['{"time": 1, "supply": "a", "output": 1, "voltage": 2}'])) == [
+        RecipeStep(1.0, 'a', 1, 2.0)]
+    backends = {'a': PLBackend(), 'b': PLBackend()}
+    compiled = list(compile_recipe(steps, backends))
+    assert [c.time for c in compiled] == [0.0, 0.02, 0.04]
+    assert compiled[0].messages == {'a': ["V1 3.3", "I1 0.5", "OP1 1"], 'b': ["V1 2.0"]}
+    assert validate_recipe(steps, backends) == (3, 0.04)
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([RecipeStep(0, 'a', 2, 1.0)], "row 1"),
+    ([RecipeStep(0, 'c', 1, 1.0)], "Unknown power supply"),
+    ([RecipeStep(1, 'a', 1, 1.0), RecipeStep(0, 'a', 1, 1.0)], "goes back"),
+])
+def test_invalid_recipes(steps, message):
+    with pytest.raises(TTiBackendExc, match=message):
+        validate_recipe(steps, {'a': PLBackend()})
+
+
+def test_play(tmp_path):
+    path = tmp_path / "recipe.csv"
+    path.write_text(RECIPE)
+    with SimulatorThread(SimulatorServer(Instrument('PL068')), SimulatorServer(Instrument('PL068'))) as sim:
+        backends = {'a': PLBackend(timeout=2), 'b': PLBackend(timeout=2)}
+        for backend, port in zip(backends.values(), sim.ports):
+            backend.connect(sim.host, port)
+        timing = io.StringIO()
+        report = RecipePlayer(backends, check_every=2, timing_log=timing).play(str(path))
+        assert (report.steps, report.messages, report.checks) == (3, 4, 2)
+        assert report.duration >= 0.04
+        assert len(timing.getvalue().splitlines()) == 4
+        assert backends['a'].get_configured_voltage(1) == 3.0
+        assert backends['a'].is_disabled(1)
+        assert backends['b'].get_configured_voltage(1) == 2.0
+
+        with pytest.raises(TTiBackendExc, match="time end"):
+            RecipePlayer(backends).play([RecipeStep(0, 'a', 1, 1.0), RecipeStep(0.01, 'b', 1, 100.0)])
+        for backend in backends.values():
+            backend.disconnect()
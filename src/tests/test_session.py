@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import gzip
+import time
+import pytest
+from pyttilan.backend import PLBackend, TTiBackendExc, TTiBackendTimeout
+from pyttilan.commands import TTiPLCommands
+from pyttilan.session import SessionRecorder, ReplaySockCommand, read_session, SESSION, SENT, RECEIVED, CONNECT, \
+    TIMEOUT
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+def _record(path, compress):
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.02)) as sim:
+        backend = PLBackend(timeout=2)
+        backend.connect(sim.host, sim.ports[0])
+        with SessionRecorder(str(path), compress=compress) as recorder:
+            recorder.attach(backend)
+            backend.set_voltage(1, 2.5)
+            voltage = backend.get_configured_voltage(1)
+            with pytest.raises(TTiBackendExc):
+                backend.set_voltage(1, 100)
+        backend.disconnect()
+    return voltage, (sim.host, sim.ports[0])
+
+
+def _replay(path, address, speed=None, strict=True):
+    backend = PLBackend(timeout=2)
+    backend.sock = ReplaySockCommand(path, valid_commands=TTiPLCommands(), strict=strict, speed=speed)
+    backend.connect(*address)
+    return backend
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_record_and_replay(tmp_path, compress):
+    path = tmp_path / "session.ttirec"
+    voltage, address = _record(path, compress)
+    assert voltage == 2.5
+    kinds = [kind for kind, _, _, _ in read_session(str(path))]
+    # Commands without answer, error checks and queries
+    assert CONNECT in kinds and kinds.count(SENT) == 7 and kinds.count(RECEIVED) >= 5
+
+    backend = _replay(path, address)
+    backend.set_voltage(1, 2.5)
+    assert backend.get_configured_voltage(1) == 2.5
+    with pytest.raises(TTiBackendExc, match="Range error"):
+        backend.set_voltage(1, 100)
+    # Every message recorded has been replayed
+    with pytest.raises(TTiBackendExc, match="Nothing more was sent"):
+        backend.set_voltage(1, 2.5)
+
+    backend = _replay(path, address, speed=1.0)
+    start = time.monotonic()
+    backend.set_voltage(1, 2.5)
+    assert time.monotonic() - start >= 0.02
+
+
+def test_replay_diverges(tmp_path):
+    path = tmp_path / "session.ttirec"
+    _, address = _record(path, False)
+    with pytest.raises(TTiBackendExc, match="diverged"):
+        _replay(path, address).set_voltage(1, 3)
+    # Nothing was recorded to another address
+    with pytest.raises(TTiBackendExc, match="Nothing more was sent"):
+        _replay(path, ('172.16.7.253', 9221)).set_voltage(1, 2.5)
+
+
+def test_replay_one_of_several_connections(tmp_path):
+    path = tmp_path / "session.ttirec"
+    with SimulatorThread(SimulatorServer(Instrument('PL068')), SimulatorServer(Instrument('PL068'))) as sim:
+        backends = [PLBackend(timeout=2) for _ in sim.ports]
+        with SessionRecorder(path) as recorder:
+            for backend, port in zip(backends, sim.ports):
+                backend.connect(sim.host, port)
+                recorder.attach(backend)
+            for i, backend in enumerate(backends):
+                backend.set_voltage(1, 2 + i)
+            for backend in backends:
+                backend.get_configured_voltage(1)
+        for backend in backends:
+            backend.disconnect()
+    assert {connection for _, connection, _, _ in read_session(path)} == {0, 1, 2}
+
+    for i, port in enumerate(sim.ports):
+        backend = _replay(path, (sim.host, port))
+        backend.set_voltage(1, 2 + i)
+        assert backend.get_configured_voltage(1) == 2 + i
+
+
+def test_replay_timeouts(tmp_path):
+    path = tmp_path / "session.ttirec"
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.3)) as sim:
+        backend = PLBackend(timeout=0.1)
+        backend.connect(sim.host, sim.ports[0])
+        with SessionRecorder(path) as recorder:
+            recorder.attach(backend)
+            with pytest.raises(TTiBackendTimeout):
+                backend.get_identifier()
+            sim.servers[0].latency = 0.0
+            assert backend.get_configured_voltage(1) == 1.0
+        backend.disconnect()
+    assert [kind for kind, _, _, _ in read_session(path)].count(TIMEOUT) == 1
+
+    # The late answer is on the recording, but the read times out like it did
+    backend = _replay(path, (sim.host, sim.ports[0]))
+    with pytest.raises(TTiBackendTimeout):
+        backend.get_identifier()
+    assert backend.get_configured_voltage(1) == 1.0
+
+
+def test_append_with_another_format(tmp_path):
+    path = tmp_path / "session.ttirec"
+    SessionRecorder(path).close()
+    with pytest.raises(TTiBackendExc, match="not compressed"):
+        SessionRecorder(path, compress=True)
+    SessionRecorder(path).close()
+    assert [kind for kind, _, _, _ in read_session(path)] == [SESSION, SESSION]
+
+    other = tmp_path / "other.txt"
+    other.write_bytes(b"not a recording\n")
+    with pytest.raises(TTiBackendExc, match="not a recording"):
+        SessionRecorder(other)
+    assert other.read_bytes() == b"not a recording\n"
+
+
+def test_truncated_recording(tmp_path, caplog):
+    path = tmp_path / "session.ttirec"
+    _record(path, True)
+    records = list(read_session(path))
+    data = path.read_bytes()
+    # Cut off inside the gzip stream, like when the process recording it crashes
+    path.write_bytes(data[:len(data) // 2])
+    with pytest.raises(EOFError):
+        gzip.decompress(path.read_bytes())
+    truncated = list(read_session(path))
+    assert truncated == records[:len(truncated)]
+    assert "truncated" in caplog.text
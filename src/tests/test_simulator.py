@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import pytest
+from pyttilan.backend import PLBackend, CPxBackend, TTiBackendExc, TTiBackendTimeout, ErrorPolicy
+from pyttilan.framing import parse_numbers
+from pyttilan.worker import IOWorker
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    with SimulatorThread(SimulatorServer(Instrument('PL068')), SimulatorServer(Instrument('CPX400DP'))) as sim:
+        yield sim
+
+
+@pytest.fixture
+def pl(simulator):
+    simulator.servers[0].instrument.reset()
+    backend = PLBackend()
+    backend.connect(simulator.host, simulator.ports[0])
+    yield backend
+    backend.disconnect()
+
+
+def test_pl_against_simulator(pl):
+    assert "PL068" in pl.get_identifier()
+    pl.set_voltage(1, 3.3)
+    pl.set_current_limit(1, 0.5)
+    pl.set_OVP(1, 4)
+    pl.set_OCP(1, 2.2)
+    assert pl.get_configured_voltage(1) == 3.3
+    assert pl.get_current_limit(1) == 0.5
+    assert pl.get_OVP(1) == 4.0
+    assert pl.get_OCP(1) == 2.2
+    pl.enable_output_channel(1)
+    assert pl.is_enabled(1)
+    assert pl.read_voltage(1) == 3.3
+    assert pl.read_current(1) == 0.33
+    with pytest.raises(TTiBackendExc):
+        pl.set_voltage(1, 900)
+    assert pl.last_eer == 100
+
+
+def test_trip(pl):
+    pl.set_OVP(1, 4)
+    pl.enable_output_channel(1)
+    pl.set_voltage(1, 5)
+    assert pl.is_disabled(1)
+    assert int(pl.read_register_limit_event_status(1)) & (1 << 2)
+
+
+def test_cpx_against_simulator(simulator):
+    cpx = CPxBackend(num_outputs=2)
+    cpx.connect(simulator.host, simulator.ports[1])
+    cpx.set_OVP(2, 30)
+    assert cpx.get_OVP(2) == "30.000"
+    snap = cpx.snapshot()
+    assert list(snap['ovp']) == [66.0, 30.0]
+    cpx.disconnect()
+
+
+def test_concurrent_clients(simulator):
+    errors = []
+
+    def poll():
+        backend = PLBackend()
+        backend.connect(simulator.host, simulator.ports[0])
+        try:
+            for _ in range(20):
+                backend.read_voltage(1)
+        except Exception as e:
+            errors.append(e)
+        backend.disconnect()
+
+    threads = [threading.Thread(target=poll) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_timeout_and_resync():
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.3)) as sim:
+        backend = PLBackend(timeout=0.1)
+        backend.connect(sim.host, sim.ports[0])
+        with pytest.raises(TTiBackendTimeout):
+            backend.get_identifier()
+        sim.servers[0].latency = 0.0
+        # The late answer of the timed out query is discarded, not taken as the answer of the next one
+        assert backend.get_configured_voltage(1) == 1.0
+        sim.servers[0].latency = 0.3
+        backend.timeout = backend.sock.timeout = None
+        with pytest.raises(TTiBackendTimeout):
+            with backend.using_deadline(0.1):
+                backend.read_voltage(1)
+        sim.servers[0].latency = 0.0
+        assert backend.read_voltage(1) == 0.0
+        backend.disconnect()
+
+
+def test_numbers_parsed_from_bytes():
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.3)) as sim:
+        backend = PLBackend(timeout=0.1)
+        backend.connect(sim.host, sim.ports[0])
+        with pytest.raises(TTiBackendTimeout):
+            backend._query_many(["V1?", "I1?"], parse_numbers)
+        assert backend.sock._stale == 1
+        sim.servers[0].latency = 0.0
+        assert backend._query_many(["V1?", "I1?", "OP1?"], parse_numbers) == [1.0, 1.0, 0.0]
+        assert backend.get_configured_voltage(1) == 1.0
+        backend.disconnect()
+
+
+def test_io_worker(pl):
+    worker = pl.start_worker()
+    pl.set_voltage(1, 2.5)
+    futures = [pl.submit('get_configured_voltage', 1) for _ in range(20)]
+    assert [f.result() for f in futures] == [2.5] * 20
+    with pytest.raises(TTiBackendExc):
+        pl.submit('set_voltage', 1, 900).result()
+    errors = []
+
+    def poll():
+        try:
+            for _ in range(20):
+                assert pl.read_voltage(1) == 0.0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=poll) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    # Requests queued while the worker waits for the backend are sent together, on a message at most after the one
+    # it was serving
+    messages, requests = worker.messages, worker.requests
+    with pl._lock:
+        futures = [pl.submit('read_voltage', 1) for _ in range(10)]
+    assert [f.result() for f in futures] == [0.0] * 10
+    assert worker.requests - requests == 10 and worker.messages - messages <= 2
+    pl.stop_worker()
+    assert pl.submit('get_configured_voltage', 1).result() == 2.5
+
+
+# The exception ending the thread of the worker is reported by pytest when the thread is joined
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_io_worker_thread_ends():
+    class Interrupted(BaseException):
+        pass
+
+    class Backend:
+        def _exchange(self, commands, queries, error_policy):
+            raise Interrupted()
+
+    worker = IOWorker(Backend()).start()
+    with pytest.raises(Interrupted):
+        worker.submit(["V1?"], [True], ErrorPolicy.always).result(timeout=1)
+    worker.stop()
+    assert not worker.running and not worker._thread.is_alive()
+    with pytest.raises(RuntimeError):
+        worker.submit(["V1?"], [True], ErrorPolicy.always)
+
+
+def test_coalesced_queries():
+    with SimulatorThread(SimulatorServer(Instrument('PL068'), latency=0.05)) as sim:
+        backend = PLBackend(coalesce_queries=True, error_policy=ErrorPolicy.never)
+        backend.connect(sim.host, sim.ports[0])
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(backend.get_configured_voltage(1)))
+                   for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [1.0] * 10
+        assert sim.servers[0].messages < 10
+        backend.disconnect()
+
+
+def test_status_snapshot(pl):
+    pl.set_OVP(1, 4)
+    pl.enable_output_channel(1)
+    pl.set_voltage(1, 5)
+    status = pl.status_snapshot()
+    assert status.trip and status.tripped_outputs == (1,)
+    assert status.error is None
+    assert pl.last_tx == "*ESR?;EER?;QER?;*STB?;LSR1?"
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+from pyttilan.status import StatusSnapshot
+
+
+def test_decoding():
+    status = StatusSnapshot.from_answers(["48", "0", "0", "33", "4", "2"])
+    assert status.command_error and status.execution_error
+    assert status.errors == ("Command error detected",)
+    assert status.stb_flags == {'limit_1', 'event_status'}
+    assert status.lsr_flags(1) == {'ovp_trip'}
+    assert status.trip and status.tripped_outputs == (1,)
+    assert status.current_limited_outputs == (2,)
+    with pytest.raises(AttributeError):
+        status.esr = 0
+
+
+def test_errors():
+    assert StatusSnapshot(esr=0).error is None
+    assert StatusSnapshot(esr=16, eer=100).error == "[Execution error] Range error"
+    assert StatusSnapshot(esr=16 | 8 | 4, eer=104).errors == (
+        "[Execution error] Command not valid with output on", "Verify timeout detected", "Query error detected")
+    # Execution errors without a known EER code are not reported
+    assert StatusSnapshot(esr=16, eer=0).error is None
+    assert StatusSnapshot(esr=16, eer=42).errors == ()
+    assert StatusSnapshot(esr=16 | 4, eer=42).errors == ("Query error detected",)
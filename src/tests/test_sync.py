@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import pytest
+from pyttilan.backend import PLBackend, TTiBackendExc
+from pyttilan.fleet import SupplyFleet
+from pyttilan.instrumentation import BEFORE_SEND
+from pyttilan.simulator import Instrument, SimulatorServer, SimulatorThread
+from pyttilan.sync import SyncGroup, combine_outputs
+
+
+def test_combine_outputs():
+    assert combine_outputs(["V1 3.0", "OP1 1", "V2 5.0", "OP2 1"], 2) == ["V1 3.0", "V2 5.0", "OPALL 1"]
+    assert combine_outputs(["OP1 1", "V2 5.0"], 2) == ["OP1 1", "V2 5.0"]
+    assert combine_outputs(["OP1 0"], 1) == ["OP1 0"]
+
+
+def test_group_fire():
+    servers = [SimulatorServer(Instrument('PL068', serial=str(i)), latency=0.01) for i in range(3)]
+    with SimulatorThread(*servers) as sim, SupplyFleet() as fleet:
+        for i, port in enumerate(sim.ports):
+            fleet.add(f"psu{i}", PLBackend(timeout=2), sim.host, port)
+        group = fleet.group()
+        for i, name in enumerate(fleet):
+            with group.stage(name) as b:
+                b.set_voltage(1, 2 + i)
+                b.enable_output_channel(1)
+        result = group.fire()
+        assert result.ok and set(result.send_times) == set(fleet)
+        assert 0 <= result.skew < 0.05
+        assert fleet.call('get_configured_voltage', 1) == {'psu0': 2.0, 'psu1': 3.0, 'psu2': 4.0}
+        assert all(fleet.call('is_enabled', 1).values())
+
+        group.stage('psu0').set_voltage(1, 100)
+        group.stage('psu1').set_voltage(1, 1)
+        result = group.fire()
+        assert list(result) == ['psu1'] and isinstance(result.errors['psu0'], TTiBackendExc)
+
+        group.stage('psu0').get_configured_voltage(1)
+        with pytest.raises(TTiBackendExc):
+            group.prepare()
+
+
+def test_group_member_fails():
+    servers = [SimulatorServer(Instrument('PL068', serial=str(i))) for i in range(2)]
+    with SimulatorThread(*servers) as sim:
+        backends = {f"psu{i}": PLBackend(timeout=2) for i in range(len(servers))}
+        for backend, port in zip(backends.values(), sim.ports):
+            backend.connect(sim.host, port)
+        sent = []
+        backends['psu0'].add_hook(BEFORE_SEND, lambda event, exchange: sent.append(exchange.commands))
+        group = SyncGroup(backends, timeout=30)
+        for name in backends:
+            group.stage(name).set_voltage(1, 3)
+        assert group.fire().ok
+        # Messages are sent through the instrumented exchange
+        assert sent == [["V1 3.0"]]
+
+        backends['psu1'].sock.disconnect()
+        for name in backends:
+            group.stage(name).set_voltage(1, 4)
+        start = time.monotonic()
+        result = group.fire()
+        # The others do not wait for the barrier to time out
+        assert time.monotonic() - start < 10
+        assert not result and set(result.errors) == {'psu0', 'psu1'}
+        backends['psu0'].disconnect()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import math
+import pytest
+from pyttilan import telemetry
+from pyttilan.telemetry import make_snapshot, stack_snapshots, parse_number, Snapshot, TelemetrySampler
+
+ANSWERS_1 = ["3.300V", "0.100A", "V1 3.300", "I1 0.500", "VP1 4.000", "CP1 2.200", "1"]
+ANSWERS_2 = ["1.000V", "0.000A", "V2 1.000", "I2 0.200", "VP2 2.000", "CP2 1.000", "0"]
+
+
+def test_parse_number():
+    assert parse_number("3.300V") == 3.3
+    assert parse_number("V1 3.300") == 3.3
+    assert parse_number("-0.006V") == -0.006
+    assert parse_number("1") == 1
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_make_snapshot(use_numpy):
+    if use_numpy and telemetry.np is None:
+        pytest.skip("NumPy not installed")
+    snap = make_snapshot([1, 2], ANSWERS_1 + ANSWERS_2, use_numpy=use_numpy)
+    assert len(snap) == 2
+    assert list(snap['voltage']) == [3.3, 1.0]
+    assert list(snap['ovp']) == [4.0, 2.0]
+    assert list(snap['enabled']) == [True, False]
+    assert list(snap['output']) == [1, 2]
+    assert snap[1]['current_limit'] == 0.2
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_stack_snapshots(use_numpy):
+    if use_numpy and telemetry.np is None:
+        pytest.skip("NumPy not installed")
+    one = make_snapshot([1], ANSWERS_1, use_numpy=use_numpy)
+    two = make_snapshot([1, 2], ANSWERS_1 + ANSWERS_2, use_numpy=use_numpy)
+    stacked = stack_snapshots([one, two])
+    assert stacked.shape == (2, 2)
+    assert stacked[1][1]['voltage'] == 1.0
+    assert stacked[0][1]['output'] == 0
+    assert math.isnan(stacked[0][1]['voltage'])
+    if not use_numpy:
+        assert isinstance(stacked, Snapshot)
+
+
+class FakeBackend:
+    def __init__(self):
+        self.sent = []
+
+    def _check_output(self, output):
+        return int(output)
+
+    def _query_many(self, commands, parser):
+        self.sent.append(commands)
+        return parser(["3.300V", "0.100A"])
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_sampler(use_numpy):
+    if use_numpy and telemetry.np is None:
+        pytest.skip("NumPy not installed")
+    backend = FakeBackend()
+    sampler = TelemetrySampler(backend, [('voltage', 1), ('current', 1)], rate=500, capacity=8,
+                               use_numpy=use_numpy)
+    received = []
+    with sampler:
+        for timestamp, values in sampler.samples(timeout=1):
+            received.append(values)
+            if len(received) == 20:
+                break
+    assert backend.sent[0] == ["V1O?", "I1O?"]
+    assert received[0] == (3.3, 0.1)
+    assert len(sampler.latest(100)) == 8
+    stats = sampler.statistics()
+    assert stats['samples'] >= 20
+    assert stats['errors'] == 0
+    assert stats['jitter_max'] >= 0
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_shared_memory_publication(use_numpy):
+    from pyttilan.sharedmem import SharedTelemetryPublisher, SharedTelemetryReader
+    if use_numpy and telemetry.np is None:
+        pytest.skip("NumPy not installed")
+    publisher = SharedTelemetryPublisher(FakeBackend(), [('voltage', 1), ('current', 1)], rate=1, capacity=4,
+                                         use_numpy=use_numpy)
+    try:
+        reader = SharedTelemetryReader(publisher.name)
+        assert reader.channels == [('voltage', 1), ('current', 1)]
+        assert reader.latest() == []
+        for i in range(6):
+            publisher.publish(float(i), [3.3, i / 10])
+        assert reader.count == 6
+        assert reader.latest() == [(5.0, (3.3, 0.5))]
+        assert [t for t, _ in reader.latest(10)] == [2.0, 3.0, 4.0, 5.0]
+        assert reader.array[5 % 4][0] == 5.0
+        reader.close()
+    finally:
+        publisher.close()
+
+
+def test_shared_memory_channels_round_trip():
+    from pyttilan.sharedmem import SharedTelemetryPublisher, SharedTelemetryReader
+    channels = [(name, output) for name in telemetry.CHANNEL_QUERIES for output in (1, 2)]
+    publisher = SharedTelemetryPublisher(FakeBackend(), channels, rate=1, capacity=2)
+    try:
+        with SharedTelemetryReader(publisher.name) as reader:
+            assert reader.channels == channels
+            for position, (name, output) in enumerate(channels):
+                assert reader.index(name, output) == position
+    finally:
+        publisher.close()